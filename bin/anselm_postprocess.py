@@ -1,27 +1,34 @@
 #!/usr/bin/env python3
 # coding: utf-8
+from functools import partial
 
 from coraxml_utils.importer import create_importer
 from coraxml_utils.exporter import create_exporter
-from coraxml_utils.modifier import (
-    postprocess,
-    anselm_postprocess,
-    anselm_document_postprocess,
+from coraxml_utils.modifier import anselm_postprocess, anselm_document_postprocess
+from coraxml_utils.pipeline import (
+    Pipeline,
+    document_step,
+    run_from_command_line,
+    token_step,
+)
+
+PIPELINE = Pipeline(
+    partial(create_importer, "coraxml", dialect="anselm", strict=False),
+    partial(
+        create_exporter,
+        "coraxml",
+        options={
+            # name mod -> tok_anno, dipl -> tok_dipl
+            "dipl_tag_name": "tok_dipl",
+            "anno_tag_name": "tok_anno",
+        },
+    ),
+    [token_step(anselm_postprocess), document_step(anselm_document_postprocess)],
 )
 
 
 if __name__ == "__main__":
 
-    postprocess(
-        create_importer("coraxml", dialect="anselm", strict=False),
-        create_exporter(
-            "coraxml",
-            options={
-                # name mod -> tok_anno, dipl -> tok_dipl
-                "dipl_tag_name": "tok_dipl",
-                "anno_tag_name": "tok_anno",
-            },
-        ),
-        anselm_postprocess,
-        anselm_document_postprocess,
+    run_from_command_line(
+        PIPELINE, "Fügt einige extra Annotationen einer CorA-XML-Datei hinzu."
     )
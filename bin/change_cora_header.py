@@ -2,17 +2,11 @@
 
 import argparse
 import os
-import xml.etree.ElementTree as ET
-import xml.dom.minidom as minidom
 
-############################
-# Function for pretty output.
-def prettify(elem):
-    """Return a pretty-printed XML string for the Element."""
-    rough_string = ET.tostring(elem, "utf-8")
-    reparsed = minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent="", newl="")
+from lxml import etree as ET
 
+from coraxml_utils.importer import read_coraxml_header
+from coraxml_utils.exporter import replace_coraxml_header
 
 ############################
 
@@ -58,15 +52,14 @@ else:
         print(filename)
 
         try:
-            tree = ET.parse(args.folder + "/" + filename)
-            root = tree.getroot()
+            cora_header = read_coraxml_header(args.folder + "/" + filename)
+            old_header_string = cora_header["header_string"] or ""
 
             new_header_text = ""
 
             if args.delete:
 
-                header_elem = root.find("./header")
-                old_header_text = header_elem.text.strip().split("\n")
+                old_header_text = old_header_string.strip().split("\n")
 
                 for line in old_header_text:
 
@@ -108,7 +101,7 @@ else:
                     else:
                         new_header_text += line.strip() + "\n"
             else:
-                pass
+                new_header_text = old_header_string
 
             if args.add:
                 if not os.path.isfile(args.add):
@@ -116,7 +109,7 @@ else:
 
                 else:
                     additional_text = ""
-                    sigle = root.find("./cora-header").attrib["sigle"]
+                    sigle = cora_header["sigle"]
                     if sigle in additional_data:
                         for additional_info in additional_data_keys[1:]:
                             additional_text += (
@@ -129,12 +122,9 @@ else:
                         print("No additional info for", filename)
                     new_header_text = additional_text + new_header_text
 
-            if new_header_text:
-                header_elem.text = new_header_text
-
-                # Open the new xml file.
-                with open(args.folder + "/" + filename, mode="w", encoding="utf-8") as xmlfile:
-                    print(prettify(root), file=xmlfile)
+            if new_header_text and new_header_text != old_header_string:
+                # only the header is rewritten, the rest of the file is copied
+                replace_coraxml_header(args.folder + "/" + filename, new_header_text)
 
-        except ET.ParseError:
+        except (ET.XMLSyntaxError, ValueError):
             print("Error reading file:", filename)
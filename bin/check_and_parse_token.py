@@ -2,9 +2,10 @@
 # coding: utf-8
 
 import argparse
+import os
+import sys
 
-from coraxml_utils.parser import dialect_mapper
-from coraxml_utils.modifier import trans_to_cora_json
+from coraxml_utils.token_server import parse_token_remote, TokenParseError
 
 if __name__ == "__main__":
     description = "Check and parse a CorA token. Can be used as backend for editing tokens in CorA."
@@ -17,11 +18,32 @@ if __name__ == "__main__":
         default="ref",
         help="Token parser to use, default: %(default)s",
     )
+    parser.add_argument(
+        "--server",
+        default=os.environ.get("CORAXML_TOKEN_SERVER"),
+        help="URL of a running token server (coraxml-utils token-server), "
+        "default: $CORAXML_TOKEN_SERVER. Without a reachable server, "
+        "the token is parsed locally.",
+    )
     args, _ = parser.parse_known_args()
 
     with open(args.infile, encoding="utf-8") as f:
         token = f.read().strip()
 
+    if args.server:
+        try:
+            print(parse_token_remote(token, args.parser, url=args.server))
+            sys.exit(0)
+        except TokenParseError as e:
+            print(e.message, file=sys.stderr)
+            sys.exit(1)
+        except OSError:
+            # server not running or unable to parse this dialect - parse locally
+            pass
+
+    from coraxml_utils.parser import dialect_mapper
+    from coraxml_utils.modifier import trans_to_cora_json
+
     parsed_token = dialect_mapper[args.parser]().parse(token)
 
     print(trans_to_cora_json(parsed_token))
@@ -2,60 +2,25 @@
 # -*- coding: utf-8 -*-
 
 import os
-import json
 import getpass
-import requests
+import logging
 import click
 
+from coraxml_utils.cora_client import CoraClient, SyncManifest, DEFAULT_BASE, DEFAULT_MANIFEST
 
-DEFAULT_BASE = "https://cora.linguistics.rub.de/"
-
-
-class CoraClient:
-    def __init__(self, base_url=DEFAULT_BASE):
-        self.username = input("Username: ")
-        self.pw = getpass.getpass("Password: ")
-        self.session = self.login()
-        self.base_url = base_url
-
-    def login(self):
-        s = requests.Session()
-        s.post(
-            DEFAULT_BASE,
-            data={
-                "action": "login",
-                "loginform[un]": self.username,
-                "loginform[pw]": self.pw,
-            },
-        )
-        return s
-
-    def get_projects_and_files(self):
-        """returns json"""
-        r = self.session.get(self.base_url + "request.php?do=getProjectsAndFiles")
-        return json.loads(r.content)
-
-    def export_XML_file(self, file_id) -> str:
-        """returns xml string"""
-        r = self.session.get(
-            self.base_url + "request.php",
-            params={"do": "exportFile", "fileid": file_id, "format": "1"},
-        )
-        return r.content
-
-    def upload_XML_file(self, project_id, filepath, tagsets):
-        tagsets = {"linktagsets[{0}]".format(i): tag for i, tag in enumerate(tagsets)}
-        r = self.session.post(
-            self.base_url + "request.php",
-            data={"action": "importXMLFile", "project": project_id, **tagsets},
-            files=[("xmlFile", open(filepath, "r", encoding="utf-8"))],
-        )
-        return r.content
+
+def login(base_url):
+    return CoraClient(
+        base_url, username=input("Username: "), password=getpass.getpass("Password: ")
+    )
 
 
 @click.group()
-def cli():
-    pass
+@click.option("--base-url", default=DEFAULT_BASE, help="URL of the CorA instance")
+@click.pass_context
+def cli(ctx, base_url):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ctx.obj = base_url
 
 
 @cli.command()
@@ -64,10 +29,15 @@ def cli():
 @click.option("-t", "--onlytexts", help="Just download these particular texts")
 @click.option("-c", "--only-changed")
 @click.option("-s", "--use-sigle")
-def download(corpusnames, outdir, onlytexts, only_changed, use_sigle):
+@click.option("-w", "--workers", default=4, help="Number of concurrent downloads")
+@click.option(
+    "-f", "--force", is_flag=True, help="Also download files unchanged since the last sync"
+)
+@click.pass_obj
+def download(base_url, corpusnames, outdir, onlytexts, only_changed, use_sigle, workers, force):
 
     # Log in
-    client = CoraClient()
+    client = login(base_url)
 
     # Get text info
     response = client.get_projects_and_files()
@@ -83,24 +53,21 @@ def download(corpusnames, outdir, onlytexts, only_changed, use_sigle):
 
     textw = onlytexts.split(",") if onlytexts else list()
 
-    for corpus in textinfo:
-        if corpus["id"] in corpusnames:
-            for text in corpus["files"]:
-                if not textw or text[textname] in textw:
-                    if not only_changed or text["changer_id"]:
-                        # Get texts
-                        print(
-                            "exporting",
-                            (text["id"], text["sigle"], text["fullname"]),
-                            "...",
-                        )
-                        xmlstring = client.export_XML_file(text["id"])
-                        with open(
-                            os.path.join(outdir, text["id"] + ".xml"),
-                            "w",
-                            encoding="utf-8",
-                        ) as outfile:
-                            print(xmlstring.decode("utf-8"), file=outfile)
+    texts = [
+        text
+        for corpus in textinfo
+        if corpus["id"] in corpusnames
+        for text in corpus["files"]
+        if (not textw or text[textname] in textw)
+        and (not only_changed or text["changer_id"])
+    ]
+
+    # Get texts, skipping those unchanged since the last download
+    manifest = SyncManifest(os.path.join(outdir, DEFAULT_MANIFEST))
+    if force:
+        manifest.files.clear()
+    downloaded = client.download_files(texts, outdir, manifest=manifest, workers=workers)
+    print("downloaded", len(downloaded), "of", len(texts), "files")
 
     print("done!")
 
@@ -109,8 +76,9 @@ def download(corpusnames, outdir, onlytexts, only_changed, use_sigle):
 @click.argument("projectid")
 @click.argument("filepath")
 @click.argument("tagsets", nargs=-1)
-def upload_file(projectid, filepath, tagsets):
-    client = CoraClient()
+@click.pass_obj
+def upload_file(base_url, projectid, filepath, tagsets):
+    client = login(base_url)
     response = client.upload_XML_file(projectid, filepath, tagsets)
     print(response)
     print("done!")
@@ -120,11 +88,16 @@ def upload_file(projectid, filepath, tagsets):
 @click.argument("projectid")
 @click.argument("path")
 @click.argument("tagsets", nargs=-1)
-def upload_files(projectid, path, tagsets):
-    client = CoraClient()
-    for filename in os.listdir(path):
+@click.option("-w", "--workers", default=4, help="Number of concurrent uploads")
+@click.pass_obj
+def upload_files(base_url, projectid, path, tagsets, workers):
+    client = login(base_url)
+    filenames = sorted(os.listdir(path))
+    responses = client.upload_files(
+        projectid, [os.path.join(path, filename) for filename in filenames], tagsets, workers
+    )
+    for filename, response in zip(filenames, responses):
         print(filename)
-        response = client.upload_XML_file(projectid, path + "/" + filename, tagsets)
         print(response)
     print("done!")
 
@@ -1,20 +1,29 @@
 #!/usr/bin/env python3
 # coding: utf-8
+from functools import partial
+
 from coraxml_utils.importer import create_importer
 from coraxml_utils.exporter import create_exporter
-from coraxml_utils.modifier import postprocess, ref_postprocess
+from coraxml_utils.modifier import ref_postprocess
+from coraxml_utils.pipeline import Pipeline, run_from_command_line, token_step
+
+PIPELINE = Pipeline(
+    partial(create_importer, "coraxml", dialect="ref", passthrough=True),
+    partial(
+        create_exporter,
+        "coraxml",
+        options={
+            # name mod -> tok_anno, dipl -> tok_dipl
+            "dipl_tag_name": "tok_dipl",
+            "anno_tag_name": "tok_anno",
+        },
+    ),
+    [token_step(ref_postprocess)],
+)
+
 
 if __name__ == "__main__":
 
-    postprocess(
-        create_importer("coraxml", dialect="ref"),
-        create_exporter(
-            "coraxml",
-            options={
-                # name mod -> tok_anno, dipl -> tok_dipl
-                "dipl_tag_name": "tok_dipl",
-                "anno_tag_name": "tok_anno",
-            },
-        ),
-        ref_postprocess,
+    run_from_command_line(
+        PIPELINE, "Fügt einige extra Annotationen einer CorA-XML-Datei hinzu."
     )
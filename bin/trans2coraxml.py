@@ -269,6 +269,11 @@ if __name__ == "__main__":
         with open(args.infile, "r", encoding="utf-8") as infile:
             doc = MyImporter.import_from_string(infile.read().replace("\ufeff", ""))
 
+    ## errors are shown to the user by CorA
+    for level, message in MyImporter.diagnostics.messages():
+        if level == "ERROR":
+            print(message)
+
     if doc:
 
         # do postprocessing
@@ -0,0 +1,569 @@
+"""
+Compact binary serialization of documents.
+
+Written by `BinaryExporter` and read by `BinaryImporter`, the format keeps
+the parsed transcriptions, so documents can be passed between pipeline
+stages without parsing them again. A file consists of
+
+    magic, version
+    string table    -- every distinct string (transcriptions, tags, ids)
+    shape table     -- character class and attribute names of each shape
+                       of character, as indices into the string table
+    kind table      -- every distinct character: its shape, its boolean
+                       attributes as bits and its other attributes as
+                       string indices
+    item offsets    -- the position of each item of the token list in the
+                       structure
+    structure       -- the document as a stream of integers: header, pages,
+                       columns, lines (with dipl offsets), tokens, dipls and
+                       annos, tags, flags and shifttags
+
+A token lists the kinds of its characters once; the transcriptions of the
+token, its dipls and its annos are runs of offsets into that list, so
+characters that they share are shared again after reading. Every table
+is an array of little-endian integers in the narrowest of the 8, 16 and 32
+bit types that holds its values.
+"""
+
+import array
+import gc
+import importlib
+import itertools
+import json
+import struct
+import sys
+
+from coraxml_utils.character import Char, Whitespace
+from coraxml_utils.coralib import (
+    AnnoTrans,
+    Column,
+    CoraComment,
+    CoraToken,
+    DiplTrans,
+    Document,
+    Line,
+    Page,
+    ShiftTag,
+    TokAnno,
+    TokDipl,
+    Trans,
+)
+
+MAGIC = b"CXUB"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sH")
+_COUNT = struct.Struct("<I")
+_ARRAY = struct.Struct("<cI")
+
+## type codes of the arrays with their ranges, narrowest first
+_TYPECODES = [
+    ("B", 0, 0xFF),
+    ("b", -0x80, 0x7F),
+    ("H", 0, 0xFFFF),
+    ("h", -0x8000, 0x7FFF),
+    ("I", 0, 0xFFFFFFFF),
+    ("i", -0x80000000, 0x7FFFFFFF),
+]
+
+## item kinds in the token list
+_TOKEN = 0
+_COMMENT = 1
+
+
+def _write_array(outfile, values):
+    low, high = (min(values), max(values)) if values else (0, 0)
+    typecode = next(
+        typecode
+        for typecode, minimum, maximum in _TYPECODES
+        if minimum <= low and high <= maximum
+    )
+    if typecode != values.typecode or sys.byteorder == "big":
+        values = array.array(typecode, values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    outfile.write(_ARRAY.pack(typecode.encode("ascii"), len(values)))
+    outfile.write(values.tobytes())
+
+
+def _read_array(infile):
+    typecode, count = _ARRAY.unpack(infile.read(_ARRAY.size))
+    typecode = typecode.decode("ascii")
+    if typecode not in [code for code, _, _ in _TYPECODES]:
+        raise ValueError("Invalid binary document.")
+    values = array.array(typecode)
+    values.frombytes(infile.read(count * values.itemsize))
+    if len(values) != count:
+        raise ValueError("Truncated binary document.")
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class _Writer:
+    def __init__(self, shapes=None):
+        self.strings = dict()
+        ## shapes may be shared between writers (see coraxml_utils.corpus_store)
+        self.shapes = dict() if shapes is None else shapes
+        ## (shape, bits, values) of a character -> offset in the kind table
+        self.kinds = dict()
+        self.kind_shapes = array.array("i")
+        self.kind_bits = array.array("I")
+        self.kind_values = array.array("i")
+        self.item_offsets = array.array("I")
+        self.structure = array.array("i")
+
+    def string(self, value):
+        if value is None:
+            return -1
+        if not isinstance(value, str):
+            raise ValueError("Cannot serialize value " + repr(value))
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def put(self, *values):
+        self.structure.extend(values)
+
+    def put_string(self, value):
+        self.structure.append(self.string(value))
+
+    def put_strings(self, values):
+        self.structure.append(len(values))
+        self.structure.extend(self.string(value) for value in values)
+
+    def _shape(self, char):
+        attribs = char.__dict__
+        key = (type(char), tuple(attribs))
+        shape = self.shapes.get(key)
+        if shape is None:
+            shape = self.shapes[key] = (
+                len(self.shapes),
+                tuple(name for name, value in attribs.items() if isinstance(value, bool)),
+                tuple(
+                    name for name, value in attribs.items() if not isinstance(value, bool)
+                ),
+            )
+            if len(shape[1]) > 32:
+                raise ValueError("Too many flags for character " + str(char))
+        return shape
+
+    def kind(self, char):
+        shape_index, bool_names, value_names = self._shape(char)
+        attribs = char.__dict__
+        bits = 0
+        for bit, name in enumerate(bool_names):
+            if attribs[name]:
+                bits |= 1 << bit
+        values = tuple(self.string(attribs[name]) for name in value_names)
+        key = (shape_index, bits, values)
+        offset = self.kinds.get(key)
+        if offset is None:
+            offset = self.kinds[key] = len(self.kind_shapes)
+            self.kind_shapes.append(shape_index)
+            self.kind_bits.append(bits)
+            self.kind_values.extend(values)
+        return offset
+
+    def put_chars(self, transcriptions):
+        """
+        Writes the kinds of the characters of the transcriptions, each
+        character once, and returns their offsets by id.
+        """
+        offsets = dict()
+        kinds = []
+        for trans in transcriptions:
+            if trans is None:
+                continue
+            for char in trans.parse:
+                if id(char) not in offsets:
+                    offsets[id(char)] = len(kinds)
+                    kinds.append(self.kind(char))
+        self.structure.append(len(kinds))
+        self.structure.extend(kinds)
+        return offsets
+
+    def put_trans(self, trans, offsets):
+        """Writes a transcription as runs of consecutive character offsets."""
+        if trans is None:
+            self.structure.append(-1)
+            return
+        runs = []
+        for char in trans.parse:
+            offset = offsets[id(char)]
+            if runs and runs[-1][0] + runs[-1][1] == offset:
+                runs[-1][1] += 1
+            else:
+                runs.append([offset, 1])
+        self.structure.append(len(runs))
+        for start, length in runs:
+            self.structure.extend((start, length))
+
+    def put_item(self, item):
+        """Writes a token or a comment of the token list."""
+        if isinstance(item, CoraComment):
+            self.put(_COMMENT)
+            self.put_string(item.type)
+            self.put_string(item.content)
+            return
+
+        self.put(_TOKEN)
+        self.put_string(item.id)
+        offsets = self.put_chars(
+            [item.trans]
+            + [dipl.trans for dipl in item.tok_dipls]
+            + [anno.trans for anno in item.tok_annos]
+        )
+        self.put_trans(item.trans, offsets)
+        self.put_strings(item.errors)
+        self.put(len(item.tok_dipls))
+        for dipl in item.tok_dipls:
+            self.put_string(dipl.id)
+            self.put_trans(dipl.trans, offsets)
+        self.put(len(item.tok_annos))
+        for anno in item.tok_annos:
+            self.put_string(anno.id)
+            self.put_trans(anno.trans, offsets)
+            self.put(int(anno.checked))
+            self.put(len(anno.tags))
+            for name, value in anno.tags.items():
+                self.put_string(name)
+                self.put_string(value)
+            self.put_strings(sorted(anno.flags))
+
+    def shape_ints(self):
+        """The shape table: class name, number of flags, flag names, value names."""
+        shape_ints = array.array("i")
+        for (char_class, _), (_, bool_names, value_names) in sorted(
+            self.shapes.items(), key=lambda item: item[1][0]
+        ):
+            shape_ints.append(
+                self.string(char_class.__module__ + ":" + char_class.__qualname__)
+            )
+            shape_ints.append(len(bool_names))
+            shape_ints.extend(self.string(name) for name in bool_names)
+            shape_ints.append(len(value_names))
+            shape_ints.extend(self.string(name) for name in value_names)
+        return shape_ints
+
+    def string_table(self):
+        """The strings as their lengths in code points and one utf-8 blob."""
+        strings = list(self.strings)
+        return (
+            array.array("I", [len(string) for string in strings]),
+            "".join(strings).encode("utf-8"),
+        )
+
+    def write(self, outfile):
+        outfile.write(_HEADER.pack(MAGIC, VERSION))
+
+        ## the shape table adds its names to the strings
+        shape_ints = self.shape_ints()
+        lengths, blob = self.string_table()
+        _write_array(outfile, lengths)
+        outfile.write(_COUNT.pack(len(blob)))
+        outfile.write(blob)
+
+        for values in [
+            shape_ints,
+            self.kind_shapes,
+            self.kind_bits,
+            self.kind_values,
+            self.item_offsets,
+            self.structure,
+        ]:
+            _write_array(outfile, values)
+
+
+def write_document(doc, outfile):
+    """Writes a document to a binary file object."""
+    writer = _Writer()
+
+    writer.put_string(doc.sigle)
+    writer.put_string(doc.name)
+    writer.put_string(doc.header_string)
+    writer.put_string(json.dumps(doc.header))
+
+    ## dipls are numbered in the order of the tokens
+    dipl_offsets = dict()
+    for token in doc.tokens:
+        if isinstance(token, CoraToken):
+            for dipl in token.tok_dipls:
+                dipl_offsets[dipl._id] = len(dipl_offsets)
+
+    writer.put(len(doc.pages))
+    for page in doc.pages:
+        writer.put_string(page.id)
+        writer.put_string(page.name)
+        writer.put_string(page.side)
+        writer.put(len(page.columns))
+        for column in page.columns:
+            writer.put_string(column.id)
+            writer.put_string(column.name)
+            writer.put(len(column.lines))
+            for line in column.lines:
+                writer.put_string(line.id)
+                writer.put_string(line.name)
+                writer.put(len(line.dipls))
+                writer.put(*[dipl_offsets[dipl._id] for dipl in line.dipls])
+
+    writer.put(len(doc.tokens))
+    for token in doc.tokens:
+        writer.item_offsets.append(len(writer.structure))
+        writer.put_item(token)
+
+    writer.put(len(doc.shifttags))
+    for shifttag, (start, end) in zip(doc.shifttags, _shifttag_positions(doc)):
+        writer.put_string(shifttag.type)
+        writer.put(start, end)
+
+    writer.write(outfile)
+
+
+def _shifttag_positions(doc):
+    """Positions of the first and last token of each shifttag in doc.tokens."""
+    token_positions = {
+        token._id: position
+        for position, token in enumerate(doc.tokens)
+        if isinstance(token, CoraToken)
+    }
+    return [
+        (token_positions[shifttag.tokens[0]._id], token_positions[shifttag.tokens[-1]._id])
+        for shifttag in doc.shifttags
+    ]
+
+
+def _resolve_class(name):
+    module_name, _, class_name = name.partition(":")
+    ## only character classes of this package are instantiated
+    if module_name.split(".")[0] != "coraxml_utils":
+        raise ValueError("Unknown character class " + name)
+    try:
+        char_class = importlib.import_module(module_name)
+        for part in class_name.split("."):
+            char_class = getattr(char_class, part)
+    except (ImportError, AttributeError):
+        raise ValueError("Unknown character class " + name)
+    if not (
+        isinstance(char_class, type) and issubclass(char_class, (Char, Whitespace))
+    ):
+        raise ValueError("Not a character class: " + name)
+    return char_class
+
+
+def read_document(infile):
+    """Reads a document written by write_document from a binary file object."""
+    return _without_gc(_read_document, infile)
+
+
+def _without_gc(function, *args):
+    ## the garbage collector would repeatedly traverse all the new objects.
+    ## gc.disable() is process-wide: while a document is read, other threads
+    ## do not collect cycles either (their objects are collected afterwards)
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return function(*args)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def read_item(infile, position):
+    """
+    Reads the item at the position in the token list (a token or a comment)
+    from a binary file object, without reading the rest of the document.
+    """
+    strings, kinds, item_offsets, structure = _read_tables(infile)
+    if not 0 <= position < len(item_offsets):
+        raise IndexError("token index out of range: " + str(position))
+    return _Reader(strings, kinds, structure, item_offsets[position]).get_item()
+
+
+def _read_tables(infile):
+    magic, version = _HEADER.unpack(infile.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("Not a binary CorA document.")
+    if version != VERSION:
+        raise ValueError("Unsupported version of binary document: " + str(version))
+
+    lengths = _read_array(infile)
+    (blob_size,) = _COUNT.unpack(infile.read(_COUNT.size))
+    strings = _decode_strings(lengths, infile.read(blob_size))
+
+    shapes = _decode_shapes(_read_array(infile), strings)
+    kinds = _decode_kinds(
+        shapes,
+        _read_array(infile),
+        _read_array(infile),
+        _read_array(infile),
+        strings,
+    )
+    return strings, kinds, _read_array(infile), _read_array(infile)
+
+
+def _read_document(infile):
+    strings, kinds, _, structure = _read_tables(infile)
+    reader = _Reader(strings, kinds, structure)
+
+    sigle = reader.get_string()
+    name = reader.get_string()
+    header_string = reader.get_string()
+    header = json.loads(reader.get_string())
+
+    ## lines refer to dipls that are created with the tokens
+    line_dipl_offsets = []
+    pages = []
+    for _ in range(reader.get()):
+        page_id, page_name, side = reader.get_strings(3)
+        columns = []
+        for _ in range(reader.get()):
+            column_id, column_name = reader.get_strings(2)
+            lines = []
+            for _ in range(reader.get()):
+                line_id, line_name = reader.get_strings(2)
+                line = Line(line_name, [], extid=line_id)
+                line_dipl_offsets.append((line, reader.get_ints()))
+                lines.append(line)
+            columns.append(Column(lines, name=column_name, extid=column_id))
+        pages.append(Page(page_name, side, columns, extid=page_id))
+
+    tokens = []
+    dipls = []
+    for _ in range(reader.get()):
+        token = reader.get_item()
+        tokens.append(token)
+        if isinstance(token, CoraToken):
+            dipls.extend(token.tok_dipls)
+
+    shifttags = []
+    for _ in range(reader.get()):
+        shifttag_type = reader.get_string()
+        start, end = reader.get(), reader.get()
+        shifttags.append(_make_shifttag(shifttag_type, tokens, start, end))
+
+    for line, offsets in line_dipl_offsets:
+        line.dipls = [dipls[offset] for offset in offsets]
+
+    return Document(sigle, name, header, pages, tokens, shifttags, header_string)
+
+
+def _make_shifttag(shifttag_type, tokens, start, end):
+    return ShiftTag(
+        shifttag_type,
+        [token for token in tokens[start : end + 1] if isinstance(token, CoraToken)],
+    )
+
+
+def _decode_strings(lengths, blob):
+    blob = str(blob, "utf-8")
+    strings = []
+    start = 0
+    for length in lengths:
+        strings.append(blob[start : start + length])
+        start += length
+    return strings
+
+
+def _decode_shapes(shape_ints, strings):
+    shapes = []
+    it = iter(shape_ints)
+    for class_index in it:
+        bool_names = [strings[next(it)] for _ in range(next(it))]
+        value_names = [strings[next(it)] for _ in range(next(it))]
+        shapes.append((_resolve_class(strings[class_index]), bool_names, value_names))
+    return shapes
+
+
+def _decode_kinds(shapes, kind_shapes, kind_bits, kind_values, strings):
+    """The kind table as pairs of character class and attributes."""
+    kinds = []
+    value_offset = 0
+    for shape_index, bits in zip(kind_shapes, kind_bits):
+        char_class, bool_names, value_names = shapes[shape_index]
+        attribs = dict()
+        for bit, name in enumerate(bool_names):
+            attribs[name] = bool(bits >> bit & 1)
+        for name in value_names:
+            index = kind_values[value_offset]
+            attribs[name] = strings[index] if index >= 0 else None
+            value_offset += 1
+        kinds.append((char_class, attribs))
+    return kinds
+
+
+class _Reader:
+    """Reads the structure stream written by _Writer."""
+
+    def __init__(self, strings, kinds, structure, start=0):
+        self.strings = strings
+        self.kinds = kinds
+        self.it = itertools.islice(structure, start, None)
+
+    def get(self):
+        return next(self.it)
+
+    def get_ints(self):
+        return [next(self.it) for _ in range(next(self.it))]
+
+    def get_string(self):
+        index = next(self.it)
+        return self.strings[index] if index >= 0 else None
+
+    def get_strings(self, count=None):
+        if count is None:
+            count = next(self.it)
+        return [self.get_string() for _ in range(count)]
+
+    def get_chars(self):
+        ## characters are created without calling __init__
+        chars = []
+        for kind in self.get_ints():
+            char_class, attribs = self.kinds[kind]
+            char = char_class.__new__(char_class)
+            char.__dict__.update(attribs)
+            chars.append(char)
+        return chars
+
+    def get_trans(self, trans_class, chars):
+        nr_runs = next(self.it)
+        if nr_runs < 0:
+            return None
+        parse = []
+        for _ in range(nr_runs):
+            start = next(self.it)
+            parse.extend(chars[start : start + next(self.it)])
+        return trans_class(parse)
+
+    def get_item(self):
+        """Reads a token or a comment written by _Writer.put_item."""
+        if self.get() == _COMMENT:
+            return CoraComment(self.get_string(), self.get_string())
+
+        token_id = self.get_string()
+        chars = self.get_chars()
+        token_trans = self.get_trans(Trans, chars)
+        errors = self.get_strings()
+        tok_dipls = []
+        for _ in range(self.get()):
+            dipl_id = self.get_string()
+            tok_dipls.append(TokDipl(self.get_trans(DiplTrans, chars), extid=dipl_id))
+        tok_annos = []
+        for _ in range(self.get()):
+            anno_id = self.get_string()
+            anno_trans = self.get_trans(AnnoTrans, chars)
+            checked = bool(self.get())
+            tags = {self.get_string(): self.get_string() for _ in range(self.get())}
+            tok_annos.append(
+                TokAnno(
+                    anno_trans,
+                    extid=anno_id,
+                    tags=tags,
+                    flags=set(self.get_strings()),
+                    checked=checked,
+                )
+            )
+        return CoraToken(
+            token_trans, tok_dipls, tok_annos, extid=token_id, errors=errors
+        )
@@ -1,5 +1,8 @@
 import logging
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import click
 from lxml import etree
@@ -7,6 +10,75 @@ from lxml import etree
 import coraxml_utils.parser
 from coraxml_utils.importer import create_importer
 from coraxml_utils.exporter import create_exporter
+from coraxml_utils.conversion_server import (
+    create_conversion_server,
+    DEFAULT_PORT as CONVERSION_PORT,
+)
+from coraxml_utils.token_server import (
+    create_token_server,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+)
+
+
+## file extensions of the output formats, used in output templates
+EXTENSIONS = {
+    "coraxml": "xml",
+    "trans": "txt",
+    "gatejson": "json",
+    "tei": "tei.xml",
+    "md": "md",
+    "tsv": "tsv",
+}
+
+
+def serialize(outdoc):
+
+    # convert special documents to text
+    if isinstance(outdoc, dict):
+        # json
+        outdoc = json.dumps(outdoc)
+    elif isinstance(outdoc, etree._ElementTree):
+        # xml
+        outdoc = etree.tostring(
+            outdoc, xml_declaration=True, pretty_print=True, encoding="utf-8"
+        )
+
+    # default: text
+    return outdoc
+
+
+def export_all(doc, formats, threads=1):
+    """
+    Exports a document into several formats, returns (format, output) pairs.
+
+    The exporters only read the document, with threads > 1 they are run
+    concurrently.
+    """
+
+    def export(to):
+        return to, serialize(create_exporter(to).export(doc))
+
+    if threads > 1 and len(formats) > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            return list(executor.map(export, formats))
+    return [export(to) for to in formats]
+
+
+def write_outputs(outputs, output_template, sigle, stem):
+    """Writes (format, output) pairs to the paths of the template, returns the paths."""
+    outpaths = []
+    for to, outdoc in outputs:
+        outpath = Path(
+            output_template.format(
+                sigle=sigle, stem=stem, format=to, ext=EXTENSIONS[to]
+            )
+        )
+        outpath.parent.mkdir(parents=True, exist_ok=True)
+        with click.open_file(str(outpath), "w", encoding="utf-8") as f:
+            click.echo(outdoc, file=f)
+        outpaths.append(outpath)
+    return outpaths
 
 
 @click.group()
@@ -28,10 +100,11 @@ def main():
 @click.option(
     "-t",
     "--to",
-    type=click.Choice(["coraxml", "trans", "gatejson", "tei", "md"]),
-    default="coraxml",
+    type=click.Choice(list(EXTENSIONS)),
+    multiple=True,
+    default=["coraxml"],
     show_default=True,
-    help="Format of the output.",
+    help="Format of the output, can be given several times.",
 )
 @click.option(
     "-P",
@@ -55,27 +128,373 @@ def main():
     help="Use strict parsing to prevent tokenization changes",
 )
 @click.option("-o", "--outfile", type=click.File("w"))
-def convert(infile, from_, to, parser, strict_parsing, outfile):
+@click.option(
+    "-O",
+    "--output-template",
+    help="Path of the output files, with the placeholders {sigle}, {stem} "
+    "(name of the input file), {format} and {ext}. "
+    "Required for several output formats.",
+)
+@click.option(
+    "-j",
+    "--threads",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of threads exporting the output formats.",
+)
+@click.option(
+    "--diagnostics",
+    "diagnostics_file",
+    type=click.File("w", encoding="utf-8"),
+    help="Write the warnings and errors of the import to this file (JSON) "
+    "instead of logging them.",
+)
+def convert(
+    infile,
+    from_,
+    to,
+    parser,
+    strict_parsing,
+    outfile,
+    output_template,
+    threads,
+    diagnostics_file,
+):
 
-    MyImporter = create_importer(from_, parser, strict=strict_parsing)
-    MyExporter = create_exporter(to)
+    formats = list(dict.fromkeys(to))
+    if len(formats) > 1 and output_template is None:
+        raise click.UsageError("Several output formats require --output-template.")
+
+    kwargs = {"strict": strict_parsing} if from_ == "coraxml" else {}
+    if diagnostics_file is not None:
+        kwargs["echo_diagnostics"] = False
+    MyImporter = create_importer(from_, parser, **kwargs)
 
     doc = MyImporter.import_from_file(infile)
+    if diagnostics_file is not None:
+        diagnostics_file.write(MyImporter.diagnostics.to_json(indent=2))
     if doc:
-        outdoc = MyExporter.export(doc)
-
-        # convert special documents to text
-        if isinstance(outdoc, dict):
-            # json
-            outdoc = json.dumps(outdoc)
-        elif isinstance(outdoc, etree._ElementTree):
-            # xml
-            outdoc = etree.tostring(
-                outdoc, xml_declaration=True, pretty_print=True, encoding="utf-8"
-            )
-
-        # default: text
-        click.echo(outdoc, file=outfile)
+        outputs = export_all(doc, formats, threads=threads)
+        if output_template is None:
+            for to, outdoc in outputs:
+                click.echo(outdoc, file=outfile)
+        else:
+            write_outputs(outputs, output_template, doc.sigle, Path(infile.name).stem)
     else:
         logging.error("Input document invalid")
         exit(1)
+
+
+@main.command("merge-annotations")
+@click.argument("infile", type=click.File("rb"))
+@click.argument("annotations", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "-P",
+    "--parser",
+    type=click.Choice(
+        [
+            key
+            for key in coraxml_utils.parser.dialect_mapper.keys()
+            if isinstance(key, str)
+        ]
+    ),
+    default="plain",
+    show_default=True,
+    help="Token parser of the CorA-XML dialect.",
+)
+@click.option(
+    "--format",
+    "annotation_format",
+    type=click.Choice(["tsv", "jsonl"]),
+    help="Format of the annotations.  [default: by file extension, else tsv]",
+)
+@click.option(
+    "--on-checked",
+    type=click.Choice(["skip", "fill", "overwrite", "error"]),
+    default="skip",
+    show_default=True,
+    help="What to do with tags of checked annos.",
+)
+@click.option(
+    "-t",
+    "--to",
+    type=click.Choice(list(EXTENSIONS)),
+    default="coraxml",
+    show_default=True,
+    help="Format of the output.",
+)
+@click.option("-o", "--outfile", type=click.File("w"))
+def merge_annotations(
+    infile, annotations, parser, annotation_format, on_checked, to, outfile
+):
+    """
+    Merge (anno id, tag, value) rows, e.g. tagger output, into a CorA-XML document.
+    """
+    from coraxml_utils.modifier import apply_annotations, read_annotation_rows
+
+    if annotation_format is None:
+        annotation_format = "jsonl" if annotations.name.endswith(".jsonl") else "tsv"
+
+    ## transcriptions are only parsed if the output format needs them
+    doc = create_importer(
+        "coraxml", parser, strict=False, lazy=True, passthrough=True
+    ).import_from_file(infile)
+    if not doc:
+        logging.error("Input document invalid")
+        exit(1)
+
+    try:
+        counts = apply_annotations(
+            doc, read_annotation_rows(annotations, annotation_format), on_checked
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(
+        "{applied} tags applied, {conflicts} skipped (checked), "
+        "{unknown} unknown annos".format(**counts),
+        err=True,
+    )
+
+    click.echo(serialize(create_exporter(to).export(doc)), file=outfile)
+
+
+@main.command("token-server")
+@click.option(
+    "-P",
+    "--parser",
+    "parsers",
+    type=click.Choice(
+        [
+            key
+            for key in coraxml_utils.parser.dialect_mapper.keys()
+            if isinstance(key, str)
+        ]
+    ),
+    multiple=True,
+    help="Token parsers to keep ready, can be given several times.  [default: all]",
+)
+@click.option("--host", default=DEFAULT_HOST, show_default=True)
+@click.option("--port", type=int, default=DEFAULT_PORT, show_default=True)
+def token_server(parsers, host, port):
+    """Serve token parses for CorA's token editing script (see check_and_parse_token.py)."""
+
+    if not parsers:
+        parsers = [
+            key
+            for key in coraxml_utils.parser.dialect_mapper.keys()
+            if isinstance(key, str)
+        ]
+
+    server = create_token_server(parsers, host=host, port=port)
+    click.echo("Serving token parses on http://{0}:{1}".format(host, port), err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@main.command()
+@click.argument(
+    "directory", type=click.Path(exists=True, file_okay=False), default="."
+)
+@click.option(
+    "-f",
+    "--from",
+    "from_",
+    type=click.Choice(["coraxml", "bonnxml", "trans"]),
+    default="trans",
+    show_default=True,
+    help="Format of the input.",
+)
+@click.option(
+    "-t",
+    "--to",
+    type=click.Choice(list(EXTENSIONS)),
+    multiple=True,
+    default=["coraxml"],
+    show_default=True,
+    help="Format of the output, can be given several times.",
+)
+@click.option(
+    "-P",
+    "--parser",
+    type=click.Choice(
+        [
+            key
+            for key in coraxml_utils.parser.dialect_mapper.keys()
+            if isinstance(key, str)
+        ]
+    ),
+    default="plain",
+    show_default=True,
+    help="Token parser to use.",
+)
+@click.option(
+    "--strict/--chill",
+    "strict_parsing",
+    default=True,
+    show_default=True,
+    help="Use strict parsing to prevent tokenization changes (CorA-XML input)",
+)
+@click.option(
+    "-O",
+    "--output-template",
+    required=True,
+    help="Path of the output files, with the placeholders {sigle}, {stem} "
+    "(name of the input file), {format} and {ext}.",
+)
+@click.option(
+    "--pattern",
+    "patterns",
+    multiple=True,
+    help="File name pattern of the inputs, can be given several times.  "
+    "[default: *.txt for trans, else *.xml]",
+)
+@click.option(
+    "--interval",
+    type=float,
+    default=0.5,
+    show_default=True,
+    help="Seconds between two scans of the directory.",
+)
+@click.option(
+    "--debounce",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Seconds a changed file has to stay unchanged before it is converted.",
+)
+@click.option(
+    "--initial/--no-initial",
+    default=False,
+    show_default=True,
+    help="Also convert the files that exist at startup.",
+)
+@click.option(
+    "-j",
+    "--threads",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of threads exporting the output formats.",
+)
+def watch(
+    directory,
+    from_,
+    to,
+    parser,
+    strict_parsing,
+    output_template,
+    patterns,
+    interval,
+    debounce,
+    initial,
+    threads,
+):
+    """
+    Convert the files in DIRECTORY again whenever they change.
+
+    The importer and its token parser are created once and reused for all
+    files, so a conversion takes about as long as parsing the file.
+    """
+    from coraxml_utils.corpus import import_document
+    from coraxml_utils.watcher import DirectoryWatcher
+
+    formats = list(dict.fromkeys(to))
+    kwargs = {"strict": strict_parsing} if from_ == "coraxml" else {}
+    MyImporter = create_importer(from_, parser, **kwargs)
+    watcher = DirectoryWatcher(
+        directory,
+        patterns or ["*.txt" if from_ == "trans" else "*.xml"],
+        interval=interval,
+        debounce=debounce,
+        initial=initial,
+    )
+
+    def convert_file(path):
+        start = time.perf_counter()
+        try:
+            doc = import_document(MyImporter, from_, path)
+            outpaths = write_outputs(
+                export_all(doc, formats, threads=threads),
+                output_template,
+                doc.sigle,
+                Path(path).stem,
+            )
+        except Exception as e:
+            logging.error("Converting %s failed: %s", path, e)
+            return
+        for outpath in outpaths:
+            watcher.ignore(outpath)
+        click.echo(
+            "{0} -> {1} ({2:.2f}s)".format(
+                path,
+                ", ".join(str(outpath) for outpath in outpaths),
+                time.perf_counter() - start,
+            ),
+            err=True,
+        )
+
+    click.echo("Watching {0} ...".format(directory), err=True)
+    try:
+        watcher.watch(convert_file)
+    except KeyboardInterrupt:
+        pass
+
+
+@main.command()
+@click.option("--host", default=DEFAULT_HOST, show_default=True)
+@click.option(
+    "--port",
+    type=int,
+    default=CONVERSION_PORT,
+    show_default=True,
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=2,
+    show_default=True,
+    help="Number of worker processes converting documents.",
+)
+@click.option(
+    "--queue-size",
+    type=click.IntRange(min=0),
+    default=8,
+    show_default=True,
+    help="Number of requests that may wait for a worker; "
+    "further requests are refused with status 503.",
+)
+@click.option(
+    "--preload",
+    multiple=True,
+    metavar="FORMAT:PARSER",
+    help="Importer to create in each worker in advance, e.g. trans:ref; "
+    "can be given several times.",
+)
+def serve(host, port, workers, queue_size, preload):
+    """
+    Serve conversions over HTTP (POST /convert?from=...&parser=...&to=...,
+    GET /metrics).
+    """
+    pairs = []
+    for pair in preload:
+        from_, sep, parser = pair.partition(":")
+        if not sep:
+            raise click.BadParameter("expected FORMAT:PARSER", param_hint="--preload")
+        pairs.append((from_, parser))
+
+    server = create_conversion_server(
+        host=host, port=port, workers=workers, queue_size=queue_size, preload=pairs
+    )
+    click.echo("Serving conversions on http://{0}:{1}".format(host, port), err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
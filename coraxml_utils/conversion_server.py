@@ -0,0 +1,372 @@
+"""
+Local server that converts documents, so that tools do not have to start
+`coraxml_utils convert` for each file:
+
+    POST /convert?from=trans&parser=ref&to=coraxml   body: the input file
+    GET  /metrics                                    request counts, latencies,
+                                                     parse statistics and counts
+                                                     of import diagnostics (JSON)
+
+The optional parameter `strict` (0 or 1) applies to CorA-XML input. Inputs
+and outputs are streamed through temporary files, and the conversions run
+in a pool of worker processes that keep their importers and exporters
+between requests. At most `workers + queue_size` requests are accepted at
+a time; further requests are answered with status 503 and `Retry-After`.
+
+`convert_remote` is the client side and only needs the standard library.
+"""
+
+import bisect
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+
+INPUT_FORMATS = ["coraxml", "bonnxml", "trans"]
+## exporters whose output can be sent as the response
+OUTPUT_FORMATS = ["coraxml", "trans", "gatejson", "tei", "md", "tsv"]
+## upper bounds (seconds) of the latency histogram
+LATENCY_BUCKETS = [0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0]
+CONTENT_TYPES = {
+    "coraxml": "application/xml",
+    "tei": "application/xml",
+    "gatejson": "application/json",
+}
+
+
+class ConversionError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+## importers and exporters of a worker process, by their settings
+_importers = dict()
+_exporters = dict()
+
+
+def _get_importer(from_, parser, strict):
+    from coraxml_utils.importer import create_importer
+
+    key = (from_, parser, strict)
+    if key not in _importers:
+        kwargs = {"strict": strict} if from_ == "coraxml" else {}
+        _importers[key] = create_importer(from_, parser, **kwargs)
+    return _importers[key]
+
+
+def _get_exporter(to):
+    from coraxml_utils.exporter import create_exporter
+
+    if to not in _exporters:
+        _exporters[to] = create_exporter(to)
+    return _exporters[to]
+
+
+def _init_worker(preload):
+    for from_, parser in preload:
+        _get_importer(from_, parser, True)
+
+
+def _convert_in_worker(from_, parser, to, strict, inpath, outpath):
+    """Converts the file at inpath into outpath, returns statistics."""
+    from coraxml_utils.corpus import import_document
+    from coraxml_utils.pipeline import _write_output
+
+    try:
+        importer = _get_importer(from_, parser, strict)
+        exporter = _get_exporter(to)
+    except ValueError as e:
+        raise ConversionError(str(e))
+
+    parse_stats = getattr(importer, "parse_stats", None)
+    stats_before = dict(parse_stats or {})
+    start = time.perf_counter()
+    try:
+        doc = import_document(importer, from_, inpath)
+    except Exception as e:
+        raise ConversionError("{0}: {1}".format(type(e).__name__, e))
+    import_seconds = time.perf_counter() - start
+    diagnostics = getattr(importer, "diagnostics", None)
+
+    start = time.perf_counter()
+    outdoc = exporter.export(doc)
+    with open(outpath, "wb") as outfile:
+        _write_output(outdoc, outfile)
+    return {
+        "sigle": doc.sigle,
+        "import_seconds": import_seconds,
+        "export_seconds": time.perf_counter() - start,
+        "parse_stats": {
+            name: count - stats_before.get(name, 0)
+            for name, count in (parse_stats or {}).items()
+        },
+        "diagnostics": diagnostics.counts() if diagnostics is not None else {},
+    }
+
+
+class ConversionMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.conversions = defaultdict(int)
+        self.rejected = 0
+        self.in_flight = 0
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.import_seconds = 0.0
+        self.export_seconds = 0.0
+        self.parse_stats = defaultdict(int)
+        self.diagnostics = defaultdict(int)
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+            self.requests[503] += 1
+
+    def finish(self, status, seconds, route=None, stats=None):
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[status] += 1
+            self.latency_count += 1
+            self.latency_sum += seconds
+            self.latency_max = max(self.latency_max, seconds)
+            self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            if route is not None:
+                self.conversions[route] += 1
+            if stats is not None:
+                self.import_seconds += stats["import_seconds"]
+                self.export_seconds += stats["export_seconds"]
+                for name, count in stats["parse_stats"].items():
+                    self.parse_stats[name] += count
+                for code, count in stats["diagnostics"].items():
+                    self.diagnostics[code] += count
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": {str(status): n for status, n in self.requests.items()},
+                "conversions": dict(self.conversions),
+                "rejected": self.rejected,
+                "in_flight": self.in_flight,
+                "latency": {
+                    "count": self.latency_count,
+                    "sum": self.latency_sum,
+                    "max": self.latency_max,
+                    "buckets": {
+                        str(bound): n
+                        for bound, n in zip(
+                            LATENCY_BUCKETS + ["inf"], self.latency_buckets
+                        )
+                    },
+                },
+                "import_seconds": self.import_seconds,
+                "export_seconds": self.export_seconds,
+                "parse_stats": dict(self.parse_stats),
+                "diagnostics": dict(self.diagnostics),
+            }
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if urllib.parse.urlparse(self.path).path != "/metrics":
+            self._respond(404, "text/plain", "Unknown path: " + self.path)
+            return
+        self._respond(
+            200, "application/json", json.dumps(self.server.metrics.snapshot())
+        )
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != "/convert":
+            self._respond(404, "text/plain", "Unknown path: " + self.path)
+            return
+        query = dict(urllib.parse.parse_qsl(url.query))
+        from_ = query.get("from", "coraxml")
+        parser = query.get("parser", "plain")
+        to = query.get("to", "coraxml")
+        strict = query.get("strict", "1") != "0"
+        if from_ not in INPUT_FORMATS:
+            self._respond(400, "text/plain", "Unknown input format: " + from_)
+            return
+        if to not in OUTPUT_FORMATS:
+            self._respond(400, "text/plain", "Unknown output format: " + to)
+            return
+
+        ## backpressure: refuse instead of queueing without limit
+        if not self.server.slots.acquire(blocking=False):
+            self.server.metrics.reject()
+            self.close_connection = True
+            self.send_response(503)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            return
+
+        self.server.metrics.start()
+        start = time.perf_counter()
+        status, route, stats = 500, None, None
+        inpath = outpath = None
+        try:
+            fd, inpath = tempfile.mkstemp(dir=self.server.tmpdir)
+            with os.fdopen(fd, "wb") as infile:
+                self._read_body(infile)
+            outpath = inpath + ".out"
+            stats = self.server.executor.submit(
+                _convert_in_worker, from_, parser, to, strict, inpath, outpath
+            ).result()
+        except ConversionError as e:
+            status = 400
+            self._respond(status, "text/plain", e.message)
+        except Exception as e:
+            logging.exception("Conversion failed")
+            self._respond(status, "text/plain", str(e))
+        else:
+            status, route = 200, from_ + ">" + to
+            self.send_response(status)
+            self.send_header(
+                "Content-Type",
+                CONTENT_TYPES.get(to, "text/plain") + "; charset=utf-8",
+            )
+            self.send_header("Content-Length", str(os.path.getsize(outpath)))
+            self.end_headers()
+            with open(outpath, "rb") as outfile:
+                shutil.copyfileobj(outfile, self.wfile)
+        finally:
+            for path in (inpath, outpath):
+                if path is not None and os.path.exists(path):
+                    os.unlink(path)
+            self.server.slots.release()
+            self.server.metrics.finish(
+                status, time.perf_counter() - start, route, stats
+            )
+
+    def _read_body(self, outfile, chunk_size=1 << 16):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    ## trailer
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                shutil.copyfileobj(_LimitedReader(self.rfile, size), outfile)
+                self.rfile.readline()
+        shutil.copyfileobj(
+            _LimitedReader(self.rfile, int(self.headers.get("Content-Length", 0))),
+            outfile,
+            chunk_size,
+        )
+
+    def _respond(self, status, content_type, body):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+class _LimitedReader:
+    """Reads at most size bytes from a file object."""
+
+    def __init__(self, infile, size):
+        self.infile = infile
+        self.remaining = size
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.infile.read(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+
+class ConversionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers=2, queue_size=8, preload=()):
+        super().__init__(address, ConversionRequestHandler)
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = self._tmpdir.name
+        self.metrics = ConversionMetrics()
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(list(preload),)
+        )
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown()
+        self._tmpdir.cleanup()
+
+
+def create_conversion_server(
+    host=DEFAULT_HOST, port=DEFAULT_PORT, workers=2, queue_size=8, preload=()
+):
+    """
+    Creates the server; preload lists (input format, parser) pairs whose
+    importers are created in each worker in advance.
+    """
+    return ConversionServer(
+        (host, port), workers=workers, queue_size=queue_size, preload=preload
+    )
+
+
+def convert_remote(
+    data,
+    from_="coraxml",
+    parser="plain",
+    to="coraxml",
+    url=None,
+    outfile=None,
+    timeout=60,
+):
+    """
+    Lets a running conversion server convert the input, returns the output
+    as bytes. A binary file object as input is sent in chunks, and with an
+    outfile, the output is copied into it instead of being returned.
+
+    Raises ConversionError if the input could not be converted and OSError
+    if the server is not reachable or busy (status 503).
+    """
+    if url is None:
+        url = "http://{0}:{1}".format(DEFAULT_HOST, DEFAULT_PORT)
+    request = urllib.request.Request(
+        url.rstrip("/")
+        + "/convert?"
+        + urllib.parse.urlencode({"from": from_, "parser": parser, "to": to}),
+        data=data,
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            if outfile is None:
+                return response.read()
+            shutil.copyfileobj(response, outfile)
+    except urllib.error.HTTPError as e:
+        if e.code == 400:
+            raise ConversionError(e.read().decode("utf-8"))
+        raise
@@ -0,0 +1,238 @@
+"""
+Client for the HTTP interface of CorA, as used by `bin/corascript.py`.
+
+Files are transferred concurrently by a bounded pool of workers, exported
+files are streamed to disk, and failed requests are retried with
+exponential backoff.  A `SyncManifest` remembers which version of each file
+has been downloaded, so that unchanged files are skipped on the next sync.
+
+Only the standard library is needed.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+
+from coraxml_utils.fileutils import write_atomically
+
+DEFAULT_BASE = "https://cora.linguistics.rub.de/"
+DEFAULT_MANIFEST = ".cora-manifest.json"
+
+## properties of a file in getProjectsAndFiles that change when it is edited
+CHANGE_FIELDS = ("changed", "changer_id")
+
+
+class SyncManifest:
+    """Records the version of each file that was last downloaded."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        try:
+            with open(filename, "r", encoding="utf-8") as manifest_file:
+                self.files = json.load(manifest_file)
+        except FileNotFoundError:
+            self.files = dict()
+
+    def is_unchanged(self, text, path):
+        entry = self.files.get(str(text["id"]))
+        if entry is None or not os.path.exists(path):
+            return False
+        return all(entry.get(field) == text.get(field) for field in CHANGE_FIELDS)
+
+    def update(self, text, path):
+        with self._lock:
+            self.files[str(text["id"])] = {
+                "path": os.path.basename(path),
+                **{field: text.get(field) for field in CHANGE_FIELDS},
+            }
+
+    def save(self):
+        with self._lock:
+            write_atomically(
+                self.filename,
+                lambda outfile: outfile.write(
+                    json.dumps(self.files, indent=2, sort_keys=True).encode("utf-8")
+                ),
+            )
+
+
+class CoraClient:
+    def __init__(
+        self,
+        base_url=DEFAULT_BASE,
+        username=None,
+        password=None,
+        retries=3,
+        backoff=1.0,
+        timeout=60,
+    ):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        ## the cookie jar is thread-safe, so all workers share one session
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar())
+        )
+        if username is not None:
+            self.login(username, password)
+
+    def login(self, username, password):
+        self._request(
+            self.base_url,
+            data={
+                "action": "login",
+                "loginform[un]": username,
+                "loginform[pw]": password,
+            },
+        )
+
+    def get_projects_and_files(self):
+        """returns json"""
+        return json.loads(self._request(self._url(do="getProjectsAndFiles")))
+
+    def export_XML_file(self, file_id):
+        """returns xml as bytes"""
+        return self._request(self._export_url(file_id))
+
+    def download_XML_file(self, file_id, path):
+        """streams the exported xml into the file at path"""
+        self._request(
+            self._export_url(file_id),
+            handle=lambda response: write_atomically(
+                path, lambda outfile: shutil.copyfileobj(response, outfile)
+            ),
+        )
+
+    def upload_XML_file(self, project_id, filepath, tagsets):
+        fields = {"action": "importXMLFile", "project": project_id}
+        for i, tag in enumerate(tagsets):
+            fields["linktagsets[{0}]".format(i)] = tag
+        with open(filepath, "rb") as xmlfile:
+            body, content_type = _encode_multipart(
+                fields, "xmlFile", os.path.basename(filepath), xmlfile.read()
+            )
+        ## not retried: CorA may have imported the file already when the
+        ## response fails, and a retry would import it a second time
+        return self._request(
+            self._url(),
+            data=body,
+            headers={"Content-Type": content_type},
+            retries=0,
+        )
+
+    def download_files(
+        self, texts, outdir, filename_key="id", manifest=None, workers=4
+    ):
+        """
+        Downloads the given texts (as listed by get_projects_and_files) into
+        outdir, using up to `workers` concurrent requests.
+
+        Texts that the manifest knows as unchanged are skipped.  Returns the
+        list of texts that were downloaded.
+        """
+
+        def path_of(text):
+            return os.path.join(outdir, str(text[filename_key]) + ".xml")
+
+        def download(text):
+            logging.info(
+                "exporting %s ...", (text["id"], text["sigle"], text["fullname"])
+            )
+            self.download_XML_file(text["id"], path_of(text))
+            if manifest is not None:
+                manifest.update(text, path_of(text))
+            return text
+
+        if manifest is not None:
+            texts = [
+                text for text in texts if not manifest.is_unchanged(text, path_of(text))
+            ]
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(download, texts))
+        finally:
+            ## keep track of the finished downloads even if some failed
+            if manifest is not None:
+                manifest.save()
+
+    def upload_files(self, project_id, filepaths, tagsets, workers=4):
+        """Uploads the files concurrently, returns the responses in order."""
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(
+                executor.map(
+                    lambda filepath: self.upload_XML_file(project_id, filepath, tagsets),
+                    filepaths,
+                )
+            )
+
+    def _url(self, **params):
+        url = self.base_url + "request.php"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        return url
+
+    def _export_url(self, file_id):
+        return self._url(do="exportFile", fileid=file_id, format="1")
+
+    def _request(self, url, data=None, headers=None, handle=None, retries=None):
+        """
+        Performs the request and passes the response to `handle` (default:
+        read the whole body).  Connection errors and server errors are
+        retried with exponential backoff (up to `retries` times, default:
+        self.retries); the response is handled inside the retry loop, so
+        that broken downloads are repeated as well.
+        """
+        if retries is None:
+            retries = self.retries
+        if isinstance(data, dict):
+            data = urllib.parse.urlencode(data).encode("utf-8")
+        if handle is None:
+            handle = lambda response: response.read()
+
+        for attempt in range(retries + 1):
+            request = urllib.request.Request(url, data=data, headers=headers or {})
+            try:
+                with self.opener.open(request, timeout=self.timeout) as response:
+                    return handle(response)
+            except urllib.error.HTTPError as e:
+                if e.code < 500 or attempt == retries:
+                    raise
+                error = e
+            except OSError as e:
+                if attempt == retries:
+                    raise
+                error = e
+            delay = self.backoff * 2 ** attempt
+            logging.warning("Request to %s failed (%s), retrying in %ss", url, error, delay)
+            time.sleep(delay)
+
+
+def _encode_multipart(fields, file_field, filename, content):
+    boundary = uuid.uuid4().hex
+    lines = []
+    for name, value in fields.items():
+        lines.append(
+            '--{0}\r\nContent-Disposition: form-data; name="{1}"\r\n\r\n{2}\r\n'.format(
+                boundary, name, value
+            ).encode("utf-8")
+        )
+    lines.append(
+        (
+            '--{0}\r\nContent-Disposition: form-data; name="{1}"; filename="{2}"\r\n'
+            "Content-Type: text/xml\r\n\r\n"
+        ).format(boundary, file_field, filename).encode("utf-8")
+    )
+    lines.append(content + b"\r\n")
+    lines.append("--{0}--\r\n".format(boundary).encode("utf-8"))
+    return b"".join(lines), "multipart/form-data; boundary=" + boundary
@@ -6,10 +6,75 @@ from coraxml_utils.character import Whitespace
 from coraxml_utils.settings import DEFAULT_VAL
 
 
+class _ParseList(list):
+    """A list of characters that counts how often it has been modified."""
+
+    version = 0
+
+
+def _counting_method(name):
+    method = getattr(list, name)
+
+    def counting_method(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self.version += 1
+        return result
+
+    counting_method.__name__ = name
+    return counting_method
+
+
+for _name in [
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "sort",
+    "reverse",
+]:
+    setattr(_ParseList, _name, _counting_method(_name))
+
+
 class BaseTrans:
+    """
+    A transcription, i.e. a list of characters (`parse`).
+
+    Values derived from the parse (trans, utf, simple, segmentation) are
+    computed once and cached until `parse` is reassigned or the list is
+    modified. Changes to the attributes of the characters themselves are
+    not tracked.
+    """
+
     def __init__(self, myparse):
         self.parse = myparse
 
+    @property
+    def parse(self):
+        return self._parse
+
+    @parse.setter
+    def parse(self, myparse):
+        if not isinstance(myparse, _ParseList):
+            myparse = _ParseList(myparse)
+        self._parse = myparse
+        self._strings = dict()
+        self._strings_version = myparse.version
+
+    def _cached(self, form, make_value):
+        if self._strings_version != self._parse.version:
+            self._strings = dict()
+            self._strings_version = self._parse.version
+        value = self._strings.get(form)
+        if value is None:
+            value = self._strings[form] = make_value()
+        return value
+
     def __len__(self):
         return len(self.parse)
 
@@ -26,6 +91,9 @@ class BaseTrans:
         return self.__class__(self.parse + other.parse)
 
     def trans(self):
+        return self._cached("trans", self._make_trans)
+
+    def _make_trans(self):
         return "".join([c.string for c in self.parse if not isinstance(c, Whitespace)])
 
     def keep(self, t):
@@ -51,9 +119,15 @@ class AnnoTrans(BaseTrans):
         super().__init__(myparse)
 
     def utf(self):
+        return self._cached("utf", self._make_utf)
+
+    def _make_utf(self):
         return "".join(c.anno_utf for c in self.parse)
 
     def simple(self):
+        return self._cached("simple", self._make_simple)
+
+    def _make_simple(self):
         return "".join(c.anno_simple for c in self.parse)
 
 
@@ -63,6 +137,9 @@ class DiplTrans(BaseTrans):
         self.subtoken_annos = subtoken
 
     def utf(self):
+        return self._cached("utf", self._make_utf)
+
+    def _make_utf(self):
         return "".join(c.dipl_utf for c in self.parse)
 
     def get_subtoken_tree(self):
@@ -85,35 +162,59 @@ class Trans(BaseTrans):
     #  brackets are open due to tokenization and are not
     #  transcription errors)
     def tokenize_anno(self):
-        output_tokens = list()
-
-        ## if anno_utf is empty there are no anno tokens, e.g. in the case of deletions
-        if not "".join(c.anno_utf for c in self.parse):
-            return output_tokens
-
-        stack = list()
-        for c in self.parse:
-            if c.anno_bound and not c.token_bound:
-                output_tokens.append(AnnoTrans(stack).delete(Whitespace))
-                stack = list()
-            stack.append(c)
-        if stack:
-            output_tokens.append(AnnoTrans(stack).delete(Whitespace))
-        return output_tokens
+        return self._sub_transs(AnnoTrans, self.anno_ranges())
 
     def tokenize_dipl(self):
-        output_tokens = list()
-        stack = list()
-        for c in self.parse:
-            if c.dipl_bound and not c.token_bound:
-                output_tokens.append(
-                    DiplTrans(stack, subtoken=self.subtoken_annos).delete(Whitespace)
-                )
-                stack = list()
-            stack.append(c)
-        if stack:
-            output_tokens.append(DiplTrans(stack).delete(Whitespace))
-        return output_tokens
+        return self._sub_transs(DiplTrans, self.dipl_ranges())
+
+    def anno_ranges(self):
+        """
+        Returns the segmentation into anno tokens as a list of
+        (start, end, has_whitespace) index triples into the parse.
+        """
+        return self._cached("anno_ranges", self._make_anno_ranges)
+
+    def dipl_ranges(self):
+        """
+        Returns the segmentation into dipl tokens as a list of
+        (start, end, has_whitespace) index triples into the parse.
+        """
+        return self._cached("dipl_ranges", self._make_dipl_ranges)
+
+    def _make_anno_ranges(self):
+        ## if anno_utf is empty there are no anno tokens, e.g. in the case of deletions
+        if not any(c.anno_utf for c in self.parse):
+            return list()
+        return self._make_ranges(lambda c: c.anno_bound)
+
+    def _make_dipl_ranges(self):
+        return self._make_ranges(lambda c: c.dipl_bound)
+
+    def _make_ranges(self, is_bound):
+        ranges = list()
+        start = 0
+        has_whitespace = False
+        for idx, c in enumerate(self.parse):
+            if is_bound(c) and not c.token_bound:
+                ranges.append((start, idx, has_whitespace))
+                start = idx
+                has_whitespace = False
+            if isinstance(c, Whitespace):
+                has_whitespace = True
+        if start < len(self.parse):
+            ranges.append((start, len(self.parse), has_whitespace))
+        return ranges
+
+    def _sub_transs(self, trans_class, ranges):
+        parse = self.parse
+        return [
+            trans_class(
+                [c for c in parse[start:end] if not isinstance(c, Whitespace)]
+                if has_whitespace
+                else parse[start:end]
+            )
+            for start, end, has_whitespace in ranges
+        ]
 
 
 class SubtokenAnno:
@@ -153,6 +254,91 @@ class IdentifiableObjectMixin:
         self.id = extid if extid else self._id
 
 
+class LazyTransMixin:
+    """
+    Allows the transcription of an object to be parsed on first access.
+
+    As long as the transcription has not been parsed, the attribute `trans`
+    is not set and the raw transcription is kept in `raw_trans`. Accessing
+    `trans` calls the loader function, which has to resolve the transcription.
+    """
+
+    def set_lazy_trans(self, raw_trans, load_trans):
+        self.__dict__.pop("trans", None)
+        self.raw_trans = raw_trans
+        self._load_trans = load_trans
+
+    def resolve_lazy_trans(self, trans):
+        ## transcriptions that were set in the meantime are kept
+        if self.__dict__.pop("_load_trans", None) is not None:
+            self.__dict__.setdefault("trans", trans)
+
+    def is_parsed(self):
+        return "trans" in self.__dict__
+
+    def parse_lazy_trans(self):
+        """Parses the transcription now if that has not happened yet."""
+        load_trans = self.__dict__.get("_load_trans")
+        if load_trans is not None:
+            load_trans()
+
+    def __getattr__(self, name):
+        if name == "trans":
+            load_trans = self.__dict__.get("_load_trans")
+            if load_trans is not None:
+                load_trans()
+                return self.__dict__["trans"]
+        raise AttributeError(
+            "'{0}' object has no attribute '{1}'".format(self.__class__.__name__, name)
+        )
+
+
+class PassthroughMixin:
+    """
+    Keeps the XML attributes an object was imported from.
+
+    The attributes are only handed out as long as the transcription of the
+    object has not been modified, i.e. the same transcription object with
+    the same characters is still in place.
+    """
+
+    def set_original_attrib(self, attrib):
+        self.original_attrib = dict(attrib)
+        trans = self.__dict__.get("trans")
+        self._original_parse = (
+            (trans, list(trans.parse)) if trans is not None else None
+        )
+
+    def discard_original_attrib(self):
+        self.__dict__.pop("original_attrib", None)
+
+    def get_original_attrib(self):
+        original_attrib = self.__dict__.get("original_attrib")
+        if original_attrib is None:
+            return None
+        ## unparsed transcriptions (lazy import) cannot have been modified
+        if not self.__dict__.get("_load_trans") and not self._trans_unmodified():
+            return None
+        return original_attrib
+
+    def resolve_lazy_trans(self, trans):
+        unresolved = "_load_trans" in self.__dict__ and "trans" not in self.__dict__
+        super().resolve_lazy_trans(trans)
+        if unresolved and "original_attrib" in self.__dict__ and trans is not None:
+            self._original_parse = (trans, list(trans.parse))
+
+    def _trans_unmodified(self):
+        if self._original_parse is None:
+            return False
+        original_trans, original_parse = self._original_parse
+        trans = self.__dict__.get("trans")
+        return (
+            trans is original_trans
+            and len(trans.parse) == len(original_parse)
+            and all(a is b for a, b in zip(trans.parse, original_parse))
+        )
+
+
 class Document:
     def __init__(
         self,
@@ -175,41 +361,74 @@ class Document:
         self.shifttags = shifttags if shifttags else []
         self.annospans = annospans if annospans else []
 
-        self._create_indices()
+        self.annotation_index = None
+        self._indices_stale = True
 
-    ## TODO this should be called when document is changed
-    def _create_indices(self):
+    def layout_changed(self):
+        """
+        Marks the indices of pages, columns and lines as outdated; they are
+        created again when they are used next. Has to be called when pages,
+        columns, lines or the dipls of lines are changed (exporters that use
+        the indices call it themselves).
+        """
+        self._indices_stale = True
 
-        ## create index of line beginnings and endings
-        self.index_line_beginnings = frozenset(
-            [
-                line.dipls[0]._id
-                for page in self.pages
-                for column in page.columns
-                for line in column.lines
-            ]
-        )
+    def _index(self, name):
+        if self._indices_stale:
+            self._create_indices()
+        return getattr(self, name)
 
-        self.index_line_endings = frozenset(
-            [
-                line.dipls[-1]._id
-                for page in self.pages
-                for column in page.columns
-                for line in column.lines
-            ]
-        )
+    def _create_indices(self):
 
-        self.dipl_line_index = {
-            dipl._id: line
-            for page in self.pages
-            for column in page.columns
-            for line in column.lines
-            for dipl in line.dipls
-        }
+        ## create indices of page, column and line beginnings and endings
+        ## (id of first/last dipl -> page/column/line) and of the line of each dipl
+        self._indices_stale = False
+        self.index_page_beginnings = dict()
+        self.index_page_endings = dict()
+        self.index_column_beginnings = dict()
+        self.index_column_endings = dict()
+        self.index_line_beginnings = dict()
+        self.index_line_endings = dict()
+        self.dipl_line_index = dict()
+
+        for page in self.pages:
+            page_lines = list()
+            for column in page.columns:
+                column_lines = [line for line in column.lines if line.dipls]
+                for line in column_lines:
+                    self.index_line_beginnings[line.dipls[0]._id] = line
+                    self.index_line_endings[line.dipls[-1]._id] = line
+                    for dipl in line.dipls:
+                        self.dipl_line_index[dipl._id] = line
+                if column_lines:
+                    self.index_column_beginnings[
+                        column_lines[0].dipls[0]._id
+                    ] = column
+                    self.index_column_endings[column_lines[-1].dipls[-1]._id] = column
+                page_lines.extend(column_lines)
+            if page_lines:
+                self.index_page_beginnings[page_lines[0].dipls[0]._id] = page
+                self.index_page_endings[page_lines[-1].dipls[-1]._id] = page
 
     def __bool__(self):
         return bool(self.pages and self.tokens)
 
+    def create_annotation_index(self):
+        """
+        Indexes the tags and flags of all annos of the document.
+
+        The index follows all later changes of tags and flags, but annos
+        that are added to the document afterwards have to be added to it
+        with `annotation_index.add`.
+        """
+        self.annotation_index = AnnotationIndex(
+            anno
+            for token in self.tokens
+            if isinstance(token, CoraToken)
+            for anno in token.tok_annos
+        )
+        return self.annotation_index
+
     def add_line(self, bibinfo):
         new_line = Line(bibinfo["line"], [])
         if self.pages:
@@ -231,16 +450,38 @@ class Document:
             new_page = Page(bibinfo["page"], bibinfo["side"], [new_col])
             self.pages.append(new_page)
 
+        self.layout_changed()
         return new_line
 
     def is_beginning_of_line(self, tok_dipl):
-        return tok_dipl._id in self.index_line_beginnings
+        return tok_dipl._id in self._index("index_line_beginnings")
 
     def is_end_of_line(self, tok_dipl):
-        return tok_dipl._id in self.index_line_endings
+        return tok_dipl._id in self._index("index_line_endings")
 
     def get_line_for_dipl(self, tok_dipl):
-        return self.dipl_line_index.get(tok_dipl._id, None)
+        return self._index("dipl_line_index").get(tok_dipl._id, None)
+
+    def line_of(self, tok_dipl):
+        return self._index("dipl_line_index").get(tok_dipl._id, None)
+
+    def page_starting_at(self, tok_dipl):
+        return self._index("index_page_beginnings").get(tok_dipl._id, None)
+
+    def page_ending_at(self, tok_dipl):
+        return self._index("index_page_endings").get(tok_dipl._id, None)
+
+    def column_starting_at(self, tok_dipl):
+        return self._index("index_column_beginnings").get(tok_dipl._id, None)
+
+    def column_ending_at(self, tok_dipl):
+        return self._index("index_column_endings").get(tok_dipl._id, None)
+
+    def line_starting_at(self, tok_dipl):
+        return self._index("index_line_beginnings").get(tok_dipl._id, None)
+
+    def line_ending_at(self, tok_dipl):
+        return self._index("index_line_endings").get(tok_dipl._id, None)
 
 
 class Page(IdentifiableObjectMixin):
@@ -321,7 +562,7 @@ class Line(IdentifiableObjectMixin):
             return first.id
 
 
-class CoraToken(IdentifiableObjectMixin):
+class CoraToken(PassthroughMixin, LazyTransMixin, IdentifiableObjectMixin):
     def from_parse(parse):
         return CoraToken(
             parse,
@@ -365,7 +606,7 @@ class CoraToken(IdentifiableObjectMixin):
             self.tok_annos.extend(tok.tok_annos)
 
 
-class TokDipl(IdentifiableObjectMixin):
+class TokDipl(PassthroughMixin, LazyTransMixin, IdentifiableObjectMixin):
     def __init__(self, trans: DiplTrans, extid=""):
         self._set_id("d", extid)
         self.trans = trans
@@ -377,12 +618,104 @@ class TokDipl(IdentifiableObjectMixin):
         return (self.id == other.id) and (self.trans == other.trans)
 
 
+class _TagDict(dict):
+    """The tags of an annotatable element, which reports modifications to it."""
+
+    def __init__(self, element, tags=()):
+        self._element = element
+        super().__init__(tags)
+
+    def __reduce__(self):
+        return (_TagDict, (self._element, dict(self)))
+
+
+class _FlagSet(set):
+    """The flags of an annotatable element, which reports modifications to it."""
+
+    def __init__(self, element, flags=()):
+        self._element = element
+        super().__init__(flags)
+
+    def __reduce__(self):
+        return (_FlagSet, (self._element, set(self)))
+
+
+def _reporting_method(base, name):
+    method = getattr(base, name)
+
+    def reporting_method(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._element._annotations_changed()
+        return result
+
+    reporting_method.__name__ = name
+    return reporting_method
+
+
+for _name in [
+    "__setitem__",
+    "__delitem__",
+    "clear",
+    "pop",
+    "popitem",
+    "setdefault",
+    "update",
+]:
+    setattr(_TagDict, _name, _reporting_method(dict, _name))
+## dict supports |= only from Python 3.9 on
+if hasattr(dict, "__ior__"):
+    setattr(_TagDict, "__ior__", _reporting_method(dict, "__ior__"))
+
+for _name in [
+    "__ior__",
+    "__iand__",
+    "__isub__",
+    "__ixor__",
+    "add",
+    "clear",
+    "discard",
+    "pop",
+    "remove",
+    "update",
+    "difference_update",
+    "intersection_update",
+    "symmetric_difference_update",
+]:
+    setattr(_FlagSet, _name, _reporting_method(set, _name))
+
+
 class AnnotatableElement:
+
+    ## index the element is registered with, see AnnotationIndex
+    _annotation_index = None
+
     def __init__(self, tags=None, flags=None):
 
         self.tags = tags if tags else dict()
         self.flags = flags if flags else set()
 
+    @property
+    def tags(self):
+        return self._tags
+
+    @tags.setter
+    def tags(self, tags):
+        self._tags = _TagDict(self, tags)
+        self._annotations_changed()
+
+    @property
+    def flags(self):
+        return self._flags
+
+    @flags.setter
+    def flags(self, flags):
+        self._flags = _FlagSet(self, flags)
+        self._annotations_changed()
+
+    def _annotations_changed(self):
+        if self._annotation_index is not None:
+            self._annotation_index.mark_modified(self)
+
     def append_annotation(self, tagname, tag, sep=" "):
 
         oldval = self.tags.get(tagname, DEFAULT_VAL)
@@ -393,7 +726,9 @@ class AnnotatableElement:
             self.tags[tagname] = tag
 
 
-class TokAnno(AnnotatableElement, IdentifiableObjectMixin):
+class TokAnno(
+    PassthroughMixin, LazyTransMixin, AnnotatableElement, IdentifiableObjectMixin
+):
 
     ## TODO: move to coraxml_exporter, dialect="rem"
     # annos_order = ["norm", "token_type", "lemma", "lemma_gen", "lemma_idmwb",
@@ -422,6 +757,104 @@ class TokAnno(AnnotatableElement, IdentifiableObjectMixin):
         self.trans.parse += other.trans.parse
 
 
+class AnnotationIndex:
+    """
+    Maps (tag name, value) pairs, tag names and flag names to annos.
+
+    Modifications of the tags and flags of indexed annos are reported to the
+    index and taken into account on the next lookup, so that a lookup only
+    costs O(matches + modified annos). Results are in the order in which the
+    annos were indexed.
+    """
+
+    def __init__(self, annos=()):
+
+        self._positions = dict()
+        self._annos = dict()
+        ## (name, value) / name -> {internal id of anno: anno}
+        self._by_tag = defaultdict(dict)
+        self._by_tag_name = defaultdict(dict)
+        self._by_flag = defaultdict(dict)
+        ## keys under which an anno is currently indexed
+        self._keys = dict()
+        self._modified = dict()
+
+        for anno in annos:
+            self.add(anno)
+
+    def add(self, anno):
+        anno_id = anno._id
+        if anno._annotation_index is not None and anno._annotation_index is not self:
+            anno._annotation_index.remove(anno)
+        self._positions.setdefault(anno_id, len(self._positions))
+        self._annos[anno_id] = anno
+        anno._annotation_index = self
+        self._index(anno)
+
+    def remove(self, anno):
+        anno_id = anno._id
+        self._unindex(anno_id)
+        self._annos.pop(anno_id, None)
+        self._modified.pop(anno_id, None)
+        if anno._annotation_index is self:
+            anno._annotation_index = None
+
+    def mark_modified(self, anno):
+        self._modified[anno._id] = anno
+
+    def annos_with_tag(self, name, value=None):
+        """All annos with the given tag (and value, if given)."""
+        if value is None:
+            return self._lookup(self._by_tag_name, name)
+        return self._lookup(self._by_tag, (name, value))
+
+    def annos_with_flag(self, name):
+        return self._lookup(self._by_flag, name)
+
+    def tag_values(self, name):
+        """The values of the given tag and how many annos have them."""
+        self._update()
+        return {
+            value: len(annos)
+            for (tag_name, value), annos in self._by_tag.items()
+            if tag_name == name and annos
+        }
+
+    def _lookup(self, mapping, key):
+        self._update()
+        annos = mapping.get(key)
+        if not annos:
+            return []
+        positions = self._positions
+        return sorted(annos.values(), key=lambda anno: positions[anno._id])
+
+    def _update(self):
+        while self._modified:
+            _, anno = self._modified.popitem()
+            self._unindex(anno._id)
+            self._index(anno)
+
+    def _index(self, anno):
+        anno_id = anno._id
+        keys = []
+        for name, value in anno.tags.items():
+            self._by_tag[(name, value)][anno_id] = anno
+            self._by_tag_name[name][anno_id] = anno
+            keys.append((self._by_tag, (name, value)))
+            keys.append((self._by_tag_name, name))
+        for name in anno.flags:
+            self._by_flag[name][anno_id] = anno
+            keys.append((self._by_flag, name))
+        self._keys[anno_id] = keys
+
+    def _unindex(self, anno_id):
+        for mapping, key in self._keys.pop(anno_id, ()):
+            annos = mapping[key]
+            annos.pop(anno_id, None)
+            if not annos:
+                del mapping[key]
+
+
 class AnnoSpan(AnnotatableElement):
     def __init__(self, annos, tags=None, flags=None):
         self.annos = annos
@@ -0,0 +1,209 @@
+"""
+A directory of documents that are loaded on demand.
+
+The files of a corpus are listed in a manifest (`corpus.json` in the
+directory), with their format and dialect:
+
+    {
+      "format": "coraxml",
+      "dialect": "ref",
+      "documents": [
+        {"path": "ref-1.xml"},
+        {"path": "ref-2.txt", "format": "trans"}
+      ]
+    }
+
+Documents are imported with the existing importers when they are first
+used. Only a limited number of them is kept in memory, limited by count or
+by an estimate of their size, and the least recently used ones are dropped:
+
+    corpus = Corpus("texts", max_documents=10)
+    for name, token, anno in corpus.iter_annos():
+        ...
+"""
+
+import json
+import logging
+import os
+from collections import OrderedDict
+
+from coraxml_utils.coralib import CoraToken
+from coraxml_utils.importer import create_importer
+
+MANIFEST = "corpus.json"
+
+## file extensions of the formats, used when a manifest is created
+EXTENSIONS = {
+    "coraxml": (".xml",),
+    "bonnxml": (".xml",),
+    "trans": (".txt",),
+}
+
+## memory use of imported documents, measured with tracemalloc: about
+## 600 bytes per token, dipl and anno and per character of a transcription
+ELEMENT_BYTES = 600
+CHAR_BYTES = 600
+
+
+def estimate_size(doc):
+    """A rough estimate of the memory that an imported document uses."""
+    size = 0
+    for token in doc.tokens:
+        if isinstance(token, CoraToken):
+            size += ELEMENT_BYTES * (1 + len(token.tok_dipls) + len(token.tok_annos))
+            ## unparsed transcriptions (lazy import) are not parsed for this
+            if token.is_parsed():
+                ## tokens that could not be parsed have no transcription
+                if token.trans is not None:
+                    size += CHAR_BYTES * len(token.trans.parse)
+            else:
+                size += CHAR_BYTES * len(token.raw_trans)
+    return size
+
+
+def import_document(importer, file_format, path):
+    """Imports the file at path with an importer of the format."""
+    if file_format == "trans":
+        with open(path, "r", encoding="utf-8") as infile:
+            doc = importer.import_from_string(infile.read().replace("\ufeff", ""))
+    else:
+        doc = importer.import_from_file(path)
+    if not doc:
+        raise ValueError("Document {0} could not be imported".format(path))
+    return doc
+
+
+def create_manifest(directory, file_format, dialect, extensions=None):
+    """
+    Writes a manifest that lists all files of the format in the directory
+    (recursively), returns the manifest.
+    """
+    if extensions is None:
+        extensions = EXTENSIONS[file_format]
+    paths = []
+    for root, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename != MANIFEST and filename.lower().endswith(tuple(extensions)):
+                paths.append(
+                    os.path.relpath(os.path.join(root, filename), directory)
+                )
+
+    manifest = {
+        "format": file_format,
+        "dialect": dialect,
+        "documents": [{"path": path.replace(os.sep, "/")} for path in paths],
+    }
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as outfile:
+        json.dump(manifest, outfile, indent=2)
+    return manifest
+
+
+class Corpus:
+    """
+    The documents listed in the manifest of a directory.
+
+    Documents are addressed by name (the "name" of their manifest entry,
+    by default the path without extension). At most max_documents of them,
+    and documents of at most max_bytes (see estimate_size) in total, are
+    kept in memory; None means no limit. A document that is larger than
+    max_bytes on its own is still returned, but not kept.
+    """
+
+    def __init__(
+        self, directory, manifest=MANIFEST, max_documents=None, max_bytes=None
+    ):
+        self.directory = directory
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+
+        with open(os.path.join(directory, manifest), "r", encoding="utf-8") as infile:
+            manifest = json.load(infile)
+        self.entries = OrderedDict()
+        for entry in manifest["documents"]:
+            entry = dict(entry)
+            entry.setdefault("format", manifest.get("format", "coraxml"))
+            entry.setdefault("dialect", manifest.get("dialect"))
+            entry.setdefault("options", manifest.get("options", dict()))
+            name = entry.setdefault("name", os.path.splitext(entry["path"])[0])
+            if name in self.entries:
+                raise ValueError("Document name {0} is not unique".format(name))
+            self.entries[name] = entry
+
+        self.importers = dict()
+        ## name -> (document, estimated size), least recently used first
+        self.resident = OrderedDict()
+        self.resident_bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __getitem__(self, name):
+        if name in self.resident:
+            self.resident.move_to_end(name)
+            return self.resident[name][0]
+
+        doc = self._import(self.entries[name])
+        size = estimate_size(doc) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            ## would evict all other documents and then itself
+            return doc
+        self.resident[name] = (doc, size)
+        self.resident_bytes += size
+        self._shrink()
+        return doc
+
+    def evict(self, name):
+        """Drops the document from memory; it is imported again when needed."""
+        if name in self.resident:
+            _, size = self.resident.pop(name)
+            self.resident_bytes -= size
+
+    def _shrink(self):
+        while self.resident and (
+            (self.max_documents is not None and len(self.resident) > self.max_documents)
+            or (self.max_bytes is not None and self.resident_bytes > self.max_bytes)
+        ):
+            self.evict(next(iter(self.resident)))
+
+    def _importer(self, entry):
+        key = (
+            entry["format"],
+            entry["dialect"],
+            json.dumps(entry["options"], sort_keys=True),
+        )
+        importer = self.importers.get(key)
+        if importer is None:
+            importer = self.importers[key] = create_importer(
+                entry["format"], entry["dialect"], **entry["options"]
+            )
+        return importer
+
+    def _import(self, entry):
+        path = os.path.join(self.directory, entry["path"])
+        logging.info("Importing %s", path)
+        return import_document(self._importer(entry), entry["format"], path)
+
+    def documents(self, names=None):
+        """Yields (name, document) pairs in the order of the manifest."""
+        for name in self.entries if names is None else names:
+            yield name, self[name]
+
+    def iter_tokens(self, names=None):
+        """Yields (name, token) for the tokens of all documents."""
+        for name, doc in self.documents(names):
+            for token in doc.tokens:
+                if isinstance(token, CoraToken):
+                    yield name, token
+
+    def iter_annos(self, names=None):
+        """Yields (name, token, anno) for the annos of all documents."""
+        for name, token in self.iter_tokens(names):
+            for anno in token.tok_annos:
+                yield name, token, anno
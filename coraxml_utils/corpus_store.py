@@ -0,0 +1,474 @@
+"""
+Memory-mapped store of many documents.
+
+A store is a directory with two append-only files:
+
+    corpus.data   -- one block per appended document: a record per item of
+                     its token list, followed by a document record (sigle,
+                     header, layout, ids of tokens and annos, shifttags and
+                     the offsets of the item records)
+    corpus.index  -- one entry per appended document: the sigle and the
+                     offset of its document record
+
+Records use the encoding of coraxml_utils.binary_format: every item record
+has its own string and kind tables, while the character shapes are shared
+by the whole document. Both files are read through `mmap`, so
+
+    store = CorpusStore("corpus")
+    store["A1"].token(10)
+    store.get_anno("t11_m1", sigle="A1")
+
+decode only the records that are asked for, and processes that open the
+same store share the pages of the files instead of holding copies.
+
+Appending a document with a sigle that is already stored replaces it for
+new lookups; the old block stays in the data file. Appends of several
+processes are serialized with a lock on the index, and readers see new
+documents after `refresh()` (done automatically for unknown sigles).
+"""
+
+import array
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from coraxml_utils.binary_format import (
+    _COMMENT,
+    _TOKEN,
+    _Reader,
+    _Writer,
+    _decode_kinds,
+    _decode_shapes,
+    _decode_strings,
+    _make_shifttag,
+    _shifttag_positions,
+    _without_gc,
+)
+from coraxml_utils.coralib import Column, CoraToken, Document, Line, Page
+
+DATA_MAGIC = b"CXUD"
+INDEX_MAGIC = b"CXUI"
+VERSION = 2
+
+DATA_FILE = "corpus.data"
+INDEX_FILE = "corpus.index"
+
+_HEADER = struct.Struct("<4sHxx")
+_COUNT = struct.Struct("<I")
+_OFFSET = struct.Struct("<Q")
+## index entry: length of the sigle, offset of the document record
+_ENTRY = struct.Struct("<IQ")
+_ALIGNMENT = 8
+
+
+def _pad(outfile, base=0):
+    padding = -(base + outfile.tell()) % _ALIGNMENT
+    outfile.write(b"\0" * padding)
+
+
+def _write_array(outfile, values):
+    if sys.byteorder == "big":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    outfile.write(_COUNT.pack(len(values)))
+    outfile.write(values.tobytes())
+
+
+def _write_record(outfile, writer, base, shapes=False):
+    """
+    Writes the tables and the structure of writer at an aligned offset and
+    returns that offset (base is the offset of outfile in the data file).
+    """
+    _pad(outfile, base)
+    offset = base + outfile.tell()
+    shape_ints = writer.shape_ints() if shapes else array.array("i")
+    lengths, blob = writer.string_table()
+    _write_array(outfile, lengths)
+    outfile.write(_COUNT.pack(len(blob)))
+    outfile.write(blob)
+    ## keep the integer arrays aligned for memoryview.cast
+    outfile.write(b"\0" * (-len(blob) % 4))
+    for values in [
+        shape_ints,
+        writer.kind_shapes,
+        writer.kind_bits,
+        writer.kind_values,
+        writer.structure,
+    ]:
+        _write_array(outfile, values)
+    return offset
+
+
+class _RecordView:
+    """The tables of a record, as views of the mapped data file."""
+
+    def __init__(self, buffer, offset):
+        self.buffer = buffer
+        self.offset = offset
+        lengths = self._array("I")
+        blob = self._bytes()
+        self.strings = _decode_strings(lengths, blob)
+        self.shape_ints = self._array("i")
+        self.kind_shapes = self._array("I")
+        self.kind_bits = self._array("I")
+        self.kind_values = self._array("i")
+        self.structure = self._array("i")
+        self.end = self.offset
+
+    def _count(self):
+        (count,) = _COUNT.unpack_from(self.buffer, self.offset)
+        self.offset += _COUNT.size
+        return count
+
+    def _bytes(self):
+        size = self._count()
+        data = self.buffer[self.offset : self.offset + size]
+        self.offset += size + (-size % 4)
+        return data
+
+    def _array(self, typecode):
+        size = self._count() * 4
+        data = self.buffer[self.offset : self.offset + size]
+        self.offset += size
+        if sys.byteorder == "little":
+            return data.cast(typecode)
+        values = array.array(typecode, data.tobytes())
+        values.byteswap()
+        return values
+
+
+class StoredDocument:
+    """
+    A document of a CorpusStore. Only its document record is decoded; the
+    items of the token list are decoded on request.
+    """
+
+    def __init__(self, store, sigle, offset):
+        self.store = store
+        self.sigle = sigle
+        self.offset = offset
+
+        record = _RecordView(store._view(), offset)
+        self._shapes = _decode_shapes(record.shape_ints, record.strings)
+        reader = _Reader(record.strings, [], record.structure)
+        self.name = reader.get_string()
+        self.header_string = reader.get_string()
+        self.header = json.loads(reader.get_string())
+
+        self._pages = [reader.get_strings(3) for _ in range(reader.get())]
+        self._columns = [
+            reader.get_strings(2) + [reader.get()] for _ in range(reader.get())
+        ]
+        self._lines = [
+            reader.get_strings(2) + [reader.get()] for _ in range(reader.get())
+        ]
+
+        self.token_ids = []
+        self._anno_positions = dict()
+        for position in range(reader.get()):
+            if reader.get() == _COMMENT:
+                self.token_ids.append(None)
+                continue
+            self.token_ids.append(reader.get_string())
+            for anno_id in reader.get_strings():
+                self._anno_positions[anno_id] = position
+
+        self._shifttags = [
+            (reader.get_string(), reader.get(), reader.get())
+            for _ in range(reader.get())
+        ]
+        ## offsets of the item records follow the document record
+        self._offsets_at = record.end + _COUNT.size
+
+    def __len__(self):
+        return len(self.token_ids)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.token(position)
+
+    def _item(self, position):
+        if not 0 <= position < len(self):
+            raise IndexError("token index out of range: " + str(position))
+        (offset,) = _OFFSET.unpack_from(
+            self.store._data, self._offsets_at + position * _OFFSET.size
+        )
+        record = _RecordView(self.store._view(), offset)
+        kinds = _decode_kinds(
+            self._shapes,
+            record.kind_shapes,
+            record.kind_bits,
+            record.kind_values,
+            record.strings,
+        )
+        reader = _Reader(record.strings, kinds, record.structure)
+        item = reader.get_item()
+        line_indices = []
+        if isinstance(item, CoraToken):
+            line_indices = [reader.get() for _ in item.tok_dipls]
+        return item, line_indices
+
+    def token(self, position):
+        """The item at the position in the token list (a token or a comment)."""
+        return self._item(position)[0]
+
+    def position_of_anno(self, anno_id):
+        """The position of the token that has the anno, or None."""
+        return self._anno_positions.get(anno_id)
+
+    def get_anno(self, anno_id):
+        position = self._anno_positions.get(anno_id)
+        if position is None:
+            raise KeyError(anno_id)
+        for anno in self.token(position).tok_annos:
+            if anno.id == anno_id:
+                return anno
+
+    def load(self):
+        """Decodes the whole document."""
+        return _without_gc(self._load)
+
+    def _load(self):
+        lines = [Line(name, [], extid=line_id) for line_id, name, _ in self._lines]
+        tokens = []
+        for position in range(len(self)):
+            item, line_indices = self._item(position)
+            for dipl, line_index in zip(getattr(item, "tok_dipls", ()), line_indices):
+                if line_index >= 0:
+                    lines[line_index].dipls.append(dipl)
+            tokens.append(item)
+
+        columns = [
+            Column([], name=name, extid=column_id)
+            for column_id, name, _ in self._columns
+        ]
+        for line, (_, _, column_index) in zip(lines, self._lines):
+            columns[column_index].lines.append(line)
+        pages = [
+            Page(name, side, [], extid=page_id) for page_id, name, side in self._pages
+        ]
+        for column, (_, _, page_index) in zip(columns, self._columns):
+            pages[page_index].columns.append(column)
+
+        shifttags = [
+            _make_shifttag(shifttag_type, tokens, start, end)
+            for shifttag_type, start, end in self._shifttags
+        ]
+        return Document(
+            self.sigle,
+            self.name,
+            self.header,
+            pages,
+            tokens,
+            shifttags,
+            self.header_string,
+        )
+
+
+class CorpusStore:
+    def __init__(self, path, create=False):
+        self.path = path
+        self.data_file = os.path.join(path, DATA_FILE)
+        self.index_file = os.path.join(path, INDEX_FILE)
+        if create:
+            os.makedirs(path, exist_ok=True)
+            for filename, magic in [
+                (self.data_file, DATA_MAGIC),
+                (self.index_file, INDEX_MAGIC),
+            ]:
+                with open(filename, "ab") as outfile:
+                    _lock(outfile)
+                    if outfile.tell() == 0:
+                        outfile.write(_HEADER.pack(magic, VERSION))
+        elif not os.path.exists(self.index_file):
+            raise ValueError("No corpus store at " + path)
+
+        self._data = None
+        self._index = None
+        self._index_end = _HEADER.size
+        ## sigle -> offset of the document record
+        self._offsets = dict()
+        self._documents = dict()
+        self._anno_sigles = None
+        self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._documents = dict()
+        for mapped in (self._data, self._index):
+            if mapped is not None:
+                mapped.close()
+        self._data = self._index = None
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        return iter(self._offsets)
+
+    def __contains__(self, sigle):
+        if sigle not in self._offsets:
+            self.refresh()
+        return sigle in self._offsets
+
+    def __getitem__(self, sigle):
+        if sigle not in self:
+            raise KeyError(sigle)
+        document = self._documents.get(sigle)
+        if document is None or document.offset != self._offsets[sigle]:
+            document = self._documents[sigle] = StoredDocument(
+                self, sigle, self._offsets[sigle]
+            )
+        return document
+
+    def _view(self):
+        return memoryview(self._data)
+
+    def refresh(self):
+        """Maps the files again if other processes have appended documents."""
+        index_size = os.path.getsize(self.index_file)
+        if self._index is not None and index_size == len(self._index):
+            return
+        self._index = _map(self.index_file)
+        self._data = _map(self.data_file)
+        magic, version = _HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC or _HEADER.unpack_from(self._data, 0)[0] != DATA_MAGIC:
+            raise ValueError("Not a corpus store: " + self.path)
+        if version != VERSION:
+            raise ValueError("Unsupported version of corpus store: " + str(version))
+
+        ## an entry that is still being written is read on the next refresh
+        while self._index_end + _ENTRY.size <= len(self._index):
+            sigle_size, offset = _ENTRY.unpack_from(self._index, self._index_end)
+            start = self._index_end + _ENTRY.size
+            if start + sigle_size > len(self._index):
+                break
+            sigle = self._index[start : start + sigle_size].decode("utf-8")
+            self._offsets[sigle] = offset
+            self._index_end = start + sigle_size
+        self._anno_sigles = None
+
+    def append(self, doc):
+        """Writes the document at the end of the store."""
+        with open(self.data_file, "ab") as datafile, open(
+            self.index_file, "ab"
+        ) as indexfile:
+            _lock(indexfile)
+            base = datafile.tell()
+            block = io.BytesIO()
+            record_offset = _write_block(block, doc, base)
+            datafile.write(block.getvalue())
+            datafile.flush()
+            ## the entry is written with a single call after the data
+            sigle = doc.sigle.encode("utf-8")
+            indexfile.write(_ENTRY.pack(len(sigle), record_offset) + sigle)
+        self.refresh()
+
+    def get_anno(self, anno_id, sigle=None):
+        """
+        The anno with the external id. Without a sigle, the id has to be
+        unique in the store; this decodes the document records once.
+        """
+        if sigle is not None:
+            return self[sigle].get_anno(anno_id)
+        if self._anno_sigles is None:
+            self._anno_sigles = dict()
+            for stored_sigle in self._offsets:
+                for stored_id in self[stored_sigle]._anno_positions:
+                    self._anno_sigles.setdefault(stored_id, []).append(stored_sigle)
+        sigles = self._anno_sigles.get(anno_id)
+        if not sigles:
+            raise KeyError(anno_id)
+        if len(sigles) > 1:
+            raise ValueError(
+                "Anno id {0} is used in several documents: {1}".format(
+                    anno_id, ", ".join(sigles)
+                )
+            )
+        return self[sigles[0]].get_anno(anno_id)
+
+
+def _map(filename):
+    with open(filename, "rb") as infile:
+        return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _lock(outfile):
+    ## released when the file is closed
+    if fcntl is not None:
+        fcntl.flock(outfile.fileno(), fcntl.LOCK_EX)
+
+
+def _write_block(outfile, doc, base):
+    """
+    Writes the records of a document and returns the offset of the document
+    record; base is the offset of outfile in the data file.
+    """
+    line_indices = dict()
+    pages, columns, lines = [], [], []
+    for page in doc.pages:
+        pages.append(page)
+        for column in page.columns:
+            columns.append((column, len(pages) - 1))
+            for line in column.lines:
+                for dipl in line.dipls:
+                    line_indices[dipl._id] = len(lines)
+                lines.append((line, len(columns) - 1))
+
+    shapes = dict()
+    offsets = array.array("Q")
+    for item in doc.tokens:
+        writer = _Writer(shapes)
+        writer.put_item(item)
+        if isinstance(item, CoraToken):
+            writer.put(*[line_indices.get(dipl._id, -1) for dipl in item.tok_dipls])
+        offsets.append(_write_record(outfile, writer, base))
+
+    writer = _Writer(shapes)
+    writer.put_string(doc.name)
+    writer.put_string(doc.header_string)
+    writer.put_string(json.dumps(doc.header))
+    writer.put(len(pages))
+    for page in pages:
+        writer.put_string(page.id)
+        writer.put_string(page.name)
+        writer.put_string(page.side)
+    writer.put(len(columns))
+    for column, page_index in columns:
+        writer.put_string(column.id)
+        writer.put_string(column.name)
+        writer.put(page_index)
+    writer.put(len(lines))
+    for line, column_index in lines:
+        writer.put_string(line.id)
+        writer.put_string(line.name)
+        writer.put(column_index)
+    writer.put(len(doc.tokens))
+    for item in doc.tokens:
+        if isinstance(item, CoraToken):
+            writer.put(_TOKEN)
+            writer.put_string(item.id)
+            writer.put_strings([anno.id for anno in item.tok_annos])
+        else:
+            writer.put(_COMMENT)
+    writer.put(len(doc.shifttags))
+    for shifttag, (start, end) in zip(doc.shifttags, _shifttag_positions(doc)):
+        writer.put_string(shifttag.type)
+        writer.put(start, end)
+
+    record_offset = _write_record(outfile, writer, base, shapes=True)
+    _write_array(outfile, offsets)
+    return record_offset
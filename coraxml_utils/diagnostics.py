@@ -0,0 +1,225 @@
+"""
+Collects the warnings and errors of importers and tokenizers.
+
+Each diagnostic is recorded as a tuple (code, location, args) and only
+formatted into a message when it is needed, e.g. by `messages()` or when
+it is passed on to logging. Counts per code are kept as well, so that a
+report on a large corpus does not need to look at the single records:
+
+    importer = create_importer("coraxml", "ref", echo_diagnostics=False)
+    doc = importer.import_from_file("ref.xml")
+    importer.diagnostics.counts()     # {"cat_dipl": 12, "tok_change": 3}
+    importer.diagnostics.to_json()    # machine-readable report
+
+With echo (the default), each diagnostic is also passed to the logger,
+as before; the message is then formatted only if the logger emits it.
+Importers start a new collector for each import, so that transcriptions
+that are parsed lazily after the next import still report to the
+collector of their own document; keep a reference to `importer.diagnostics`
+to look at them later.
+"""
+
+import json
+import logging
+from collections import Counter
+
+ERROR = logging.ERROR
+WARNING = logging.WARNING
+
+## code -> (level, message template); the template is formatted with the
+## args of the diagnostic and its location as `location`
+MESSAGES = {
+    ## CorA-XML
+    "duplicate_flag": (WARNING, "Flag {0} is set twice for anno-token {location}."),
+    "duplicate_tag": (WARNING, "Tag {0} is set twice for anno-token {location}."),
+    "cat_dipl": (
+        WARNING,
+        "Token transcription '{0}' not equal to concatenation of dipl "
+        "transcriptions '{1}'. Dipl transcriptions will be used for token {location}",
+    ),
+    "cat_anno": (
+        WARNING,
+        "Concatenation of anno '{0}' and dipl '{1}' transcriptions not equal. "
+        "Dipl transcription will be used for token {location}",
+    ),
+    "tok_number": (
+        WARNING,
+        "Change in number of {0}s ('{1}' -> '{2}') for token {location}",
+    ),
+    "tok_change": (
+        WARNING,
+        "Change in tokenization for {0}s of token {location}: '{1}' -> '{2}'",
+    ),
+    "tok_mismatch": (
+        ERROR,
+        "Tokenization given in XML does not match tokenization of the given "
+        "parser for token {location}",
+    ),
+    "no_subtokens": (
+        ERROR,
+        "Token element contains no dipl/anno elements. Check tag name settings!",
+    ),
+    "parse_error": (
+        ERROR,
+        "Token could not be parsed: {0} Message: {1}",
+    ),
+    "layout_empty": (WARNING, "Dropped empty {0} ({location})"),
+    "layout_same_start": (
+        ERROR,
+        "Two {0}s that start at the same position: {location} and {1}",
+    ),
+    "layout_exhausted": (WARNING, "No more {0}s for {1} ({location})"),
+    "layout_unexpected": (
+        WARNING,
+        "Expected {0} with id {1} but found {0} with id {location}",
+    ),
+    "layout_dropped_start": (
+        WARNING,
+        "Dropped {0}(s) starting with nonexistent {1}: {2}",
+    ),
+    "layout_dropped_end": (
+        WARNING,
+        "Dropped {0}(s) ending with nonexistent {1}: {location}",
+    ),
+    "shifttag_dropped_start": (
+        WARNING,
+        "Dropped shifttag(s) starting with nonexistent token: {0}",
+    ),
+    "shifttag_dropped_end": (
+        WARNING,
+        "Dropped shifttag(s) ending with nonexistent token: {0}",
+    ),
+    ## transcriptions
+    "empty_line": (WARNING, "Line contains no token - skipped: {location}"),
+    "bibinfo_format": (ERROR, "Bibinfo hat falsches Format (Zeile {location}): {0}"),
+    "empty_header": (ERROR, "Header is empty!"),
+    "no_sigle": (WARNING, "No sigle found in document header!"),
+    "faulty_line": (WARNING, "Faulty line: {0!r}"),
+    "trans_parse_error": (
+        ERROR,
+        "Transcription could not be parsed: {location}\t{0} Message: {1}",
+    ),
+    "bibinfo_wrong": (ERROR, "Bibinfo '{0}' has wrong format"),
+    "truncated": (ERROR, "Document appears truncated: {0}"),
+    "dipl_bounds": (ERROR, "Too few dipl bounds: {0}"),
+    "bibinfo_left": (
+        WARNING,
+        "Bibinfo iterator not empty: line numbers probably wrong: {0}",
+    ),
+    ## BonnXML
+    "xml_error": (ERROR, "Cannot parse file {0}. Message: {1}"),
+    "no_header": (ERROR, "No header!"),
+    "shifttag_unclosed": (WARNING, "Shifttag {0} not closed."),
+    "dipl_mismatch": (ERROR, "Dipl token {0} is not identical to input: {1}"),
+    "line_missing": (ERROR, "Did not find line {0}."),
+    "anno_mismatch": (ERROR, "Anno token {0} is not identical to input {1}."),
+    "xml_invalid": (ERROR, "XML cannot be parsed."),
+    ## tokenizer
+    "comment_type": (
+        ERROR,
+        "Comment opening ({0}) and closing ({1}) tag types do not match",
+    ),
+    "comment_space": (WARNING, "Comment after '{0}' is not preceded by whitespace"),
+    "shifttag_unopened": (ERROR, "Shifttag '{0}' closes but wasn't opened"),
+    "shifttag_type": (
+        ERROR,
+        "Shifttag opening ({0}) and closing ({1}) tag types do not match",
+    ),
+    "tab_separator": (WARNING, "Tab used to separate tokens after '{0}'"),
+    "linebreak_space": (WARNING, "Extra whitespace at line break after '{0}'"),
+    "unknown_entity": (WARNING, "Unknown entity in {0}"),
+    "shifttag_open": (ERROR, "Shifttags {0} still open at end of document"),
+}
+
+
+def format_diagnostic(code, location, args):
+    level, template = MESSAGES[code]
+    return template.format(*args, location=location)
+
+
+class _Message:
+    """Formats a diagnostic only when the log record is actually emitted."""
+
+    def __init__(self, record):
+        self.record = record
+
+    def __str__(self):
+        return format_diagnostic(*self.record)
+
+
+class Diagnostics:
+    def __init__(self, echo=True, keep=True, logger=None):
+        ## pass diagnostics on to the logger
+        self.echo = echo
+        ## keep the single records (otherwise only the counts)
+        self.keep = keep
+        self.logger = logger if logger is not None else logging.getLogger()
+        self.records = []
+        self._counts = Counter()
+
+    def report(self, code, location=None, *args):
+        record = (code, location, args)
+        self._counts[code] += 1
+        if self.keep:
+            self.records.append(record)
+        if self.echo:
+            level = MESSAGES[code][0]
+            if self.logger.isEnabledFor(level):
+                self.logger.log(level, "%s", _Message(record))
+
+    def clear(self):
+        del self.records[:]
+        self._counts.clear()
+
+    def __len__(self):
+        return sum(self._counts.values())
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def counts(self):
+        """Number of diagnostics per code."""
+        return dict(self._counts)
+
+    def has_errors(self):
+        return any(MESSAGES[code][0] >= ERROR for code in self._counts)
+
+    def messages(self):
+        """Yields (level name, message) for each kept diagnostic."""
+        for record in self.records:
+            yield logging.getLevelName(MESSAGES[record[0]][0]), format_diagnostic(
+                *record
+            )
+
+    def log(self, logger=None):
+        """Passes the kept diagnostics on to the logger, e.g. after a quiet import."""
+        if logger is None:
+            logger = self.logger
+        for record in self.records:
+            logger.log(MESSAGES[record[0]][0], "%s", _Message(record))
+
+    def as_dict(self):
+        return {
+            "counts": self.counts(),
+            "diagnostics": [
+                {
+                    "code": code,
+                    "level": logging.getLevelName(MESSAGES[code][0]).lower(),
+                    "location": _jsonable(location),
+                    "args": [_jsonable(arg) for arg in args],
+                    "message": format_diagnostic(code, location, args),
+                }
+                for code, location, args in self.records
+            ],
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.as_dict(), **kwargs)
+
+
+def _jsonable(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    return str(value)
@@ -1,10 +1,19 @@
+import array
+import csv
+import io
+import json
 import logging
+import os
+import re
+import shutil
 
 from lxml import etree as ET
 import markdown_strings
 
 from coraxml_utils.coralib import *
 from coraxml_utils.character import *
+from coraxml_utils import binary_format, sqlite_store
+from coraxml_utils.fileutils import write_atomically
 
 
 def create_exporter(format="coraxml", options=None):
@@ -15,9 +24,15 @@ def create_exporter(format="coraxml", options=None):
     elif format == "gatejson":
         return GateJsonExporter()
     elif format == "tei":
-        return TEIExporter()
+        return TEIExporter(options)
     elif format == "md":
-        return MarkdownExporter()
+        return MarkdownExporter(options)
+    elif format == "sqlite":
+        return SQLiteExporter(options)
+    elif format == "tsv":
+        return ColumnarExporter(options)
+    elif format == "binary":
+        return BinaryExporter()
     else:
         logging.error("No valid exporter selected")
 
@@ -32,27 +47,43 @@ class CoraXMLExporter:
         self.anno_tag = options.get("anno_tag_name", "mod")
         self.simple_attrib = options.get("simple_attrib_name", "ascii")
 
+    def _trans_attribs(self, obj, attrib_names):
+        """
+        Returns the transcription attributes of a token, dipl or anno.
+
+        Attributes of objects imported in passthrough mode are written back
+        verbatim as long as their transcription has not been modified.
+        """
+        original_attrib = obj.get_original_attrib()
+        attribs = list()
+        for attrib_name, trans_form in attrib_names:
+            if original_attrib is not None and attrib_name in original_attrib:
+                attribs.append((attrib_name, original_attrib[attrib_name]))
+            else:
+                attribs.append((attrib_name, getattr(obj.trans, trans_form)()))
+        return attribs
+
     def _create_xml_token(self, tok):
 
-        tok_xml = ET.Element(
-            "token", {"id": tok.get_external_id(), "trans": tok.trans.trans()}
-        )
+        tok_xml = ET.Element("token", {"id": tok.get_external_id()})
+        for key, val in self._trans_attribs(tok, [("trans", "trans")]):
+            tok_xml.set(key, val)
 
         for dipl in tok.tok_dipls:
             dipl_xml = ET.SubElement(
-                tok_xml,
-                self.dipl_tag,
-                {"id": dipl.get_external_id(), "trans": dipl.trans.trans()},
+                tok_xml, self.dipl_tag, {"id": dipl.get_external_id()}
             )
-            dipl_xml.set("utf", dipl.trans.utf())
+            for key, val in self._trans_attribs(
+                dipl, [("trans", "trans"), ("utf", "utf")]
+            ):
+                dipl_xml.set(key, val)
         for mod in tok.tok_annos:
-            mod_xml = ET.SubElement(
-                tok_xml,
-                self.anno_tag,
-                {"id": mod.get_external_id(), "trans": mod.trans.trans()},
-            )
-            mod_xml.set("utf", mod.trans.utf())
-            mod_xml.set(self.simple_attrib, mod.trans.simple())
+            mod_xml = ET.SubElement(tok_xml, self.anno_tag, {"id": mod.get_external_id()})
+            for key, val in self._trans_attribs(
+                mod,
+                [("trans", "trans"), ("utf", "utf"), (self.simple_attrib, "simple")],
+            ):
+                mod_xml.set(key, val)
 
             if mod.checked:
                 mod_xml.set("checked", "y")
@@ -138,6 +169,50 @@ class CoraXMLExporter:
         return ET.ElementTree(root)
 
 
+HEADER_ELEMENT_RE = re.compile(rb"<header\b[^>]*?(?:/>|>.*?</header\s*>)", re.DOTALL)
+## elements that follow the header
+BODY_ELEMENT_RE = re.compile(rb"<(?:layoutinfo|shifttags|token|comment)\b")
+
+
+def replace_coraxml_header(filename, header_string, outfilename=None, chunk_size=65536):
+    """
+    Replaces the text of the <header> element of a CorA-XML file.
+
+    Only the beginning of the file up to the header is read into memory,
+    everything after it is copied through byte by byte. The file has to be
+    UTF-8 encoded. Without an outfilename, the file is replaced atomically.
+    """
+    header_xml = ET.Element("header")
+    header_xml.text = header_string
+    new_header = ET.tostring(header_xml, encoding="unicode").encode("utf-8")
+
+    if outfilename is None:
+        outfilename = filename
+
+    with open(filename, "rb") as infile:
+        ## the header comes right after <cora-header>, near the start of the file
+        head = b""
+        while True:
+            match = HEADER_ELEMENT_RE.search(head)
+            if match:
+                break
+            body = BODY_ELEMENT_RE.search(head)
+            chunk = b""
+            if body is None or b"<header" in head[: body.start()]:
+                chunk = infile.read(chunk_size)
+            if not chunk:
+                raise ValueError("No header element found in " + str(filename))
+            head += chunk
+
+        def write(outfile):
+            outfile.write(head[: match.start()])
+            outfile.write(new_header)
+            outfile.write(head[match.end() :])
+            shutil.copyfileobj(infile, outfile)
+
+        write_atomically(outfilename, write)
+
+
 class TransExporter:
     def __init__(self):
         pass
@@ -291,9 +366,118 @@ class TransExporter:
         return "\n".join(output)
 
 
+def _get_placement(bracket_string):
+
+    # ReN: continuation below or above line
+    if bracket_string.startswith("\\F"):
+        if bracket_string[2] == "U":
+            return "below"
+        elif bracket_string[2] == "O":
+            return "above"
+    # ReN: paratext
+    elif bracket_string.startswith("*"):
+        if bracket_string[1] == "U":
+            return "bottom"
+        elif bracket_string[1] == "O":
+            return "top"
+        elif bracket_string[1] == "T":
+            return "inline"
+        elif bracket_string[1] == "L":
+            return "margin left"
+        elif bracket_string[1] == "R":
+            return "margin right"
+        elif bracket_string[1] == "I":
+            return "interlinear"
+
+    # bracket string does not have a known format
+    return None
+
+
 class TEIExporter:
-    def __init__(self):
-        pass
+    def __init__(self, options=None):
+
+        if options is None:
+            options = dict()
+
+        ## (class, handler) pairs, the first matching class wins
+        ## a handler gets the character and the current parent element
+        ## and returns the new current parent element
+        self.char_handlers = [
+            (Whitespace, self._skip_char),
+            (Multiverbation, self._skip_char),
+            (Univerbation, self._skip_char),
+            (IllegibleChar, self._add_gap),
+            (Addition, self._bracket_handler("add", placement=True)),
+            (Correction, self._bracket_handler("add", placement=True)),
+            (Continuation, self._bracket_handler("add", placement=True)),
+            (Note, self._bracket_handler("note", placement=True)),
+            (Recognizable, self._bracket_handler("unclear")),
+            (ExpandedAbbreviation, self._bracket_handler("expan")),
+            (Strikethrough, self._bracket_handler("del")),
+        ]
+        ## handlers by character class, filled on first use of a class
+        self._char_handler_cache = {}
+
+        for char_class, tag, placement in options.get("brackets", []):
+            self.register_bracket(char_class, tag, placement)
+
+    def register_char_handler(self, char_class, handler):
+        """Registers a handler for a character class, before all existing ones."""
+
+        self.char_handlers.insert(0, (char_class, handler))
+        self._char_handler_cache = {}
+
+    def register_bracket(self, char_class, tag, placement=False):
+        """Exports the content of a bracket type as a TEI element with the given tag."""
+
+        self.register_char_handler(
+            char_class, self._bracket_handler(tag, placement=placement)
+        )
+
+    def _get_char_handler(self, char_class):
+
+        handler = self._add_char_text
+        for handled_class, class_handler in self.char_handlers:
+            if issubclass(char_class, handled_class):
+                handler = class_handler
+                break
+
+        self._char_handler_cache[char_class] = handler
+        return handler
+
+    def _skip_char(self, char, current_parent):
+
+        return current_parent
+
+    def _add_char_text(self, char, current_parent):
+
+        self._add_text(char.string)
+        return current_parent
+
+    def _add_gap(self, char, current_parent):
+
+        self._current_text_element = ET.SubElement(
+            current_parent, "gap", reason="illegible"
+        )
+        self._current_text_attribute = "tail"
+        return current_parent
+
+    def _bracket_handler(self, tag, placement=False):
+        def add_bracket(char, current_parent):
+            if char.opening:
+                current_parent = ET.SubElement(current_parent, tag)
+                if placement:
+                    place = _get_placement(char.string)
+                    if place is not None:
+                        current_parent.set("place", place)
+                self._current_text_element = current_parent
+                self._current_text_attribute = "text"
+            else:
+                current_parent = current_parent.getparent()
+                self._current_text_attribute = "tail"
+            return current_parent
+
+        return add_bracket
 
     def _add_text(self, character):
 
@@ -323,9 +507,8 @@ class TEIExporter:
     # TODO it is also a hack - importers should use anno_span for sentences
     def export(self, doc, sent_tag="bound_sent"):
 
-        page = {}
-        column = {}
-        line = {}
+        ## the layout may have changed since the indices were created
+        doc.layout_changed()
 
         text_root = ET.Element("text")
         tei_root = ET.SubElement(text_root, "body")
@@ -346,24 +529,8 @@ class TEIExporter:
 
         in_multiverbation = False
 
-        # get layoutinfo
-        for page_object in doc.pages:
-            page[page_object.columns[0].lines[0].dipls[0].get_internal_id()] = (
-                page_object.name + page_object.side
-            )
-        for column_object in [column for page in doc.pages for column in page.columns]:
-            column[
-                column_object.lines[0].dipls[0].get_internal_id()
-            ] = column_object.name
-        for line_object in [
-            line
-            for page in doc.pages
-            for column in page.columns
-            for line in column.lines
-        ]:
-            line[line_object.dipls[0].get_internal_id()] = line_object.name
-
         open_tags = []
+        char_handlers = self._char_handler_cache
 
         for token in doc.tokens:
 
@@ -399,28 +566,26 @@ class TEIExporter:
                             current_dipl = dipl_tokens.pop()
 
                             # test for line
-                            if current_dipl.get_internal_id() in line:
+                            line = doc.line_starting_at(current_dipl)
+                            if line is not None:
 
                                 # test for column
-                                if current_dipl.get_internal_id() in column:
+                                column = doc.column_starting_at(current_dipl)
+                                if column is not None:
 
                                     # test for page
-                                    if current_dipl.get_internal_id() in page:
+                                    page = doc.page_starting_at(current_dipl)
+                                    if page is not None:
                                         # add page
                                         self._add_element(
-                                            ET.Element(
-                                                "pb",
-                                                n=page[current_dipl.get_internal_id()],
-                                            ),
+                                            ET.Element("pb", n=page.name + page.side),
                                             current_parent,
                                         )
 
                                     # add column
                                     column_name = None
-                                    if column[current_dipl.get_internal_id()]:
-                                        column_name = column[
-                                            current_dipl.get_internal_id()
-                                        ]
+                                    if column.name:
+                                        column_name = column.name
 
                                     if column_name != "--":
                                         last_element = ET.Element("cb")
@@ -431,7 +596,7 @@ class TEIExporter:
 
                                 # add line
                                 self._current_text_element = ET.Element(
-                                    "lb", n=line[current_dipl.get_internal_id()]
+                                    "lb", n=line.name
                                 )
                                 self._add_element(
                                     self._current_text_element, current_parent
@@ -526,96 +691,11 @@ class TEIExporter:
                                     parent_node.append(element)
                                 self.curr_part = []
 
-                    def getPlacement(bracket_string):
-
-                        # ReN: continuation below or above line
-                        if bracket_string.startswith("\\F"):
-                            if bracket_string[2] == "U":
-                                return "below"
-                            elif char.string[2] == "O":
-                                return "above"
-                        # ReN: paratext
-                        elif char.string.startswith("*"):
-                            if char.string[1] == "U":
-                                return "bottom"
-                            elif char.string[1] == "O":
-                                return "top"
-                            elif char.string[1] == "T":
-                                return "inline"
-                            elif char.string[1] == "L":
-                                return "margin left"
-                            elif char.string[1] == "R":
-                                return "margin right"
-                            elif char.string[1] == "I":
-                                return "interlinear"
-
-                        # bracket string does not have a known format
-                        return None
-
                     # add subtoken information (like strikethrough)
-                    if (
-                        isinstance(char, Whitespace)
-                        or isinstance(char, Multiverbation)
-                        or isinstance(char, Univerbation)
-                    ):
-                        pass
-                    elif isinstance(char, IllegibleChar):
-                        self._current_text_element = ET.SubElement(
-                            current_parent, "gap", reason="illegible"
-                        )
-                        self._current_text_attribute = "tail"
-                    elif (
-                        isinstance(char, Addition)
-                        or isinstance(char, Correction)
-                        or isinstance(char, Continuation)
-                    ):
-                        if char.opening:
-                            current_parent = ET.SubElement(current_parent, "add")
-                            placement = getPlacement(char.string)
-                            if placement is not None:
-                                current_parent.set("place", placement)
-                            self._current_text_element = current_parent
-                            self._current_text_attribute = "text"
-                        else:
-                            current_parent = current_parent.getparent()
-                            self._current_text_attribute = "tail"
-                    elif isinstance(char, Note):
-                        if char.opening:
-                            current_parent = ET.SubElement(current_parent, "note")
-                            placement = getPlacement(char.string)
-                            if placement is not None:
-                                current_parent.set("place", placement)
-                            self._current_text_element = current_parent
-                            self._current_text_attribute = "text"
-                        else:
-                            current_parent = current_parent.getparent()
-                            self._current_text_attribute = "tail"
-                    elif isinstance(char, Recognizable):
-                        if char.opening:
-                            current_parent = ET.SubElement(current_parent, "unclear")
-                            self._current_text_element = current_parent
-                            self._current_text_attribute = "text"
-                        else:
-                            current_parent = current_parent.getparent()
-                            self._current_text_attribute = "tail"
-                    elif isinstance(char, ExpandedAbbreviation):
-                        if char.opening:
-                            current_parent = ET.SubElement(current_parent, "expan")
-                            self._current_text_element = current_parent
-                            self._current_text_attribute = "text"
-                        else:
-                            current_parent = current_parent.getparent()
-                            self._current_text_attribute = "tail"
-                    elif isinstance(char, Strikethrough):
-                        if char.opening:
-                            current_parent = ET.SubElement(current_parent, "del")
-                            self._current_text_element = current_parent
-                            self._current_text_attribute = "text"
-                        else:
-                            current_parent = current_parent.getparent()
-                            self._current_text_attribute = "tail"
-                    else:
-                        self._add_text(char.string)
+                    char_handler = char_handlers.get(type(char))
+                    if char_handler is None:
+                        char_handler = self._get_char_handler(type(char))
+                    current_parent = char_handler(char, current_parent)
 
             elif type(token) == CoraComment:
                 # TODO what about type?
@@ -636,6 +716,9 @@ class GateJsonExporter:
 
     def export(self, doc):
 
+        ## the layout may have changed since the indices were created
+        doc.layout_changed()
+
         json_object = {
             "text": "",
             "entities": {
@@ -654,29 +737,6 @@ class GateJsonExporter:
         json_object["name"] = doc.name
         json_object["header"] = doc.header
 
-        page_beginnings = {}
-        page_ends = {}
-        for page in doc.pages:
-            page_beginnings[page.columns[0].lines[0].dipls[0]._id] = page
-            page_ends[page.columns[-1].lines[-1].dipls[-1]._id] = page
-
-        column_beginnings = {}
-        column_ends = {}
-        for column in [column for page in doc.pages for column in page.columns]:
-            column_beginnings[column.lines[0].dipls[0]._id] = column
-            column_ends[column.lines[-1].dipls[-1]._id] = column
-
-        line_beginnings = {}
-        line_ends = {}
-        for line in [
-            line
-            for page in doc.pages
-            for column in page.columns
-            for line in column.lines
-        ]:
-            line_beginnings[line.dipls[0]._id] = line
-            line_ends[line.dipls[-1]._id] = line
-
         shifttag_beginnings = {}
         for shifttag in doc.shifttags:
             if shifttag.tokens[0]._id not in shifttag_beginnings:
@@ -733,31 +793,34 @@ class GateJsonExporter:
                             # close last token
                             last_dipl = current_dipl
                             # add page annotation
-                            if last_dipl._id in page_ends:
+                            page = doc.page_ending_at(last_dipl)
+                            if page is not None:
                                 json_object["entities"]["Layout:Page"].append(
                                     {
                                         "indices": [last_page_offset, char_offset],
-                                        "id": page_ends[last_dipl._id].id,
-                                        "name": page_ends[last_dipl._id].name,
-                                        "side": page_ends[last_dipl._id].side,
+                                        "id": page.id,
+                                        "name": page.name,
+                                        "side": page.side,
                                     }
                                 )
                             # add column annotation
-                            if last_dipl._id in column_ends:
+                            column = doc.column_ending_at(last_dipl)
+                            if column is not None:
                                 json_object["entities"]["Layout:Column"].append(
                                     {
                                         "indices": [last_column_offset, char_offset],
-                                        "id": column_ends[last_dipl._id].id,
-                                        "name": column_ends[last_dipl._id].name,
+                                        "id": column.id,
+                                        "name": column.name,
                                     }
                                 )
                             # add line annotation
-                            if last_dipl._id in line_ends:
+                            line = doc.line_ending_at(last_dipl)
+                            if line is not None:
                                 json_object["entities"]["Layout:Line"].append(
                                     {
                                         "indices": [last_line_offset, char_offset],
-                                        "id": line_ends[last_dipl._id].id,
-                                        "name": line_ends[last_dipl._id].name,
+                                        "id": line.id,
+                                        "name": line.name,
                                     }
                                 )
                             # add dipl token annotation
@@ -776,7 +839,7 @@ class GateJsonExporter:
                         if tok_dipls:
                             current_dipl = tok_dipls.pop()
                             # add linebreak or whitespace
-                            if current_dipl._id in line_beginnings:
+                            if doc.is_beginning_of_line(current_dipl):
                                 if (
                                     last_line_offset is not None
                                 ):  # ignore first linebreak
@@ -788,10 +851,10 @@ class GateJsonExporter:
                                 json_object["text"] += " "
                                 char_offset += 1
 
-                            if current_dipl._id in page_beginnings:
+                            if doc.page_starting_at(current_dipl) is not None:
                                 last_page_offset = char_offset
 
-                            if current_dipl._id in column_beginnings:
+                            if doc.column_starting_at(current_dipl) is not None:
                                 last_column_offset = char_offset
 
                             # update last dipl offset
@@ -860,27 +923,71 @@ class GateJsonExporter:
         return json_object
 
 
+## How characters of dipls are rendered in markdown: (class, rendering) pairs,
+## the first matching class wins. A rendering is a string or a function of the
+## character; characters without a rendering are written as transcribed.
+MARKDOWN_RENDERING = [
+    # mark expansions, paratext and strikethrough with markdown (strikethrough uses pandocs markdown)
+    (ExpandedAbbreviation, "*"),
+    (Para, "**"),
+    (Strikethrough, "~~"),
+    # TODO the following renderings are specific for ReN
+    # other corpora can pass their own table in the option "rendering"
+    (Multiverbation, ""),
+    (Univerbation, ""),
+    (Recognizable, lambda c: "[" if c.opening else "]"),
+    (IllegibleChar, "[…]"),
+    (TextChar, lambda c: "[…]" if c.dipl_utf == "…" else c.string),
+    (Lacuna, "^[Lücke]"),
+    (Continuation, ""),
+]
+
+
 class MarkdownExporter:
-    def __init__(self):
-        pass
+    def __init__(self, options=None):
+
+        if options is None:
+            options = dict()
+
+        self.rendering = options.get("rendering", MARKDOWN_RENDERING)
+        ## renderings by character class, filled on first use of a class
+        self._renderers = {}
+
+    def _get_renderer(self, char_class):
+
+        if issubclass(char_class, Whitespace):
+            renderer = lambda c: ""
+        else:
+            renderer = lambda c: c.string
+            for rendered_class, rendering in self.rendering:
+                if issubclass(char_class, rendered_class):
+                    if callable(rendering):
+                        renderer = rendering
+                    else:
+                        renderer = lambda c, rendering=rendering: rendering
+                    break
+
+        self._renderers[char_class] = renderer
+        return renderer
+
+    def _render_dipl(self, dipl):
+
+        renderers = self._renderers
+        rendered = list()
+        for c in dipl.trans.parse:
+            renderer = renderers.get(type(c))
+            if renderer is None:
+                renderer = self._get_renderer(type(c))
+            rendered.append(renderer(c))
+        return "".join(rendered)
 
     def export(self, doc):
 
         # export as markdown
         # uses to the pandoc extensions pipe_tables, inline_notes and strikeout
 
-        page = {}
-        column = {}
-
-        # get page and column info
-        for page_object in doc.pages:
-            page[page_object.columns[0].lines[0].dipls[0].get_internal_id()] = (
-                page_object.name + page_object.side
-            )
-        for column_object in [column for page in doc.pages for column in page.columns]:
-            column[
-                column_object.lines[0].dipls[0].get_internal_id()
-            ] = column_object.name
+        ## the layout may have changed since the indices were created
+        doc.layout_changed()
 
         page_name = ""
         column_name = ""
@@ -912,62 +1019,17 @@ class MarkdownExporter:
             else:
                 for dipl in token.tok_dipls:
 
-                    if dipl.get_internal_id() in page:
-                        page_name = page[dipl.get_internal_id()]
-                    if dipl.get_internal_id() in column:
-                        column_name = column[dipl.get_internal_id()]
+                    page = doc.page_starting_at(dipl)
+                    if page is not None:
+                        page_name = page.name + page.side
+                    column = doc.column_starting_at(dipl)
+                    if column is not None:
+                        column_name = column.name
                         if column_name is None or column_name == "--":
                             column_name = ""
 
                     current_line.append(
-                        markdown_strings.esc_format(
-                            dipl.trans
-                            # mark expansions, paratext and strikethrough with markdown (strikethrough uses pandocs markdown)
-                            .transform(
-                                lambda c: ExpandedAbbreviation("*", dipl_utf="*"),
-                                lambda c: isinstance(c, ExpandedAbbreviation),
-                            )
-                            .transform(
-                                lambda c: Para("**", dipl_utf="**"),
-                                lambda c: isinstance(c, Para),
-                            )
-                            .transform(
-                                lambda c: Strikethrough("~~", dipl_utf="~~"),
-                                lambda c: isinstance(c, Strikethrough),
-                            )
-                            # TODO the following transformations are specific for ReN
-                            # this should be changed to be usable for other corpora as well
-                            .transform(
-                                lambda c: Multiverbation("", dipl_utf=""),
-                                lambda c: isinstance(c, Multiverbation),
-                            )
-                            .transform(
-                                lambda c: Univerbation("", dipl_utf=""),
-                                lambda c: isinstance(c, Univerbation),
-                            )
-                            .transform(
-                                lambda c: Recognizable("[", dipl_utf="["),
-                                lambda c: isinstance(c, Recognizable) and c.opening,
-                            )
-                            .transform(
-                                lambda c: Recognizable("]", dipl_utf="]"),
-                                lambda c: isinstance(c, Recognizable) and not c.opening,
-                            )
-                            .transform(
-                                lambda c: IllegibleChar("[…]", dipl_utf="[…]"),
-                                lambda c: isinstance(c, IllegibleChar)
-                                or (isinstance(c, TextChar) and c.dipl_utf == "…"),
-                            )
-                            .transform(
-                                lambda c: Lacuna("^[Lücke]", dipl_utf="^[Lücke]"),
-                                lambda c: isinstance(c, Lacuna),
-                            )
-                            .transform(
-                                lambda c: Continuation("", dipl_utf=""),
-                                lambda c: isinstance(c, Continuation),
-                            )
-                            .trans()
-                        )
+                        markdown_strings.esc_format(self._render_dipl(dipl))
                     )
 
                     if doc.is_end_of_line(dipl):
@@ -982,3 +1044,288 @@ class MarkdownExporter:
                         current_line = []
 
         return "  \n".join(output)
+
+
+class SQLiteExporter:
+    """
+    Writes documents into a SQLite corpus store (see coraxml_utils.sqlite_store).
+
+    A stored document with the same sigle is replaced.
+    """
+
+    def __init__(self, options=None):
+
+        if options is None:
+            options = dict()
+
+        self.batch_size = options.get("batch_size", 10000)
+
+    def _trans_forms(self, obj, forms):
+        if obj.trans is None:
+            return tuple(None for form in forms)
+        return tuple(getattr(obj.trans, form)() for form in forms)
+
+    def _add_document(self, rows, doc):
+
+        ## ids of the lines of all dipls
+        line_ids = dict()
+
+        doc_id = rows.add(
+            "documents", doc.sigle, doc.name, json.dumps(doc.header), doc.header_string
+        )
+        for page_position, page in enumerate(doc.pages):
+            page_id = rows.add(
+                "pages", doc_id, page_position, page.id, page.name, page.side
+            )
+            for column_position, column in enumerate(page.columns):
+                column_id = rows.add(
+                    "columns", page_id, column_position, column.id, column.name
+                )
+                for line_position, line in enumerate(column.lines):
+                    line_id = rows.add(
+                        "lines", column_id, line_position, line.id, line.name
+                    )
+                    for dipl in line.dipls:
+                        line_ids[dipl._id] = line_id
+
+        ## positions of tokens for shifttags
+        token_positions = dict()
+
+        for position, token in enumerate(doc.tokens):
+            if isinstance(token, CoraComment):
+                rows.add("comments", doc_id, position, token.type, token.content)
+                continue
+
+            token_positions[token._id] = position
+            token_id = rows.add(
+                "tokens",
+                doc_id,
+                position,
+                token.get_external_id(),
+                *self._trans_forms(token, ["trans"])
+            )
+            for dipl_position, dipl in enumerate(token.tok_dipls):
+                rows.add(
+                    "dipls",
+                    token_id,
+                    dipl_position,
+                    line_ids.get(dipl._id),
+                    dipl.get_external_id(),
+                    *self._trans_forms(dipl, ["trans", "utf"])
+                )
+            for anno_position, anno in enumerate(token.tok_annos):
+                anno_id = rows.add(
+                    "annos",
+                    token_id,
+                    anno_position,
+                    anno.get_external_id(),
+                    *self._trans_forms(anno, ["trans", "utf", "simple"]),
+                    int(anno.checked)
+                )
+                for name, value in anno.tags.items():
+                    rows.add("anno_tags", anno_id, name, value)
+                for name in anno.flags:
+                    rows.add("anno_flags", anno_id, name)
+
+        for shifttag in doc.shifttags:
+            rows.add(
+                "shifttags",
+                doc_id,
+                shifttag.type,
+                token_positions[shifttag.tokens[0]._id],
+                token_positions[shifttag.tokens[-1]._id],
+            )
+
+    def export_all(self, docs, database):
+        """Writes the documents in one transaction, database is a filename or connection."""
+
+        connection = sqlite_store.connect(database)
+        try:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                rows = sqlite_store.BatchInserter(connection, self.batch_size)
+                for doc in docs:
+                    ## rows of a document with the same sigle may still be pending
+                    rows.flush()
+                    connection.execute(
+                        "DELETE FROM documents WHERE sigle = ?", (doc.sigle,)
+                    )
+                    self._add_document(rows, doc)
+                rows.flush()
+        finally:
+            if connection is not database:
+                connection.close()
+
+    def export(self, doc, database):
+
+        self.export_all([doc], database)
+
+
+class EncodedColumn:
+    """A dictionary-encoded column: row i has the value values[codes[i]]."""
+
+    def __init__(self):
+
+        self.values = []
+        self.codes = array.array("l")
+        self._value_codes = dict()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def append(self, value):
+        code = self._value_codes.get(value)
+        if code is None:
+            code = self._value_codes[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def decode(self):
+        values = self.values
+        return [values[code] for code in self.codes]
+
+
+class ColumnarExporter:
+    """
+    Exports one row per anno with its position, transcriptions, checked,
+    flags and a column for every tag.
+
+    The rows are produced in one pass over one or more documents: `write_tsv`
+    streams them as TSV (or CSV with the option delimiter), `export_columns`
+    returns dictionary-encoded columns (see EncodedColumn; the codes are
+    arrays that numpy can use without copying).
+
+    The tag columns are given with the option tags; without it all tags of
+    the documents are used, which needs the documents in memory first.
+    """
+
+    BASE_COLUMNS = [
+        "sigle",
+        "token",
+        "anno",
+        "page",
+        "column",
+        "line",
+        "trans",
+        "utf",
+        "simple",
+        "checked",
+        "flags",
+    ]
+
+    def __init__(self, options=None):
+
+        if options is None:
+            options = dict()
+
+        self.tags = options.get("tags")
+        self.delimiter = options.get("delimiter", "\t")
+        self.flag_sep = options.get("flag_sep", "|")
+        ## value of tags an anno does not have
+        self.missing = options.get("missing", "")
+
+    def _prepare(self, docs):
+        """Returns the documents and the names of the tag columns."""
+        if self.tags is not None:
+            return docs, list(self.tags)
+        docs = list(docs)
+        tag_names = dict()
+        for doc in docs:
+            for token in doc.tokens:
+                if isinstance(token, CoraToken):
+                    for anno in token.tok_annos:
+                        tag_names.update(dict.fromkeys(anno.tags))
+        return docs, list(tag_names)
+
+    def _trans_forms(self, anno):
+        if anno.trans is None:
+            return ["", "", ""]
+        return [anno.trans.trans(), anno.trans.utf(), anno.trans.simple()]
+
+    def iter_rows(self, docs, tag_names):
+        """Yields the rows of all annos, in the order of BASE_COLUMNS + tag_names."""
+
+        missing = self.missing
+        for doc in docs:
+            ## the layout may have changed since the indices were created
+            doc.layout_changed()
+            page_name = ""
+            column_name = ""
+            for token in doc.tokens:
+                if isinstance(token, CoraComment):
+                    continue
+
+                ## a token is located where its first dipl is
+                location = None
+                for dipl in token.tok_dipls:
+                    page = doc.page_starting_at(dipl)
+                    if page is not None:
+                        page_name = page.name + (page.side or "")
+                    column = doc.column_starting_at(dipl)
+                    if column is not None:
+                        column_name = column.name or ""
+                    if location is None:
+                        line = doc.line_of(dipl)
+                        location = [
+                            page_name,
+                            column_name,
+                            line.name if line is not None else "",
+                        ]
+                if location is None:
+                    location = [page_name, column_name, ""]
+
+                token_id = token.get_external_id()
+                for anno in token.tok_annos:
+                    tags = anno.tags
+                    yield (
+                        [doc.sigle, token_id, anno.get_external_id()]
+                        + location
+                        + self._trans_forms(anno)
+                        + [int(anno.checked), self.flag_sep.join(sorted(anno.flags))]
+                        + [tags.get(name, missing) for name in tag_names]
+                    )
+
+    def write_tsv(self, docs, outfile):
+        """Writes the rows of all documents to a text file, returns the number of rows."""
+
+        docs, tag_names = self._prepare(docs)
+        writer = csv.writer(outfile, delimiter=self.delimiter, lineterminator="\n")
+        writer.writerow(self.BASE_COLUMNS + tag_names)
+        rows = 0
+        for row in self.iter_rows(docs, tag_names):
+            writer.writerow(row)
+            rows += 1
+        return rows
+
+    def export_columns(self, docs):
+        """Returns a dict of column name -> EncodedColumn for all documents."""
+
+        docs, tag_names = self._prepare(docs)
+        names = self.BASE_COLUMNS + tag_names
+        columns = [EncodedColumn() for name in names]
+        for row in self.iter_rows(docs, tag_names):
+            for column, value in zip(columns, row):
+                column.append(value)
+        return dict(zip(names, columns))
+
+    def export(self, doc):
+
+        output = io.StringIO()
+        self.write_tsv([doc], output)
+        ## without the final line break, like the other text exporters
+        return output.getvalue()[:-1]
+
+
+class BinaryExporter:
+    """Serializes documents in the binary format of coraxml_utils.binary_format."""
+
+    def export(self, doc):
+
+        output = io.BytesIO()
+        binary_format.write_document(doc, output)
+        return output.getvalue()
+
+    def export_to_file(self, doc, filename):
+
+        with open(filename, "wb") as outfile:
+            binary_format.write_document(doc, outfile)
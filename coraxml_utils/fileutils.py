@@ -0,0 +1,37 @@
+"""Writing files so that readers never see a partly written file."""
+
+import os
+import shutil
+
+
+def write_atomically(path, write):
+    """
+    Calls write(file) on a temporary file that replaces path on success.
+    The file gets the mode of the file it replaces, or else the mode that
+    open() would create it with.
+    """
+    tmpname, tmp = _create_temporary_file(path)
+    try:
+        with tmp:
+            write(tmp)
+        if os.path.exists(path):
+            shutil.copymode(path, tmpname)
+        os.replace(tmpname, path)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+
+def _create_temporary_file(path):
+    ## created with mode 0666 like open() does, the kernel applies the umask
+    ## (reading the umask means setting it, for all threads of the process)
+    prefix = os.path.join(
+        os.path.dirname(os.path.abspath(path)), "." + os.path.basename(path) + "."
+    )
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        tmpname = prefix + os.urandom(6).hex() + ".tmp"
+        try:
+            return tmpname, os.fdopen(os.open(tmpname, flags, 0o666), "wb")
+        except FileExistsError:
+            continue
@@ -1,4 +1,6 @@
 import re
+import copy
+import io
 import itertools
 import sys
 import logging
@@ -6,16 +8,43 @@ import logging
 logging.basicConfig(format="%(levelname)s: %(message)s")
 logger = logging.getLogger()
 
+import json
 from collections import defaultdict
 
 from coraxml_utils.coralib import *
-from coraxml_utils.character import LineBreak, Joiner
+from coraxml_utils.character import LineBreak, Joiner, Bracket, Whitespace
 import coraxml_utils.parser as parser
 import coraxml_utils.tokenizer as tokenizer
+from coraxml_utils import binary_format, sqlite_store
+from coraxml_utils.diagnostics import Diagnostics
 
 from lxml import etree as ET
 
 
+class _LazyJoin:
+    """Joins a list of strings only when the message is actually formatted."""
+
+    def __init__(self, strings, sep=" "):
+        self.strings = strings
+        self.sep = sep
+
+    def __str__(self):
+        return self.sep.join(self.strings)
+
+
+class _LazyBibinfo:
+    """Formats a bibinfo dictionary like in the transcription, only when needed."""
+
+    def __init__(self, bibinfo):
+        self.bibinfo = bibinfo
+
+    def __str__(self):
+        return "{sigle}-{page}{side}{col},{line}".format(**self.bibinfo)
+
+    def __repr__(self):
+        return str(self)
+
+
 def create_importer(file_format, dialect=None, **kwargs):
     if file_format == "coraxml":
         if dialect in parser.dialect_mapper:
@@ -31,6 +60,18 @@ def create_importer(file_format, dialect=None, **kwargs):
             return cora_importer
         else:
             raise ValueError("CorA-XML dialect " + dialect + " is not supported.")
+    elif file_format == "sqlite":
+        if dialect in parser.dialect_mapper:
+            sqlite_importer = SQLiteImporter(parser.dialect_mapper[dialect], **kwargs)
+            if dialect == "ren":
+                sqlite_importer.force_retokenization = True
+                sqlite_importer.add_dipl_whitespace = True
+            return sqlite_importer
+        else:
+            raise ValueError("CorA-XML dialect " + dialect + " is not supported.")
+    elif file_format == "binary":
+        ## the parsed transcriptions are stored, no parser is needed
+        return BinaryImporter()
     elif file_format == "bonnxml":
         if dialect in parser.dialect_mapper:
             return BonnXMLImporter(parser.dialect_mapper[dialect], **kwargs)
@@ -60,6 +101,64 @@ def parse_header(header_string):
     return header
 
 
+def _read_header_elements(cora_header, header_element):
+
+    sigle = ""
+    name = ""
+    if cora_header is not None:
+        sigle = cora_header.get("sigle", "")
+        name = cora_header.get("name", "")
+
+    # get header
+    # header_string = ET.tostring(header_element, encoding="unicode", method="xml")
+    header_string = header_element.text
+    if not list(header_element):
+        header = parse_header(
+            ET.tostring(header_element, encoding="unicode", method="text")
+        )
+    else:
+        # header is structured as xml - transform to dict
+        header = dict()
+        for header_part in header_element:
+            header[header_part.tag] = header_part.text
+
+    return sigle, name, header_string, header
+
+
+def read_coraxml_header(filename):
+    """
+    Reads only the <cora-header> and <header> elements of a CorA-XML file.
+
+    Parsing stops as soon as the header has been read, the layout info and
+    the tokens are never touched. Returns a dict with the keys sigle, name,
+    header_string and header (as in Document).
+    """
+    cora_header = None
+    header_element = None
+    with open(filename, "rb") as xmlfile:
+        for _, element in ET.iterparse(
+            xmlfile, events=("end",), tag=("cora-header", "header")
+        ):
+            if element.tag == "cora-header":
+                cora_header = element
+            else:
+                header_element = element
+                break
+
+    if header_element is None:
+        raise ValueError("No header element found in " + str(filename))
+
+    sigle, name, header_string, header = _read_header_elements(
+        cora_header, header_element
+    )
+    return {
+        "sigle": sigle,
+        "name": name,
+        "header_string": header_string,
+        "header": header,
+    }
+
+
 class CoraXMLImporter:
     def __init__(
         self,
@@ -69,6 +168,9 @@ class CoraXMLImporter:
         tok_dipl_tag="dipl",
         tok_anno_tag="mod",
         add_dipl_whitespace=False,
+        lazy=False,
+        passthrough=False,
+        echo_diagnostics=True,
     ):
 
         self.tok_dipl_tag = tok_dipl_tag
@@ -80,11 +182,36 @@ class CoraXMLImporter:
 
         self.add_dipl_whitespace = add_dipl_whitespace
 
+        ## if lazy, transcriptions are parsed on first access; strict mode
+        ## checks the tokenization during the import, so that tokens are
+        ## only parsed lazily if strict is False
+        self.lazy = lazy
+
+        ## if passthrough, the XML attributes of tokens are kept, so that
+        ## unmodified transcriptions can be exported verbatim
+        self.passthrough = passthrough
+
+        ## counts how dipl/anno parses are obtained when the tokenization
+        ## given in the XML does not match the parser's tokenization
+        self.parse_stats = defaultdict(int)
+
+        ## warnings and errors of the last import; each import starts a new
+        ## collector, which also logs them if echo_diagnostics
+        self.echo_diagnostics = echo_diagnostics
+        self.diagnostics = Diagnostics(echo=echo_diagnostics)
+
     def _create_dipl_token(self, dipl_element, trans):
 
         return TokDipl(trans, extid=dipl_element.attrib["id"])
 
-    def _create_anno_token(self, anno_element, trans):
+    def _keep_original_attribs(self, token, token_element, token_parts):
+        token.set_original_attrib(token_element.attrib)
+        for dipl, dipl_element in zip(token.tok_dipls, token_parts["dipl_elements"]):
+            dipl.set_original_attrib(dipl_element.attrib)
+        for anno, anno_element in zip(token.tok_annos, token_parts["anno_elements"]):
+            anno.set_original_attrib(anno_element.attrib)
+
+    def _read_annotations(self, anno_element):
 
         # retrieve annotations
         tags = dict()
@@ -95,30 +222,28 @@ class CoraXMLImporter:
             if annotation_element.tag == "cora-flag":
                 flagname = annotation_element.attrib["name"]
                 if flagname in flags:
-                    logging.warning(
-                        "Flag "
-                        + flagname
-                        + " is set twice for anno-token "
-                        + anno_element.attrib["id"]
-                        + "."
+                    self.diagnostics.report(
+                        "duplicate_flag", anno_element.attrib["id"], flagname
                     )
                 flags.add(flagname)
             else:
                 tagname = annotation_element.tag
                 if tagname in tags:
-                    logging.warning(
-                        "Tag "
-                        + tagname
-                        + " is set twice for anno-token "
-                        + anno_element.attrib["id"]
-                        + "."
+                    self.diagnostics.report(
+                        "duplicate_tag", anno_element.attrib["id"], tagname
                     )
                 tags[tagname] = annotation_element.attrib.get("tag", "")
 
         ## the attribute checked is not obligatory
-        checked = (
-            "checked" in anno_element.attrib and anno_element.attrib["checked"] == "y"
-        )
+        checked = anno_element.attrib.get("checked") == "y"
+
+        return tags, flags, checked
+
+    def _create_anno_token(self, anno_element, trans, annotations=None):
+
+        if annotations is None:
+            annotations = self._read_annotations(anno_element)
+        tags, flags, checked = annotations
 
         return TokAnno(
             trans,
@@ -128,59 +253,167 @@ class CoraXMLImporter:
             extid=anno_element.attrib["id"],
         )
 
-    def _create_cora_token(self, coratoken_element, line_endings):
-        thistoken_id = coratoken_element.attrib["id"]
-        ## get dipl and anno elements
-        dipl_tokens = coratoken_element.findall(self.tok_dipl_tag)
-        anno_tokens = coratoken_element.findall(self.tok_anno_tag)
-        if not (dipl_tokens + anno_tokens):
-            logging.error("Token element contains no dipl/anno elements. " +
-                          "Check tag name settings!")
-        thistoken_errs = list()
-
-        ## test that transcriptions are the same for the different levels
-        token_trans = coratoken_element.attrib["trans"]
-        dipl_trans_cat = "".join(
-            dipl_element.attrib["trans"] for dipl_element in dipl_tokens
-        )
-        anno_trans_cat = "".join(
-            anno_element.attrib["trans"] for anno_element in anno_tokens
-        )
+    def _read_token_element(self, coratoken_element, line_endings):
+        """
+        Collects everything needed from a token element in one pass over its children.
 
+        Returns a dict with the dipl and anno elements, their transcriptions,
+        the annotations of the anno elements and the transcription that is
+        given to the token parser.
+        """
+        dipl_elements = []
+        dipl_transs = []
+        anno_elements = []
+        anno_transs = []
+        annotations = []
+        parse_trans = []
+
+        for child in coratoken_element:
+            if child.tag == self.tok_dipl_tag:
+                dipl_trans = child.attrib["trans"]
+                dipl_elements.append(child)
+                dipl_transs.append(dipl_trans)
+                ## create transcription of the token with linebreaks (this is how CorA does it, when editing tokens)
+                ## adding optional whitespace between dipls (currently the ren parser needs whitespace to determine dipl breaks)
+                parse_trans.append(dipl_trans)
+                if child.attrib["id"] in line_endings:
+                    parse_trans.append("\n")
+                elif self.add_dipl_whitespace:
+                    parse_trans.append(" ")
+            elif child.tag == self.tok_anno_tag:
+                anno_elements.append(child)
+                anno_transs.append(child.attrib["trans"])
+                annotations.append(self._read_annotations(child))
+
+        return {
+            "dipl_elements": dipl_elements,
+            "dipl_transs": dipl_transs,
+            "anno_elements": anno_elements,
+            "anno_transs": anno_transs,
+            "annotations": annotations,
+            "parse_trans": "".join(parse_trans).strip(),
+        }
+
+    def _split_parse(self, parsed_token, transs, output_type):
+        """
+        Cuts the parse of a whole token into parses for the given transcriptions.
+
+        Returns None if a transcription boundary does not coincide with a
+        character boundary or falls within a bracket, i.e. whenever parsing
+        the transcriptions separately could lead to a different result.
+        """
+        trans_class = DiplTrans if output_type == "dipl" else AnnoTrans
+        chars = [c for c in parsed_token.parse if not isinstance(c, Whitespace)]
+        char_iter = iter(chars)
+
+        result = []
+        open_brackets = 0
+        for trans in transs:
+            partial_parse = []
+            length = 0
+            while length < len(trans):
+                char = next(char_iter, None)
+                if char is None:
+                    return None
+                if isinstance(char, Bracket):
+                    open_brackets += 1 if char.opening else -1
+                length += len(char.string)
+                ## bounds are only set when whole tokens are parsed
+                char = copy.copy(char)
+                char.anno_bound = False
+                char.dipl_bound = False
+                char.token_bound = False
+                partial_parse.append(char)
+            if length != len(trans) or open_brackets:
+                return None
+            result.append(trans_class(partial_parse))
+
+        return result
+
+    def _get_partial_parses(self, parsed_token, trans_cat, transs, output_type):
+        """
+        Returns parses for the dipl or anno transcriptions given in the XML.
+
+        If their concatenation equals the transcription of the parsed token,
+        the parses are derived from the parsed token; only otherwise the
+        transcriptions are parsed again one by one.
+        """
+        if trans_cat == parsed_token.trans():
+            partial_parses = self._split_parse(parsed_token, transs, output_type)
+            if partial_parses is not None:
+                self.parse_stats[output_type + "_derived"] += len(transs)
+                return partial_parses
+
+        self.parse_stats[output_type + "_reparsed"] += len(transs)
+        return [
+            self.tokenparser.parse(trans, output_type=output_type) for trans in transs
+        ]
+
+    def _check_concatenations(self, token_id, token_trans, token_parts):
+        """Tests that transcriptions are the same for the different levels."""
+        errors = list()
+
+        dipl_trans_cat = "".join(token_parts["dipl_transs"])
         if dipl_trans_cat != token_trans:
-            logging.warning(
-                (
-                    "Token transcription '{ttrans}' not equal to "
-                    "concatenation of dipl transcriptions '{dtrans}'. "
-                    "Dipl transcriptions will "
-                    "be used for token {id}"
-                ).format(id=thistoken_id, ttrans=token_trans, dtrans=dipl_trans_cat)
-            )
-            thistoken_errs.append("err_cat_dipl")
-        if anno_tokens:
+            self.diagnostics.report("cat_dipl", token_id, token_trans, dipl_trans_cat)
+            errors.append("err_cat_dipl")
+        if token_parts["anno_elements"]:
+            anno_trans_cat = "".join(token_parts["anno_transs"])
             if anno_trans_cat != dipl_trans_cat:
-                logging.warning(
-                    (
-                        "Concatenation of anno '{atrans}' and "
-                        "dipl '{dtrans}' transcriptions not equal. "
-                        "Dipl transcription will be "
-                        "used for token {id}"
-                    ).format(
-                        id=thistoken_id, atrans=anno_trans_cat, dtrans=dipl_trans_cat
-                    )
+                self.diagnostics.report(
+                    "cat_anno", token_id, anno_trans_cat, dipl_trans_cat
                 )
-                thistoken_errs.append("err_cat_anno")
-
-        ## create transcription of the token with linebreaks (this is how CorA does it, when editing tokens)
-        ## adding optional whitespace between dipls (currently the ren parser needs whitespace to determine dipl breaks)
-        parse_trans = ""
-        for dipl_tok in dipl_tokens:
-            parse_trans += dipl_tok.attrib["trans"]
-            if dipl_tok.attrib["id"] in line_endings:
-                parse_trans += "\n"
-            elif self.add_dipl_whitespace:
-                parse_trans += " "
-        parse_trans = parse_trans.strip()
+                errors.append("err_cat_anno")
+
+        return errors
+
+    def _check_tokenization(
+        self, level, token_id, xml_transs, parsed_toks, diagnostics=None
+    ):
+        """
+        Compares the dipl or anno tokenization given in the XML with the parser's.
+
+        Returns the error code of the mismatch or None.
+        """
+        if diagnostics is None:
+            diagnostics = self.diagnostics
+        parsed_transs = [tok.trans() for tok in parsed_toks]
+        if len(parsed_transs) != len(xml_transs):
+            diagnostics.report(
+                "tok_number",
+                token_id,
+                level,
+                _LazyJoin(xml_transs),
+                _LazyJoin(parsed_transs),
+            )
+            return "err_nr_" + level
+        elif parsed_transs != xml_transs:
+            diagnostics.report(
+                "tok_change",
+                token_id,
+                level,
+                _LazyJoin(xml_transs),
+                _LazyJoin(parsed_transs),
+            )
+            return "err_tok_" + level
+        return None
+
+    def _create_cora_token(self, coratoken_element, line_endings):
+        thistoken_id = coratoken_element.attrib["id"]
+        ## get dipl and anno elements
+        token_parts = self._read_token_element(coratoken_element, line_endings)
+        dipl_tokens = token_parts["dipl_elements"]
+        dipl_transs = token_parts["dipl_transs"]
+        anno_tokens = token_parts["anno_elements"]
+        anno_transs = token_parts["anno_transs"]
+        annotations = token_parts["annotations"]
+        parse_trans = token_parts["parse_trans"]
+        if not (dipl_tokens or anno_tokens):
+            self.diagnostics.report("no_subtokens", thistoken_id)
+
+        thistoken_errs = self._check_concatenations(
+            thistoken_id, coratoken_element.attrib["trans"], token_parts
+        )
 
         trans_valid = True
 
@@ -188,68 +421,24 @@ class CoraXMLImporter:
             parsed_token = self.tokenparser.parse(parse_trans)
             ## test if parses match
             parsed_dipl_toks = parsed_token.tokenize_dipl()
-            if len(parsed_dipl_toks) != len(dipl_tokens):
-                logging.warning(
-                    (
-                        "Change in number of dipls "
-                        "('{old}' -> '{new}') for token {id}"
-                    ).format(
-                        id=thistoken_id,
-                        old=" ".join(d.get("trans") for d in dipl_tokens),
-                        new=" ".join(d.trans() for d in parsed_dipl_toks),
-                    )
-                )
-                thistoken_errs.append("err_nr_dipl")
-                trans_valid = False
-            elif any(
-                [
-                    dipl1.trans() != dipl2.attrib["trans"]
-                    for dipl1, dipl2 in zip(parsed_dipl_toks, dipl_tokens)
-                ]
-            ):
-                logging.warning(
-                    (
-                        "Change in tokenization for dipls of token {id}: "
-                        "'{old}' -> '{new}'"
-                    ).format(
-                        id=thistoken_id,
-                        old=" ".join(d.get("trans") for d in dipl_tokens),
-                        new=" ".join(d.trans() for d in parsed_dipl_toks),
-                    )
-                )
-                thistoken_errs.append("err_tok_dipl")
-                # trans_valid = False ??
+            dipl_error = self._check_tokenization(
+                "dipl", thistoken_id, dipl_transs, parsed_dipl_toks
+            )
+            if dipl_error is not None:
+                thistoken_errs.append(dipl_error)
+                if dipl_error == "err_nr_dipl":
+                    trans_valid = False
+                # err_tok_dipl: trans_valid = False ??
 
             parsed_anno_toks = parsed_token.tokenize_anno()
-            if len(parsed_anno_toks) != len(anno_tokens):
-                logging.warning(
-                    (
-                        "Change in number of annos "
-                        "('{old}' -> '{new}') for token {id}"
-                    ).format(
-                        id=thistoken_id,
-                        old=" ".join(a.get("trans") for a in anno_tokens),
-                        new=" ".join(a.trans() for a in parsed_anno_toks),
-                    )
-                )
-                thistoken_errs.append("err_nr_anno")
-                trans_valid = False
-            elif any(
-                anno1.trans() != anno2.attrib["trans"]
-                for anno1, anno2 in zip(parsed_anno_toks, anno_tokens)
-            ):
-                logging.warning(
-                    (
-                        "Change in tokenization for annos of token {id}: "
-                        "'{old}' -> '{new}'"
-                    ).format(
-                        id=thistoken_id,
-                        old=" ".join(a.get("trans") for a in anno_tokens),
-                        new=" ".join(a.trans() for a in parsed_anno_toks),
-                    )
-                )
-                thistoken_errs.append("err_tok_anno")
-                # trans_valid = False ??
+            anno_error = self._check_tokenization(
+                "anno", thistoken_id, anno_transs, parsed_anno_toks
+            )
+            if anno_error is not None:
+                thistoken_errs.append(anno_error)
+                if anno_error == "err_nr_anno":
+                    trans_valid = False
+                # err_tok_anno: trans_valid = False ??
 
             ### Transform XML-Elements into objects
             if trans_valid or self.force_retokenization:
@@ -260,59 +449,174 @@ class CoraXMLImporter:
                 ]
 
                 anno_tokens = [
-                    self._create_anno_token(anno_element, anno_parse)
-                    for anno_element, anno_parse in zip(anno_tokens, parsed_anno_toks)
+                    self._create_anno_token(anno_element, anno_parse, anno_annotations)
+                    for anno_element, anno_parse, anno_annotations in zip(
+                        anno_tokens, parsed_anno_toks, annotations
+                    )
                 ]
 
             else:
 
                 dipl_tokens = [
-                    self._create_dipl_token(
-                        dipl_element,
-                        self.tokenparser.parse(
-                            dipl_element.attrib["trans"], output_type="dipl"
+                    self._create_dipl_token(dipl_element, dipl_parse)
+                    for dipl_element, dipl_parse in zip(
+                        dipl_tokens,
+                        self._get_partial_parses(
+                            parsed_token, "".join(dipl_transs), dipl_transs, "dipl"
                         ),
                     )
-                    for dipl_element in dipl_tokens
                 ]
 
                 anno_tokens = [
-                    self._create_anno_token(
-                        anno_element,
-                        self.tokenparser.parse(
-                            anno_element.attrib["trans"], output_type="anno"
+                    self._create_anno_token(anno_element, anno_parse, anno_annotations)
+                    for anno_element, anno_parse, anno_annotations in zip(
+                        anno_tokens,
+                        self._get_partial_parses(
+                            parsed_token, "".join(anno_transs), anno_transs, "anno"
                         ),
+                        annotations,
                     )
-                    for anno_element in anno_tokens
                 ]
 
                 if self.strict:
                     self.valid_document = False
-                    logging.error(
-                        (
-                            "Tokenization given in XML does not match "
-                            "tokenization of the given parser for token {0}"
-                        ).format(coratoken_element.attrib["id"])
-                    )
+                    self.diagnostics.report("tok_mismatch", thistoken_id)
                 ### Probably unnecessary to report this again here
                 # else:
                 #     logging.warning("Tokenization given in XML does not match tokenization of the given parser - using tokenization from XML. This might lead to unexpected behaviour!")
 
-            return CoraToken(
+            token = CoraToken(
                 parsed_token,
                 dipl_tokens,
                 anno_tokens,
-                extid=coratoken_element.attrib["id"],
+                extid=thistoken_id,
                 errors=thistoken_errs,
             )
+            ## attributes of tokens with errors do not match their parse
+            if self.passthrough and not thistoken_errs:
+                self._keep_original_attribs(token, coratoken_element, token_parts)
+
+            return token
 
         except parser.ParseError as e:
             ## parse error - return an empty token
-            logging.error(
-                "Token could not be parsed: " + parse_trans + " Message: " + e.message
-            )
+            self.diagnostics.report("parse_error", thistoken_id, parse_trans, e.message)
             trans_valid = False
-            return CoraToken(None, [], [], extid=coratoken_element.attrib["id"])
+            return CoraToken(None, [], [], extid=thistoken_id)
+
+    def _create_lazy_cora_token(self, coratoken_element, line_endings):
+        """
+        Creates a token whose transcriptions are only parsed on first access.
+
+        The dipl and anno tokens are taken from the XML as they are, the raw
+        transcriptions are available as `raw_trans`.
+        """
+        thistoken_id = coratoken_element.attrib["id"]
+        token_parts = self._read_token_element(coratoken_element, line_endings)
+        if not (token_parts["dipl_elements"] or token_parts["anno_elements"]):
+            self.diagnostics.report("no_subtokens", thistoken_id)
+
+        dipl_tokens = [
+            self._create_dipl_token(dipl_element, None)
+            for dipl_element in token_parts["dipl_elements"]
+        ]
+        anno_tokens = [
+            self._create_anno_token(anno_element, None, anno_annotations)
+            for anno_element, anno_annotations in zip(
+                token_parts["anno_elements"], token_parts["annotations"]
+            )
+        ]
+        token = CoraToken(
+            None,
+            dipl_tokens,
+            anno_tokens,
+            extid=thistoken_id,
+            errors=self._check_concatenations(
+                thistoken_id, coratoken_element.attrib["trans"], token_parts
+            ),
+        )
+
+        if self.passthrough and not token.errors:
+            self._keep_original_attribs(token, coratoken_element, token_parts)
+
+        self._set_lazy_transs(token, token_parts)
+
+        return token
+
+    def _set_lazy_transs(self, token, token_parts):
+
+        ## diagnostics of the parse belong to the import the token comes from
+        diagnostics = self.diagnostics
+
+        def load_trans():
+            self._parse_lazy_token(token, token_parts, diagnostics)
+
+        token.set_lazy_trans(token_parts["parse_trans"], load_trans)
+        for dipl, dipl_trans in zip(token.tok_dipls, token_parts["dipl_transs"]):
+            dipl.set_lazy_trans(dipl_trans, load_trans)
+        for anno, anno_trans in zip(token.tok_annos, token_parts["anno_transs"]):
+            anno.set_lazy_trans(anno_trans, load_trans)
+
+    def _parse_lazy_token(self, token, token_parts, diagnostics):
+        """
+        Parses the transcriptions of a lazily created token.
+
+        If the token cannot be parsed, its dipls and annos are kept (with
+        None as transcription), as the layout of the document refers to them.
+        """
+        token_id = token.get_external_id()
+        dipl_transs = token_parts["dipl_transs"]
+        anno_transs = token_parts["anno_transs"]
+
+        try:
+            parsed_token = self.tokenparser.parse(token_parts["parse_trans"])
+        except parser.ParseError as e:
+            diagnostics.report(
+                "parse_error", token_id, token_parts["parse_trans"], e.message
+            )
+            parsed_token = None
+
+        if parsed_token is None:
+            dipl_parses = [None] * len(dipl_transs)
+            anno_parses = [None] * len(anno_transs)
+        else:
+            dipl_parses = parsed_token.tokenize_dipl()
+            dipl_error = self._check_tokenization(
+                "dipl", token_id, dipl_transs, dipl_parses, diagnostics
+            )
+            anno_parses = parsed_token.tokenize_anno()
+            anno_error = self._check_tokenization(
+                "anno", token_id, anno_transs, anno_parses, diagnostics
+            )
+            token.errors.extend(
+                error for error in (dipl_error, anno_error) if error is not None
+            )
+            if token.errors:
+                for obj in [token] + token.tok_dipls + token.tok_annos:
+                    obj.discard_original_attrib()
+
+            ## as in _create_cora_token, the tokenization given in the XML is
+            ## only kept if the number of dipls or annos does not match
+            trans_valid = dipl_error != "err_nr_dipl" and anno_error != "err_nr_anno"
+            if not (trans_valid or self.force_retokenization):
+                dipl_parses = self._get_partial_parses(
+                    parsed_token, "".join(dipl_transs), dipl_transs, "dipl"
+                )
+                anno_parses = self._get_partial_parses(
+                    parsed_token, "".join(anno_transs), anno_transs, "anno"
+                )
+                ## only happens during the import, see self.lazy
+                if self.strict:
+                    self.valid_document = False
+                    diagnostics.report("tok_mismatch", token_id)
+
+        token.resolve_lazy_trans(parsed_token)
+        for dipl, dipl_parse in itertools.zip_longest(token.tok_dipls, dipl_parses):
+            if dipl is not None:
+                dipl.resolve_lazy_trans(dipl_parse)
+        for anno, anno_parse in itertools.zip_longest(token.tok_annos, anno_parses):
+            if anno is not None:
+                anno.resolve_lazy_trans(anno_parse)
 
     def _get_range(self, element):
         if element.attrib["range"]:
@@ -347,22 +651,21 @@ class CoraXMLImporter:
 
         # get layoutinfo from xml
         beginnings = []
+        ## id of the first subelement -> id of the layout element
+        starts = dict()
         for element in root.findall("layoutinfo/" + layout_type):
             my_range = self._get_range(element)
             if my_range is None:
-                logging.warn(
-                    "Dropped empty " + layout_type + " (" + element.attrib["id"] + ")"
-                )
+                self.diagnostics.report("layout_empty", element.attrib["id"], layout_type)
                 continue
-            if my_range[0] in beginnings:
-                logging.error(
-                    "Two "
-                    + layout_type
-                    + "s that start at the same position: "
-                    + element.attrib["id"]
-                    + " and "
-                    + beginnings[my_range[0]]["extid"]
+            if my_range[0] in starts:
+                self.diagnostics.report(
+                    "layout_same_start",
+                    element.attrib["id"],
+                    layout_type,
+                    starts[my_range[0]],
                 )
+            starts[my_range[0]] = element.attrib["id"]
             beginnings.append(
                 {
                     **extract_from_xml(element),
@@ -379,14 +682,8 @@ class CoraXMLImporter:
         for subelement in subelements:
 
             if next_element is None:
-                logging.warn(
-                    "No more "
-                    + layout_type
-                    + "s for "
-                    + subelement_type
-                    + " ("
-                    + subelement.id
-                    + ")"
+                self.diagnostics.report(
+                    "layout_exhausted", subelement.id, layout_type, subelement_type
                 )
 
             if not open_element:
@@ -394,15 +691,11 @@ class CoraXMLImporter:
                     open_element = True
                 else:
                     # warn and continue
-                    logging.warn(
-                        "Expected "
-                        + subelement_type
-                        + " with id "
-                        + next_element["beginning"]
-                        + " but found "
-                        + subelement_type
-                        + " with id "
-                        + subelement.id
+                    self.diagnostics.report(
+                        "layout_unexpected",
+                        subelement.id,
+                        subelement_type,
+                        next_element["beginning"],
                     )
 
             subelement.container = next_element["extid"]
@@ -416,22 +709,19 @@ class CoraXMLImporter:
                     next_element = None
 
         if beginnings:
-            logger.warn(
-                "Dropped "
-                + layout_type
-                + "(s) starting with nonexistent "
-                + subelement_type
-                + ": "
-                + str([beginning["extid"] for beginning in reversed(beginnings)])
+            self.diagnostics.report(
+                "layout_dropped_start",
+                None,
+                layout_type,
+                subelement_type,
+                [beginning["extid"] for beginning in reversed(beginnings)],
             )
         if open_element:
-            logger.warn(
-                "Dropped "
-                + layout_type
-                + "(s) ending with nonexistent "
-                + subelement_type
-                + ": "
-                + next_element["extid"]
+            self.diagnostics.report(
+                "layout_dropped_end",
+                next_element["extid"],
+                layout_type,
+                subelement_type,
             )
 
         return layout_elements
@@ -439,6 +729,7 @@ class CoraXMLImporter:
     def import_from_file(self, filename):
 
         self.valid_document = True
+        self.diagnostics = Diagnostics(echo=self.echo_diagnostics)
 
         tree = ET.parse(filename, ET.XMLParser())
         root = tree.getroot()
@@ -456,7 +747,10 @@ class CoraXMLImporter:
         for element in root:
 
             if element.tag == "token":
-                curr_token = self._create_cora_token(element, line_endings)
+                if self.lazy and not self.strict:
+                    curr_token = self._create_lazy_cora_token(element, line_endings)
+                else:
+                    curr_token = self._create_cora_token(element, line_endings)
                 tokens.append(curr_token)
                 dipl_tokens.extend(curr_token.tok_dipls)
             elif element.tag == "comment":
@@ -491,15 +785,15 @@ class CoraXMLImporter:
             open_shifttags = still_open_shifttags
 
         if shifttag_beginnings:
-            logging.warn(
-                "Dropped shifttag(s) starting with nonexistent token: "
-                + str(list(shifttag_beginnings.keys()))
+            self.diagnostics.report(
+                "shifttag_dropped_start", None, list(shifttag_beginnings.keys())
             )
 
         if open_shifttags:
-            logging.warn(
-                "Dropped shifttag(s) ending with nonexistent token: "
-                + str([shifttag["end"] for shifttag in open_shifttags])
+            self.diagnostics.report(
+                "shifttag_dropped_end",
+                None,
+                [shifttag["end"] for shifttag in open_shifttags],
             )
 
         # Get layout info
@@ -550,26 +844,9 @@ class CoraXMLImporter:
         )
 
         ## collect document information and create Document object
-        sigle = ""
-        name = ""
-        cora_header = root.find("cora-header")
-        if cora_header is not None:
-            sigle = cora_header.get("sigle", "")
-            name = cora_header.get("name", "")
-
-        # get header
-        header_element = root.find("header")
-        # header_string = ET.tostring(header_element, encoding="unicode", method="xml")
-        header_string = header_element.text
-        if not list(header_element):
-            header = parse_header(
-                ET.tostring(header_element, encoding="unicode", method="text")
-            )
-        else:
-            # header is structured as xml - transform to dict
-            header = dict()
-            for header_part in header_element:
-                header[header_part.tag] = header_part.text
+        sigle, name, header_string, header = _read_header_elements(
+            root.find("cora-header"), root.find("header")
+        )
 
         if self.valid_document:
             return Document(
@@ -579,10 +856,250 @@ class CoraXMLImporter:
             return None
 
 
+class SQLiteImporter(CoraXMLImporter):
+    """
+    Rebuilds documents from a SQLite corpus store written by SQLiteExporter.
+
+    The stored transcriptions are parsed again with the token parser (on
+    first access if lazy), keeping the stored dipl and anno tokenization
+    as CoraXMLImporter does.
+    """
+
+    def _create_stored_token(
+        self, token_row, dipl_rows, anno_rows, annotations, line_endings
+    ):
+
+        parse_trans = []
+        for dipl_row in dipl_rows:
+            parse_trans.append(dipl_row["trans"])
+            if dipl_row["id"] in line_endings:
+                parse_trans.append("\n")
+            elif self.add_dipl_whitespace:
+                parse_trans.append(" ")
+        token_parts = {
+            "dipl_transs": [dipl_row["trans"] for dipl_row in dipl_rows],
+            "anno_elements": anno_rows,
+            "anno_transs": [anno_row["trans"] for anno_row in anno_rows],
+            "parse_trans": "".join(parse_trans).strip(),
+        }
+
+        token = CoraToken(
+            None,
+            [TokDipl(None, extid=dipl_row["extid"]) for dipl_row in dipl_rows],
+            [
+                TokAnno(
+                    None,
+                    extid=anno_row["extid"],
+                    tags=annotations["tags"].get(anno_row["id"]),
+                    flags=annotations["flags"].get(anno_row["id"]),
+                    checked=bool(anno_row["checked"]),
+                )
+                for anno_row in anno_rows
+            ],
+            extid=token_row["extid"],
+            errors=self._check_concatenations(
+                token_row["extid"], token_row["trans"], token_parts
+            ),
+        )
+        self._set_lazy_transs(token, token_parts)
+        if not self.lazy or self.strict:
+            token.parse_lazy_trans()
+            if token.trans is None:
+                ## as in _create_cora_token, a token that cannot be parsed
+                ## has no dipls and annos
+                token.tok_dipls = []
+                token.tok_annos = []
+
+        return token
+
+    def _read_annotations_of_document(self, connection, doc_id):
+
+        tags = defaultdict(dict)
+        for anno_id, name, value in connection.execute(
+            "SELECT anno_tags.anno_id, anno_tags.name, anno_tags.value"
+            " FROM anno_tags JOIN annos ON anno_tags.anno_id = annos.id"
+            " JOIN tokens ON annos.token_id = tokens.id"
+            " WHERE tokens.document_id = ? ORDER BY anno_tags.rowid",
+            (doc_id,),
+        ):
+            tags[anno_id][name] = value
+        flags = defaultdict(set)
+        for anno_id, name in connection.execute(
+            "SELECT anno_flags.anno_id, anno_flags.name"
+            " FROM anno_flags JOIN annos ON anno_flags.anno_id = annos.id"
+            " JOIN tokens ON annos.token_id = tokens.id"
+            " WHERE tokens.document_id = ?",
+            (doc_id,),
+        ):
+            flags[anno_id].add(name)
+        return {"tags": tags, "flags": flags}
+
+    def _rows_by_token(self, connection, table, doc_id):
+
+        rows = defaultdict(list)
+        for row in connection.execute(
+            "SELECT {0}.* FROM {0} JOIN tokens ON {0}.token_id = tokens.id"
+            " WHERE tokens.document_id = ?"
+            " ORDER BY tokens.position, {0}.position".format(table),
+            (doc_id,),
+        ):
+            rows[row["token_id"]].append(row)
+        return rows
+
+    def import_from_connection(self, connection, sigle=None):
+
+        self.valid_document = True
+        self.diagnostics = Diagnostics(echo=self.echo_diagnostics)
+        if sigle is None:
+            doc_row = connection.execute(
+                "SELECT * FROM documents ORDER BY id LIMIT 1"
+            ).fetchone()
+        else:
+            doc_row = connection.execute(
+                "SELECT * FROM documents WHERE sigle = ?", (sigle,)
+            ).fetchone()
+        if doc_row is None:
+            raise ValueError("Document " + str(sigle) + " is not in the store.")
+        doc_id = doc_row["id"]
+
+        dipl_rows = self._rows_by_token(connection, "dipls", doc_id)
+        anno_rows = self._rows_by_token(connection, "annos", doc_id)
+        annotations = self._read_annotations_of_document(connection, doc_id)
+
+        ## dipls of each line and the last dipl of each line
+        line_dipl_ids = defaultdict(list)
+        for rows in dipl_rows.values():
+            for dipl_row in rows:
+                if dipl_row["line_id"] is not None:
+                    line_dipl_ids[dipl_row["line_id"]].append(dipl_row["id"])
+        line_endings = set(dipl_ids[-1] for dipl_ids in line_dipl_ids.values())
+
+        ## tokens and comments in the order of the document
+        items = []
+        for token_row in connection.execute(
+            "SELECT * FROM tokens WHERE document_id = ?", (doc_id,)
+        ):
+            items.append((token_row["position"], token_row))
+        for comment_row in connection.execute(
+            "SELECT * FROM comments WHERE document_id = ?", (doc_id,)
+        ):
+            items.append(
+                (
+                    comment_row["position"],
+                    CoraComment(comment_row["type"], comment_row["content"]),
+                )
+            )
+        items.sort(key=lambda item: item[0])
+
+        tokens = []
+        dipls = dict()
+        for position, item in items:
+            if isinstance(item, CoraComment):
+                tokens.append(item)
+                continue
+            token = self._create_stored_token(
+                item,
+                dipl_rows[item["id"]],
+                anno_rows[item["id"]],
+                annotations,
+                line_endings,
+            )
+            tokens.append(token)
+            for dipl_row, dipl in zip(dipl_rows[item["id"]], token.tok_dipls):
+                dipls[dipl_row["id"]] = dipl
+
+        shifttags = [
+            ShiftTag(
+                row["type"],
+                [
+                    token
+                    for token in tokens[row["start_position"] : row["end_position"] + 1]
+                    if isinstance(token, CoraToken)
+                ],
+            )
+            for row in connection.execute(
+                "SELECT * FROM shifttags WHERE document_id = ? ORDER BY id", (doc_id,)
+            )
+        ]
+
+        pages = []
+        for page_row in connection.execute(
+            "SELECT * FROM pages WHERE document_id = ? ORDER BY position", (doc_id,)
+        ):
+            columns = []
+            for column_row in connection.execute(
+                "SELECT * FROM columns WHERE page_id = ? ORDER BY position",
+                (page_row["id"],),
+            ):
+                lines = [
+                    Line(
+                        line_row["name"],
+                        [
+                            dipls[dipl_id]
+                            for dipl_id in line_dipl_ids[line_row["id"]]
+                            ## dipls of tokens that cannot be parsed are dropped
+                            if dipl_id in dipls
+                        ],
+                        extid=line_row["extid"],
+                    )
+                    for line_row in connection.execute(
+                        "SELECT * FROM lines WHERE column_id = ? ORDER BY position",
+                        (column_row["id"],),
+                    )
+                ]
+                columns.append(
+                    Column(lines, name=column_row["name"], extid=column_row["extid"])
+                )
+            pages.append(
+                Page(
+                    page_row["name"], page_row["side"], columns, extid=page_row["extid"]
+                )
+            )
+
+        if not self.valid_document:
+            return None
+        return Document(
+            doc_row["sigle"],
+            doc_row["name"],
+            json.loads(doc_row["header"]),
+            pages,
+            tokens,
+            shifttags,
+            doc_row["header_string"],
+        )
+
+    def import_from_file(self, filename, sigle=None):
+        """Imports the document with the given sigle (default: the first one)."""
+
+        connection = sqlite_store.connect(filename)
+        try:
+            return self.import_from_connection(connection, sigle)
+        finally:
+            connection.close()
+
+
+class BinaryImporter:
+    """Reads documents in the binary format of coraxml_utils.binary_format."""
+
+    def import_from_string(self, data):
+
+        return binary_format.read_document(io.BytesIO(data))
+
+    def import_from_file(self, filename):
+
+        if hasattr(filename, "read"):
+            return binary_format.read_document(filename)
+        with open(filename, "rb") as infile:
+            return binary_format.read_document(infile)
+
+
 class TransImporter:
-    def __init__(self, parser):
+    def __init__(self, parser, echo_diagnostics=True):
         self.tokenparser = parser()
-        self.tokenizer = tokenizer.RexTokenizer()
+        ## warnings and errors of the last import, also those of the tokenizer
+        self.echo_diagnostics = echo_diagnostics
+        self.diagnostics = Diagnostics(echo=echo_diagnostics)
+        self.tokenizer = tokenizer.RexTokenizer(diagnostics=self.diagnostics)
         # allowed bibinfo format
         # pageno, side, col, linename
         self.BIBINFO_FORMAT = re.compile(
@@ -597,11 +1114,7 @@ class TransImporter:
     def _add_line(self, document, bibinfo, dipl_tokens):
 
         if not dipl_tokens:
-            logging.warning(
-                "Line contains no token - skipped: {sigle}-{page}{side}{col},{line}".format(
-                    **bibinfo
-                )
-            )
+            self.diagnostics.report("empty_line", _LazyBibinfo(bibinfo))
         else:
             line = document.add_line(bibinfo)
             line.dipls = dipl_tokens
@@ -614,11 +1127,7 @@ class TransImporter:
                 try:
                     bibinfos.append(self.BIBINFO_FORMAT.match(bibinfo).groupdict())
                 except:
-                    logging.error(
-                        "Bibinfo hat falsches Format (Zeile {}): {}".format(
-                            line + 1, bibinfo
-                        )
-                    )
+                    self.diagnostics.report("bibinfo_format", line + 1, bibinfo)
                     self.valid_transcription = False
                     ## use last bibinfo to create current info
                     curr_bibinfo = dict(bibinfos[-1])
@@ -638,6 +1147,9 @@ class TransImporter:
 
         new_doc = Document("", "", None, list(), list())
         self.valid_transcription = True
+        self.diagnostics = self.tokenizer.diagnostics = Diagnostics(
+            echo=self.echo_diagnostics
+        )
 
         # read header
         header_open = False
@@ -658,7 +1170,7 @@ class TransImporter:
                 pass
 
         if not header_lines:
-            logging.error("Header is empty!")
+            self.diagnostics.report("empty_header")
 
         new_doc.header_string = "\n".join(header_lines)
         new_doc.header = parse_header(new_doc.header_string)
@@ -669,7 +1181,7 @@ class TransImporter:
             if "_" in new_doc.sigle:
                 new_doc.sigle = new_doc.sigle.split("_")[0]
         except AttributeError:
-            logging.warning("No sigle found in document header!")
+            self.diagnostics.report("no_sigle")
 
         open_shifttags = list()
         shifttag_stack = list()
@@ -684,7 +1196,7 @@ class TransImporter:
                     transcription_content.append(content)
                     bibinfo_lines.append(bibinfo)
                 except ValueError:
-                    logging.warning("Faulty line: " + repr(line))
+                    self.diagnostics.report("faulty_line", None, line)
             else:
                 transcription_content.append(line.strip())
                 bibinfo_lines.append(None)
@@ -712,15 +1224,14 @@ class TransImporter:
                 except parser.ParseError as e:
                     ## get next line
                     new_bibinfo = next(bibinfo_iter)
-                    bibstr = "{sigle}-{page}{side}{col},{line}".format(**new_bibinfo)
                     ## put line back to iterator
                     bibinfo_iter = itertools.chain([new_bibinfo], bibinfo_iter)
-                    logging.error(
-                        "Transcription could not be parsed: {0}\t{1}".format(
-                            bibstr, chunk.string
-                        )
+                    self.diagnostics.report(
+                        "trans_parse_error",
+                        _LazyBibinfo(new_bibinfo),
+                        chunk.string,
+                        e.message,
                     )
-                    print(e.message)
                     self.valid_transcription = False
 
                     #  in case the erroneous transcription also contains a newline
@@ -736,9 +1247,8 @@ class TransImporter:
                                 )
                                 current_line_dipls = []
                             except StopIteration:
-                                print(new_bibinfo)
-                                logging.error(
-                                    "Document appears truncated: " + str(new_token)
+                                self.diagnostics.report(
+                                    "truncated", _LazyBibinfo(new_bibinfo), chunk.string
                                 )
 
                     continue
@@ -763,16 +1273,11 @@ class TransImporter:
                             )
                             current_line_dipls = []
                         except StopIteration:
-                            print(new_bibinfo)
-                            logging.error(
-                                "Document appears truncated: " + str(new_token)
-                            )
+                            self.diagnostics.report("truncated", None, new_token)
                         except AttributeError as e:
                             if not bibinfo_match:
-                                logging.error(
-                                    "Bibinfo '{0}' has wrong format".format(
-                                        next_bibinfo
-                                    )
+                                self.diagnostics.report(
+                                    "bibinfo_wrong", None, next_bibinfo
                                 )
                             else:
                                 raise e
@@ -780,7 +1285,7 @@ class TransImporter:
                 current_line_dipls.append(mydipls.pop())
                 # make sure that mydipls is empty
                 if mydipls:
-                    logging.error("Too few dipl bounds: " + str(new_token))
+                    self.diagnostics.report("dipl_bounds", None, new_token)
 
                 for anno in new_token.tokenize_anno():
                     t.tok_annos.append(TokAnno(anno))
@@ -800,9 +1305,7 @@ class TransImporter:
                     pass
                 except AttributeError as e:
                     if not bibinfo_match:
-                        logging.error(
-                            "Bibinfo '{0}' has wrong format".format(next_bibinfo)
-                        )
+                        self.diagnostics.report("bibinfo_wrong", None, next_bibinfo)
                     else:
                         raise e
 
@@ -814,17 +1317,17 @@ class TransImporter:
         try:
             leftover_bibinfo = next(bibinfo_iter)
             if leftover_bibinfo:
-                logging.warning(
-                    "Bibinfo iterator not empty: line numbers probably wrong"
+                self.diagnostics.report(
+                    "bibinfo_left",
+                    _LazyBibinfo(leftover_bibinfo),
+                    [_LazyBibinfo(bibinfo) for bibinfo in bibinfo_iter],
                 )
-                print(leftover_bibinfo)
-                print(list(bibinfo_iter))
         except StopIteration:
             pass
 
         if self.valid_transcription:
-            ## create indices of lines and dipl tokens
-            new_doc._create_indices()
+            ## lines got their dipl tokens after the document was created
+            new_doc.layout_changed()
             return new_doc
         else:
             return None
@@ -834,8 +1337,11 @@ class TransImporter:
 
 
 class BonnXMLImporter:
-    def __init__(self, token_parser):
-        self.tokenizer = tokenizer.RexTokenizer()
+    def __init__(self, token_parser, echo_diagnostics=True):
+        ## warnings and errors of the last import, also those of the tokenizer
+        self.echo_diagnostics = echo_diagnostics
+        self.diagnostics = Diagnostics(echo=echo_diagnostics)
+        self.tokenizer = tokenizer.RexTokenizer(diagnostics=self.diagnostics)
         self.tokenparser = token_parser()
 
     def _create_header(self, bonnHeader, output="dict"):
@@ -929,7 +1435,7 @@ class BonnXMLImporter:
                 header = ET.tostring(header, encoding="utf-8", method="xml")
 
         if not header:
-            logging.error("Header is empty!")
+            self.diagnostics.report("empty_header")
 
         # Return the header dictionary, string or element.
         return header
@@ -1287,18 +1793,13 @@ class BonnXMLImporter:
 
             # Parse error: return an empty token.
             except parser.ParseError as e:
-                logging.error(
-                    "Token could not be parsed: "
-                    + chunk.string
-                    + " Message: "
-                    + e.message
-                )
+                self.diagnostics.report("parse_error", None, chunk.string, e.message)
                 trans_valid = False
                 cora_tokens.append(CoraToken(None, [], []))
 
         if trans_valid:
             if open_shifttags:
-                logging.warning("Shifttag {0} not closed.".format(open_shifttags))
+                self.diagnostics.report("shifttag_unclosed", None, open_shifttags)
             return (cora_tokens, shifttags)
         else:
             return (None, None)
@@ -1349,10 +1850,8 @@ class BonnXMLImporter:
 
                 # If the dipl token is not corresponding to the transcription:
                 else:
-                    logging.error(
-                        "Dipl token {0} is not identical to input: {1}".format(
-                            str(cora_tokens[c].tok_dipls[d]), token
-                        )
+                    self.diagnostics.report(
+                        "dipl_mismatch", None, cora_tokens[c].tok_dipls[d], token
                     )
                     d += 1
                     success = False
@@ -1387,7 +1886,7 @@ class BonnXMLImporter:
                             Line(line[0], dipls_per_line[line_index])
                         )
                     except IndexError:
-                        logging.error("Did not find line {0}.".format(line_index))
+                        self.diagnostics.report("line_missing", None, line_index)
                         line_index += 1
                         continue
 
@@ -1443,11 +1942,11 @@ class BonnXMLImporter:
 
                         # If the anno token does not match the Bonn token:
                         else:
-                            logging.error(
-                                "Anno token {0} is not identical to input {1}.".format(
-                                    str(cora_tokens[c].tok_annos[a]),
-                                    bonn_token.find("form").attrib["trans"],
-                                )
+                            self.diagnostics.report(
+                                "anno_mismatch",
+                                None,
+                                cora_tokens[c].tok_annos[a],
+                                bonn_token.find("form").attrib["trans"],
                             )
                             a += 1
                             success = False
@@ -1465,14 +1964,15 @@ class BonnXMLImporter:
     def import_from_file(self, filename):
 
         self.valid_document = True
+        self.diagnostics = self.tokenizer.diagnostics = Diagnostics(
+            echo=self.echo_diagnostics
+        )
 
         # Read in BonnXML file and create ElementTree.
         try:
             tree = ET.parse(filename, ET.XMLParser())
-        except:
-            logging.error(
-                "Cannot parse file {0}. Message: {1}".format(filename, e.message)
-            )
+        except ET.XMLSyntaxError as e:
+            self.diagnostics.report("xml_error", None, filename, e)
             return None
         root = tree.getroot()
 
@@ -1492,7 +1992,7 @@ class BonnXMLImporter:
         else:
             header = dict()
             header_string = ""
-            logging.error("No header!")
+            self.diagnostics.report("no_header")
 
         # Reset ID counters
         Page.id_counter.clear()
@@ -1528,20 +2028,20 @@ class BonnXMLImporter:
         # Create cora tokens.
         (cora_tokens, shifttags) = self._create_cora_tokens(tokenized_input)
         if not cora_tokens:
-            logging.error("XML cannot be parsed.")
+            self.diagnostics.report("xml_invalid")
             return None
 
         # Assign dipl tokens to lines.
         dipls_per_line = self._assign_dipls_to_lines(transcription, cora_tokens)
         if not dipls_per_line:
-            logging.error("XML cannot be parsed.")
+            self.diagnostics.report("xml_invalid")
             return None
 
         # Create pages, columns and lines with dipls.
         # While doing this get annotation information for each anno token.
         pages = self._create_pages(dipls_per_line, structure, cora_tokens)
         if not pages:
-            logging.error("XML cannot be parsed.")
+            self.diagnostics.report("xml_invalid")
             return None
 
         # Create a document object.
@@ -2,12 +2,21 @@ import json
 import csv
 import re
 import logging
-import argparse
-from pathlib import Path
+import shutil
+from functools import partial
 
 from coraxml_utils.settings import DEFAULT_VAL
 from coraxml_utils.character import *
 from coraxml_utils.coralib import ShiftTag, CoraToken, TokDipl
+from coraxml_utils.importer import read_coraxml_header
+from coraxml_utils.exporter import replace_coraxml_header
+from coraxml_utils.fileutils import write_atomically
+from coraxml_utils.pipeline import (
+    Pipeline,
+    document_step,
+    run_from_command_line,
+    token_step,
+)
 
 
 def add_tokenization_tags(token):
@@ -114,6 +123,114 @@ def change_tags(tok_anno, annotation_type, rename_dict):
         )
 
 
+def rename_tags(doc, annotation_type, rename_dict):
+    """
+    Like change_tags for all annos of a document, but only touches the annos
+    that have one of the tags to be renamed (using the annotation index).
+    """
+    index = doc.annotation_index or doc.create_annotation_index()
+    ## look up all annos first, so that every tag is renamed only once
+    renamings = [
+        (index.annos_with_tag(annotation_type, old_value), new_value)
+        for old_value, new_value in rename_dict.items()
+    ]
+    for tok_annos, new_value in renamings:
+        for tok_anno in tok_annos:
+            tok_anno.tags[annotation_type] = new_value
+
+
+def read_annotation_rows(infile, file_format="tsv"):
+    """
+    Streams (anno id, tag name, value) rows from an open text file.
+
+    TSV files have the three columns anno, tag and value (a header line with
+    these names is skipped); JSONL files have one object with the keys anno,
+    tag and value per line.
+    """
+    if file_format == "tsv":
+        reader = csv.reader(infile, delimiter="\t")
+        for row in reader:
+            if not row or row == ["anno", "tag", "value"]:
+                continue
+            anno_id, tagname, *value = row
+            yield anno_id, tagname, value[0] if value else ""
+    elif file_format == "jsonl":
+        for line in infile:
+            line = line.strip()
+            if line:
+                row = json.loads(line)
+                yield row["anno"], row["tag"], row["value"]
+    else:
+        raise ValueError("Annotation format " + file_format + " is not supported.")
+
+
+## what happens to tags of checked annos when annotations are applied
+CHECKED_POLICIES = ["skip", "fill", "overwrite", "error"]
+
+
+def apply_annotations(doc, rows, on_checked="skip"):
+    """
+    Sets the tags given as (anno id, tag name, value) rows, e.g. tagger output.
+
+    The rows are joined with the annos of the document by external id in one
+    pass. Tags of checked annos are handled according to on_checked:
+    skip -- leave checked annos unchanged
+    fill -- only add tags that are missing or have the default value
+    overwrite -- treat checked annos like all others
+    error -- raise a ValueError if a row would change a checked anno; then
+             no tag is changed, not even by the rows before it
+
+    Returns counts of the applied rows and of the rows that were skipped
+    because of checked annos (conflicts) or unknown anno ids.
+    """
+    if on_checked not in CHECKED_POLICIES:
+        raise ValueError("Unknown policy for checked annos: " + on_checked)
+
+    annos = {
+        tok_anno.get_external_id(): tok_anno
+        for token in doc.tokens
+        if isinstance(token, CoraToken)
+        for tok_anno in token.tok_annos
+    }
+
+    counts = {"applied": 0, "conflicts": 0, "unknown": 0}
+    ## with on_checked="error" the rows are only applied when all are checked
+    changes = []
+    for anno_id, tagname, value in rows:
+        tok_anno = annos.get(anno_id)
+        if tok_anno is None:
+            counts["unknown"] += 1
+            logging.debug("No anno with id %s", anno_id)
+            continue
+
+        if tok_anno.checked and tok_anno.tags.get(tagname, DEFAULT_VAL) != value:
+            if on_checked == "error":
+                raise ValueError(
+                    "Tag {0} of checked anno {1} would change from '{2}' to '{3}'".format(
+                        tagname, anno_id, tok_anno.tags.get(tagname, ""), value
+                    )
+                )
+            if on_checked == "skip" or (
+                on_checked == "fill"
+                and tok_anno.tags.get(tagname, DEFAULT_VAL) != DEFAULT_VAL
+            ):
+                counts["conflicts"] += 1
+                continue
+
+        if on_checked == "error":
+            changes.append((tok_anno, tagname, value))
+        else:
+            tok_anno.tags[tagname] = value
+        counts["applied"] += 1
+
+    for tok_anno, tagname, value in changes:
+        tok_anno.tags[tagname] = value
+
+    if counts["unknown"]:
+        logging.warning("%d rows refer to unknown annos", counts["unknown"])
+    return counts
+
+
 # für REF
 def add_punc_tags(token, tagname="punc"):
 
@@ -260,37 +377,28 @@ def trans_to_cora_json(trans):
 
 
 def postprocess(MyImporter, MyExporter, postprocessor, document_processor=None):
+    """
+    Applies postprocessor to each token and document_processor to each
+    document of the files on the command line, in this process.
 
-    description = "Fügt einige extra Annotationen einer CorA-XML-Datei hinzu."
-    parser = argparse.ArgumentParser(description=description)
-    parser.add_argument("infiles", nargs="+", help="Eingabedateien (XML)")
-    parser.add_argument("-o", "--outpath", default=".", help="Ausgabepfad")
-    args, _ = parser.parse_known_args()
-
-    # name mod -> tok_anno, dipl -> tok_dipl
-
-    for filepath in args.infiles:
-
-        print("processing %s..." % filepath)
-        doc = MyImporter.import_from_file(filepath)
-
-        if doc is None:
-            print("Error: Could not load document %s" % filepath)
-            continue
-
-        for tok in filter(lambda x: isinstance(x, CoraToken), doc.tokens):
-
-            postprocessor(tok)
+    See coraxml_utils.pipeline for running several steps in parallel.
+    """
+    steps = [token_step(postprocessor)]
+    if document_processor:
+        steps.append(document_step(document_processor))
+    ## the given importer and exporter are used as they are, so that they
+    ## are part of the settings hash of a job manifest
+    pipeline = Pipeline(partial(_given, MyImporter), partial(_given, MyExporter), steps)
+    return run_from_command_line(
+        pipeline,
+        "Fügt einige extra Annotationen einer CorA-XML-Datei hinzu.",
+        workers=1,
+        parallel=False,
+    )
 
-        if document_processor:
-            document_processor(doc)
 
-        output_xml = MyExporter.export(doc)
-        outfilepath = str(Path(args.outpath) / (doc.sigle + ".xml"))
-        with open(outfilepath, "wb") as outfile:
-            output_xml.write(
-                outfile, xml_declaration=True, pretty_print=True, encoding="utf-8"
-            )
+def _given(value):
+    return value
 
 
 def ref_convert(tok):
@@ -668,7 +776,7 @@ def anselm_correct_tokenization(doc):
                         all_rel_lines.pop(0)
 
                     all_rel_lines[0].dipls.insert(current_index, new_dipl)
-                    doc._create_indices()
+                    doc.layout_changed()
 
                     # dipl has own line: don't set line_bound
                     #  otherwise line continues, remove line_bound flag:
@@ -678,7 +786,7 @@ def anselm_correct_tokenization(doc):
                 else:
                     # add dipl normally
                     all_rel_lines[0].dipls.insert(current_index, new_dipl)
-                    doc._create_indices()
+                    doc.layout_changed()
                     current_index += 1
 
                     if new_dipl.trans.has(Joiner) and tok.id not in marginalia:
@@ -742,56 +850,84 @@ def anselm_postprocess(tok):
     update_punct_pos(tok)
 
 
-def repair_header(doc, repair_infos):
+def _find_repair_infos(sigle, repair_infos):
     with open(repair_infos, "r", encoding="utf-8") as metadata_file:
         csvreader = csv.DictReader(metadata_file, dialect="excel-tab")
-        for row in csvreader:
-            if row["Sigle"].strip() == doc.sigle:
-
-                new_header_string = list()
-                lines_to_delete = [
-                    "Text eingegeben",
-                    "Datum",
-                    "Bearbeiter",
-                    "Text vorkollationiert",
-                    "Text kollationiert",
-                    "Lat. Passage",
-                    "Kenn-Name",
-                    "Präeditiert",
-                    "Praeditiert",
-                    "Grubert-Nummer",
-                    "Datierung",
-                    "Lokalisierung",
-                    "Textart",
-                    "Fassung",
-                    "Bibliothek",
-                    "Archiv",
-                    "Signatur",
-                    "Folio",
-                    "Blatt",
-                    "Edition",
-                    "Provenienz",
-                    "Literatur",
-                    "vorhandener Text",
-                    "Vorhandener Text",
-                ]
-
-                # delete unnecessary info from header
-                for line in doc.header_string.strip().split("\n"):
-                    line = line.strip()
-                    if not line:
-                        continue
-                    elif any(line.startswith(x) for x in lines_to_delete):
-                        continue
-                    else:
-                        new_header_string.append(line)
+        return [row for row in csvreader if row["Sigle"].strip() == sigle]
+
+
+def _repaired_header_string(header_string, row):
 
-                # add important info to header
-                new_keyval_strings = list()
-                for key, val in row.items():
-                    new_keyval_strings.append(key + ": " + val)
+    new_header_string = list()
+    lines_to_delete = [
+        "Text eingegeben",
+        "Datum",
+        "Bearbeiter",
+        "Text vorkollationiert",
+        "Text kollationiert",
+        "Lat. Passage",
+        "Kenn-Name",
+        "Präeditiert",
+        "Praeditiert",
+        "Grubert-Nummer",
+        "Datierung",
+        "Lokalisierung",
+        "Textart",
+        "Fassung",
+        "Bibliothek",
+        "Archiv",
+        "Signatur",
+        "Folio",
+        "Blatt",
+        "Edition",
+        "Provenienz",
+        "Literatur",
+        "vorhandener Text",
+        "Vorhandener Text",
+    ]
 
-                doc.header_string = "\n".join(new_keyval_strings + new_header_string)
+    # delete unnecessary info from header
+    for line in header_string.strip().split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        elif any(line.startswith(x) for x in lines_to_delete):
+            continue
+        else:
+            new_header_string.append(line)
+
+    # add important info to header
+    new_keyval_strings = list()
+    for key, val in row.items():
+        new_keyval_strings.append(key + ": " + val)
+
+    return "\n".join(new_keyval_strings + new_header_string)
+
+
+def repair_header(doc, repair_infos):
+    ## every matching row is applied, in the order of the file
+    for row in _find_repair_infos(doc.sigle, repair_infos):
+        doc.header_string = _repaired_header_string(doc.header_string, row)
+
+
+def repair_header_file(filename, repair_infos, outfilename=None):
+    """
+    Same as repair_header, but only reads and rewrites the header of a
+    CorA-XML file instead of importing the whole document. Without a
+    matching row, the file is copied to outfilename unchanged.
+    """
+    cora_header = read_coraxml_header(filename)
+    rows = _find_repair_infos(cora_header["sigle"], repair_infos)
+    if rows:
+        header_string = cora_header["header_string"] or ""
+        for row in rows:
+            header_string = _repaired_header_string(header_string, row)
+        replace_coraxml_header(filename, header_string, outfilename=outfilename)
+    elif outfilename is not None:
+        with open(filename, "rb") as infile:
+            write_atomically(
+                outfilename, lambda outfile: shutil.copyfileobj(infile, outfile)
+            )
 
 
 def anselm_document_postprocess(doc):
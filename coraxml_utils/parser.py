@@ -940,7 +940,9 @@ class ReNParser(CFGParser):
             tmp_parse = copy.deepcopy(parse)
             self.process_parse(tmp_parse)
             ## if empty: return full transcription
-            if not "".join([dipl.utf() for dipl in tmp_parse.tokenize_dipl()]):
+            if not any(
+                c.dipl_utf for c in tmp_parse.parse if not isinstance(c, Whitespace)
+            ):
                 tmp_parse = self.process_parse(parse, True)
 
             return tmp_parse
@@ -0,0 +1,438 @@
+"""
+Runs modifier steps over many documents.
+
+A pipeline imports each document, applies an ordered list of steps and
+exports the result. Token steps are functions called with each CoraToken,
+document steps are called with the Document; consecutive token steps are
+fused into a single pass over `doc.tokens`. Documents are processed in a
+pool of worker processes, each with its own importer and exporter, and the
+time spent in each step is reported.
+
+    pipeline = Pipeline(
+        partial(create_importer, "coraxml", dialect="anselm", strict=False),
+        partial(create_exporter, "coraxml"),
+        [token_step(anselm_postprocess), document_step(anselm_document_postprocess)],
+    )
+    results = pipeline.run(infiles, "out", workers=4)
+
+The importer and exporter are given as functions that create them, so that
+they can be created in the workers; with several workers, they and the
+steps have to be picklable (e.g. module-level functions and partials).
+
+With a `JobManifest`, the state of each input is recorded after each
+document, and a rerun skips the inputs whose content and pipeline settings
+are unchanged and whose output is still in place, so that an interrupted
+or partly failed run only repeats what is missing.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+
+from coraxml_utils.coralib import CoraToken
+from coraxml_utils.fileutils import write_atomically
+
+TOKEN = "token"
+DOCUMENT = "document"
+
+
+class Step:
+    def __init__(self, function, level=TOKEN, name=None):
+        if level not in (TOKEN, DOCUMENT):
+            raise ValueError("Unknown step level: " + str(level))
+        self.function = function
+        self.level = level
+        self.name = name or function.__name__
+
+
+def token_step(function, name=None):
+    return Step(function, TOKEN, name)
+
+
+def document_step(function, name=None):
+    return Step(function, DOCUMENT, name)
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as infile:
+        for block in iter(lambda: infile.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _describe(value):
+    """A JSON description of a configuration value, for settings hashes."""
+    if isinstance(value, partial):
+        return {
+            "function": _describe(value.func),
+            "args": [_describe(arg) for arg in value.args],
+            "keywords": {name: _describe(arg) for name, arg in value.keywords.items()},
+        }
+    if isinstance(value, Step):
+        return {"step": _describe(value.function), "level": value.level}
+    if isinstance(value, dict):
+        return {str(name): _describe(arg) for name, arg in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_describe(arg) for arg in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if hasattr(value, "__qualname__"):
+        return "{0}:{1}".format(getattr(value, "__module__", ""), value.__qualname__)
+    if hasattr(value, "__dict__"):
+        ## an object such as an importer: its class and its settings, other
+        ## attributes (parsers, counters) only by their class
+        return {
+            "class": _describe(type(value)),
+            "attributes": {
+                name: _describe(arg)
+                if isinstance(arg, (str, int, float, bool)) or arg is None
+                else _describe(type(arg))
+                for name, arg in vars(value).items()
+            },
+        }
+    return repr(value)
+
+
+class JobManifest:
+    """
+    Records per input the hash of its content, the hash of the pipeline
+    settings, the output path and the hash of the output, and whether it
+    was processed successfully. The file is rewritten after each document.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        try:
+            with open(filename, "r", encoding="utf-8") as manifest_file:
+                self.jobs = json.load(manifest_file)
+        except FileNotFoundError:
+            self.jobs = dict()
+
+    @staticmethod
+    def _key(filepath):
+        return os.path.abspath(str(filepath))
+
+    def is_done(self, filepath, input_hash, settings_hash, output_path=None):
+        """
+        Whether the input was processed like this and its output is unchanged;
+        output_path is a function that returns the output path for a sigle.
+        """
+        job = self.jobs.get(self._key(filepath))
+        if (
+            job is None
+            or job["status"] != "done"
+            or job["input_hash"] != input_hash
+            or job["settings_hash"] != settings_hash
+            or not os.path.exists(job["output"])
+        ):
+            return False
+        if output_path is not None and os.path.abspath(
+            output_path(job["sigle"])
+        ) != os.path.abspath(job["output"]):
+            return False
+        return _file_hash(job["output"]) == job["output_hash"]
+
+    def get(self, filepath):
+        return self.jobs.get(self._key(filepath))
+
+    def update(self, result, input_hash, settings_hash):
+        output = result["output"]
+        with self._lock:
+            self.jobs[self._key(result["input"])] = {
+                "input_hash": input_hash,
+                "settings_hash": settings_hash,
+                "sigle": result["sigle"],
+                "output": os.path.abspath(output) if output else None,
+                "output_hash": _file_hash(output) if output else None,
+                "status": "done" if result["error"] is None else "failed",
+                "error": result["error"],
+            }
+            self.save()
+
+    def save(self):
+        write_atomically(
+            self.filename,
+            lambda outfile: outfile.write(
+                json.dumps(self.jobs, indent=2, sort_keys=True).encode("utf-8")
+            ),
+        )
+
+
+def _write_output(outdoc, outfile):
+    if hasattr(outdoc, "write"):
+        ## xml
+        outdoc.write(outfile, xml_declaration=True, pretty_print=True, encoding="utf-8")
+    elif isinstance(outdoc, bytes):
+        outfile.write(outdoc)
+    elif isinstance(outdoc, dict):
+        outfile.write(json.dumps(outdoc).encode("utf-8"))
+    else:
+        outfile.write(str(outdoc).encode("utf-8"))
+
+
+class Pipeline:
+    def __init__(
+        self,
+        create_importer,
+        create_exporter,
+        steps,
+        output_template="{sigle}.xml",
+        settings=None,
+    ):
+        self.create_importer = create_importer
+        self.create_exporter = create_exporter
+        self.steps = list(steps)
+        self.output_template = output_template
+        ## further settings that affect the outputs, e.g. a version
+        self.settings = settings
+
+        ## consecutive token steps are run in one pass
+        self.stages = []
+        for step in self.steps:
+            if step.level == TOKEN and self.stages and self.stages[-1][0] == TOKEN:
+                self.stages[-1][1].append(step)
+            else:
+                self.stages.append((step.level, [step]))
+
+        self._importer = None
+        self._exporter = None
+
+    def __getstate__(self):
+        ## importer and exporter are created again in each worker
+        state = dict(self.__dict__)
+        state["_importer"] = state["_exporter"] = None
+        return state
+
+    def apply(self, doc, timings=None):
+        """Applies the steps to the document, adds their times to timings."""
+        if timings is None:
+            timings = dict()
+        for level, steps in self.stages:
+            if level == DOCUMENT:
+                start = time.perf_counter()
+                steps[0].function(doc)
+                _add_time(timings, steps[0].name, time.perf_counter() - start)
+                continue
+
+            functions = [step.function for step in steps]
+            spent = [0.0] * len(functions)
+            for token in doc.tokens:
+                if isinstance(token, CoraToken):
+                    for i, function in enumerate(functions):
+                        start = time.perf_counter()
+                        function(token)
+                        spent[i] += time.perf_counter() - start
+            for step, seconds in zip(steps, spent):
+                _add_time(timings, step.name, seconds)
+        return timings
+
+    def process(self, filepath, outpath):
+        """
+        Imports, modifies and exports one file. Returns a result dictionary
+        with input, output, sigle, timings and error (None on success).
+        """
+        result = {
+            "input": str(filepath),
+            "output": None,
+            "sigle": None,
+            "timings": OrderedDict(),
+            "error": None,
+            "skipped": False,
+        }
+        timings = result["timings"]
+        try:
+            if self._importer is None:
+                self._importer = self.create_importer()
+                self._exporter = self.create_exporter()
+
+            start = time.perf_counter()
+            doc = self._importer.import_from_file(str(filepath))
+            _add_time(timings, "import", time.perf_counter() - start)
+            if doc is None:
+                raise ValueError("Could not load document " + str(filepath))
+            result["sigle"] = doc.sigle
+
+            self.apply(doc, timings)
+
+            start = time.perf_counter()
+            outdoc = self._exporter.export(doc)
+            outfilepath = self.output_path(outpath, doc.sigle, filepath)
+            outfilepath.parent.mkdir(parents=True, exist_ok=True)
+            write_atomically(
+                str(outfilepath), lambda outfile: _write_output(outdoc, outfile)
+            )
+            _add_time(timings, "export", time.perf_counter() - start)
+            result["output"] = str(outfilepath)
+        except Exception as e:
+            logging.exception("Processing %s failed", filepath)
+            result["error"] = "{0}: {1}".format(type(e).__name__, e)
+        return result
+
+    def output_path(self, outpath, sigle, filepath):
+        return Path(outpath) / self.output_template.format(
+            sigle=sigle, stem=Path(filepath).stem
+        )
+
+    def settings_hash(self):
+        """
+        A hash of the importer, exporter, steps, output template and
+        settings. Changes to the code of the steps are not noticed; change
+        the settings to rebuild all outputs.
+        """
+        description = _describe(
+            [
+                self.create_importer,
+                self.create_exporter,
+                self.steps,
+                self.output_template,
+                self.settings,
+            ]
+        )
+        return hashlib.sha256(
+            json.dumps(description, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def run(self, filepaths, outpath=".", workers=1, manifest=None):
+        """
+        Processes the files, with workers > 1 in a pool of processes.
+        Returns the results of process() in the order of the files.
+
+        Files that the manifest lists as done, with their output at the
+        path it would be written to now, are skipped (their results have
+        "skipped" set), all others are recorded in it when finished.
+        """
+        filepaths = list(filepaths)
+        results = [None] * len(filepaths)
+        todo = []
+        input_hashes = dict()
+        settings_hash = self.settings_hash() if manifest is not None else None
+        for i, filepath in enumerate(filepaths):
+            if manifest is not None:
+                input_hashes[i] = _file_hash(filepath)
+                if manifest.is_done(
+                    filepath,
+                    input_hashes[i],
+                    settings_hash,
+                    partial(self.output_path, outpath, filepath=filepath),
+                ):
+                    job = manifest.get(filepath)
+                    results[i] = {
+                        "input": str(filepath),
+                        "output": job["output"],
+                        "sigle": job["sigle"],
+                        "timings": OrderedDict(),
+                        "error": None,
+                        "skipped": True,
+                    }
+                    continue
+            todo.append(i)
+
+        def finish(i, result):
+            results[i] = result
+            if manifest is not None:
+                manifest.update(result, input_hashes[i], settings_hash)
+
+        if workers <= 1 or len(todo) <= 1:
+            for i in todo:
+                finish(i, self.process(filepaths[i], outpath))
+            return results
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+            futures = {
+                executor.submit(_process_in_worker, filepaths[i], outpath): i
+                for i in todo
+            }
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+        return results
+
+
+def _add_time(timings, name, seconds):
+    timings[name] = timings.get(name, 0.0) + seconds
+
+
+## the pipeline of a worker process, with its importer and exporter
+_worker_pipeline = None
+
+
+def _init_worker(pipeline):
+    global _worker_pipeline
+    _worker_pipeline = pipeline
+
+
+def _process_in_worker(filepath, outpath):
+    return _worker_pipeline.process(filepath, outpath)
+
+
+def total_timings(results):
+    """Sums the timings of all results per step."""
+    totals = OrderedDict()
+    for result in results:
+        for name, seconds in result["timings"].items():
+            _add_time(totals, name, seconds)
+    return totals
+
+
+def run_from_command_line(
+    pipeline, description, args=None, workers=None, parallel=True
+):
+    """
+    Parses the command line (input files, output path, number of workers)
+    and runs the pipeline; workers is the default number of workers. If
+    not parallel, e.g. because the importer cannot be pickled, more than
+    one worker is rejected.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("infiles", nargs="+", help="Eingabedateien (XML)")
+    parser.add_argument("-o", "--outpath", default=".", help="Ausgabepfad")
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=workers or os.cpu_count() or 1,
+        help="Anzahl paralleler Prozesse (Default: %(default)s)",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest",
+        help="Job-Manifest; unveränderte Dateien werden übersprungen",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="Alle Dateien neu verarbeiten, auch wenn sie unverändert sind",
+    )
+    args, _ = parser.parse_known_args(args)
+    if args.workers > 1 and not parallel:
+        parser.error("this pipeline runs in a single process, -j must be 1")
+
+    manifest = None
+    if args.manifest:
+        manifest = JobManifest(args.manifest)
+        if args.force:
+            manifest.jobs = dict()
+    results = pipeline.run(
+        args.infiles, args.outpath, workers=args.workers, manifest=manifest
+    )
+    for result in results:
+        if result["skipped"]:
+            print("unchanged %s -> %s" % (result["input"], result["output"]))
+        elif result["error"] is None:
+            print("processed %s -> %s" % (result["input"], result["output"]))
+        else:
+            print("Error: %s: %s" % (result["input"], result["error"]))
+    for name, seconds in total_timings(results).items():
+        print("%-40s %8.3fs" % (name, seconds))
+    return results
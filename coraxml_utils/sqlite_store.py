@@ -0,0 +1,236 @@
+"""
+Schema and queries of the SQLite corpus store.
+
+Documents are written by `SQLiteExporter` and rebuilt by `SQLiteImporter`.
+Every layout element, token, dipl and anno is a row; the tags of annos are
+stored as name/value rows, so that corpus queries like
+
+    find_annos(connection, pos="ADJA", lemma="gut")
+
+only touch the indexes.
+"""
+
+import sqlite3
+
+SCHEMA = """
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    sigle TEXT UNIQUE NOT NULL,
+    name TEXT,
+    header TEXT,
+    header_string TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    extid TEXT,
+    name TEXT,
+    side TEXT
+);
+CREATE TABLE IF NOT EXISTS columns (
+    id INTEGER PRIMARY KEY,
+    page_id INTEGER NOT NULL REFERENCES pages ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    extid TEXT,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    column_id INTEGER NOT NULL REFERENCES columns ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    extid TEXT,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    extid TEXT,
+    trans TEXT
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    type TEXT,
+    content TEXT
+);
+CREATE TABLE IF NOT EXISTS shifttags (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents ON DELETE CASCADE,
+    type TEXT,
+    start_position INTEGER NOT NULL,
+    end_position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dipls (
+    id INTEGER PRIMARY KEY,
+    token_id INTEGER NOT NULL REFERENCES tokens ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    line_id INTEGER REFERENCES lines ON DELETE SET NULL,
+    extid TEXT,
+    trans TEXT,
+    utf TEXT
+);
+CREATE TABLE IF NOT EXISTS annos (
+    id INTEGER PRIMARY KEY,
+    token_id INTEGER NOT NULL REFERENCES tokens ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    extid TEXT,
+    trans TEXT,
+    utf TEXT,
+    simple TEXT,
+    checked INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS anno_tags (
+    anno_id INTEGER NOT NULL REFERENCES annos ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS anno_flags (
+    anno_id INTEGER NOT NULL REFERENCES annos ON DELETE CASCADE,
+    name TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS pages_document ON pages (document_id, position);
+CREATE INDEX IF NOT EXISTS columns_page ON columns (page_id, position);
+CREATE INDEX IF NOT EXISTS lines_column ON lines (column_id, position);
+CREATE INDEX IF NOT EXISTS tokens_document ON tokens (document_id, position);
+CREATE INDEX IF NOT EXISTS comments_document ON comments (document_id);
+CREATE INDEX IF NOT EXISTS shifttags_document ON shifttags (document_id);
+CREATE INDEX IF NOT EXISTS dipls_token ON dipls (token_id, position);
+CREATE INDEX IF NOT EXISTS dipls_line ON dipls (line_id);
+CREATE INDEX IF NOT EXISTS annos_token ON annos (token_id, position);
+CREATE INDEX IF NOT EXISTS anno_tags_anno ON anno_tags (anno_id);
+CREATE INDEX IF NOT EXISTS anno_tags_value ON anno_tags (name, value, anno_id);
+CREATE INDEX IF NOT EXISTS anno_flags_anno ON anno_flags (anno_id);
+CREATE INDEX IF NOT EXISTS anno_flags_name ON anno_flags (name, anno_id);
+CREATE INDEX IF NOT EXISTS tokens_trans ON tokens (trans);
+CREATE INDEX IF NOT EXISTS dipls_trans ON dipls (trans);
+CREATE INDEX IF NOT EXISTS dipls_utf ON dipls (utf);
+CREATE INDEX IF NOT EXISTS annos_trans ON annos (trans);
+CREATE INDEX IF NOT EXISTS annos_utf ON annos (utf);
+CREATE INDEX IF NOT EXISTS annos_simple ON annos (simple);
+"""
+
+## tables whose ids are assigned by the exporter, in the order of insertion
+TABLES = (
+    "documents",
+    "pages",
+    "columns",
+    "lines",
+    "tokens",
+    "comments",
+    "shifttags",
+    "dipls",
+    "annos",
+)
+
+
+def connect(database):
+    """
+    Opens the store (a filename or an open sqlite3 connection) and makes
+    sure that all tables exist.
+    """
+    if isinstance(database, sqlite3.Connection):
+        connection = database
+    else:
+        connection = sqlite3.connect(database)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def list_documents(connection):
+    """Returns the sigles of all stored documents."""
+    return [
+        row["sigle"]
+        for row in connection.execute("SELECT sigle FROM documents ORDER BY id")
+    ]
+
+
+def find_annos(connection, forms=None, flags=(), **tags):
+    """
+    Returns the annos that have all the given tag values, e.g.
+    `find_annos(connection, pos="ADJA", lemma="gut")`.
+
+    forms restricts the transcriptions of the annos (e.g. {"simple": "gut"}),
+    flags lists flags the annos must have. Each result row has the keys
+    sigle, token, anno (external ids), trans, utf and simple.
+    """
+    conditions = []
+    params = []
+    for name, value in tags.items():
+        conditions.append(
+            "a.id IN (SELECT anno_id FROM anno_tags WHERE name = ? AND value = ?)"
+        )
+        params.extend((name, value))
+    for name in flags:
+        conditions.append("a.id IN (SELECT anno_id FROM anno_flags WHERE name = ?)")
+        params.append(name)
+    for form, value in (forms or dict()).items():
+        if form not in ("trans", "utf", "simple"):
+            raise ValueError("Unknown transcription form: " + form)
+        conditions.append("a.{0} = ?".format(form))
+        params.append(value)
+
+    query = (
+        "SELECT d.sigle AS sigle, t.extid AS token, a.extid AS anno,"
+        " a.trans AS trans, a.utf AS utf, a.simple AS simple"
+        " FROM annos a JOIN tokens t ON a.token_id = t.id"
+        " JOIN documents d ON t.document_id = d.id"
+    )
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY d.id, t.position, a.position"
+    return connection.execute(query, params).fetchall()
+
+
+class BatchInserter:
+    """
+    Collects rows and inserts them with executemany once `batch_size` rows
+    are pending.
+
+    Ids of the tables in TABLES are assigned here, so that child rows can
+    refer to rows that have not been inserted yet; the caller has to hold
+    a write lock on the database (BEGIN IMMEDIATE).
+    """
+
+    def __init__(self, connection, batch_size=10000):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.next_ids = {
+            table: connection.execute(
+                "SELECT COALESCE(MAX(id), 0) + 1 FROM " + table
+            ).fetchone()[0]
+            for table in TABLES
+        }
+        self.rows = dict()
+        self.pending = 0
+
+    def add(self, table, *values):
+        """Adds a row, returns its id (None for tables without ids)."""
+        row_id = self.next_ids.get(table)
+        if row_id is not None:
+            self.next_ids[table] += 1
+            values = (row_id,) + values
+        self.rows.setdefault(table, []).append(values)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+        return row_id
+
+    def flush(self):
+        ## parent tables first because of the foreign keys
+        for table in TABLES + ("anno_tags", "anno_flags"):
+            rows = self.rows.pop(table, None)
+            if rows:
+                self.connection.executemany(
+                    "INSERT INTO {0} VALUES ({1})".format(
+                        table, ", ".join("?" * len(rows[0]))
+                    ),
+                    rows,
+                )
+        self.pending = 0
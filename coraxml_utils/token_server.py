@@ -0,0 +1,125 @@
+"""
+Local server for parsing single tokens, as needed by CorA's token editing script.
+
+The server keeps parsers for all dialects in memory and answers requests
+concurrently:
+
+    POST /parse/<dialect>   body: the token transcription (UTF-8)
+
+The response is the JSON expected by CorA (see `trans_to_cora_json`), or
+the error message with status 400 if the token could not be parsed.
+
+`parse_token_remote` is the client side and only needs the standard
+library, so that clients start fast.
+"""
+
+import logging
+import queue
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class TokenParseError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class ParserPool:
+    """Keeps ready-to-use parser instances for the given dialects."""
+
+    def __init__(self, dialects):
+        from coraxml_utils.parser import dialect_mapper
+
+        self._parser_classes = {dialect: dialect_mapper[dialect] for dialect in dialects}
+        self._parsers = {dialect: queue.LifoQueue() for dialect in dialects}
+        ## create (and compile) one parser per dialect in advance
+        for dialect, parser_class in self._parser_classes.items():
+            self._parsers[dialect].put(parser_class())
+
+    def __contains__(self, dialect):
+        return dialect in self._parsers
+
+    def parse(self, dialect, token):
+        ## parser instances are not shared between threads
+        parsers = self._parsers[dialect]
+        try:
+            token_parser = parsers.get_nowait()
+        except queue.Empty:
+            token_parser = self._parser_classes[dialect]()
+        try:
+            return token_parser.parse(token)
+        finally:
+            parsers.put(token_parser)
+
+
+class TokenRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        from coraxml_utils.parser import ParseError
+        from coraxml_utils.modifier import trans_to_cora_json
+
+        prefix, _, dialect = self.path.rpartition("/")
+        if prefix != "/parse" or dialect not in self.server.parser_pool:
+            self._respond(404, "text/plain", "Unknown dialect or path: " + self.path)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        token = self.rfile.read(length).decode("utf-8").strip()
+
+        try:
+            parsed_token = self.server.parser_pool.parse(dialect, token)
+            self._respond(200, "application/json", trans_to_cora_json(parsed_token))
+        except ParseError as e:
+            self._respond(400, "text/plain", e.message)
+        except Exception as e:
+            logging.exception("Token could not be parsed: %s", token)
+            self._respond(500, "text/plain", str(e))
+
+    def _respond(self, status, content_type, body):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+def create_token_server(dialects, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    ## import everything needed for requests before the first one comes in
+    import coraxml_utils.modifier
+
+    server = ThreadingHTTPServer((host, port), TokenRequestHandler)
+    server.daemon_threads = True
+    server.parser_pool = ParserPool(dialects)
+    return server
+
+
+def parse_token_remote(token, dialect, url=None, timeout=10):
+    """
+    Lets a running token server parse a token, returns the JSON for CorA.
+
+    Raises TokenParseError if the token could not be parsed (status 400)
+    and OSError if the server is not reachable or cannot parse it for
+    other reasons, e.g. if it was not started with the dialect.
+    """
+    if url is None:
+        url = "http://{0}:{1}".format(DEFAULT_HOST, DEFAULT_PORT)
+    request = urllib.request.Request(
+        url.rstrip("/") + "/parse/" + dialect,
+        data=token.encode("utf-8"),
+        headers={"Content-Type": "text/plain; charset=utf-8"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        if e.code == 400:
+            raise TokenParseError(e.read().decode("utf-8"))
+        raise
@@ -1,9 +1,14 @@
 import regex
-import logging
+
+from coraxml_utils.diagnostics import Diagnostics
 
 
 class RexTokenizer:
-    def __init__(self):
+    def __init__(self, diagnostics=None):
+        ## a collector of its own is cleared with each call of tokenize(),
+        ## one shared with an importer is cleared by the importer
+        self._own_diagnostics = diagnostics is None
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics()
         self.token_re = r"(?P<tok> [^\s{+@][^\s+@]* )"
         self.joiner_re = r"\[?\[? ( \(=\) | =\| | = ) \]?\]? [ \t]*\n[ \t]*"
         self.token_lineend_re = (
@@ -31,6 +36,10 @@ class RexTokenizer:
         self.tokenize_re = regex.compile("|".join(re_parts), flags=regex.VERBOSE)
 
     def tokenize(self, inputtext):
+        if self._own_diagnostics:
+            self.diagnostics.clear()
+        ## locations of diagnostics are offsets in inputtext
+        report = self.diagnostics.report
         result = list()
         last_token = ""
         last_shifttags = list()
@@ -39,18 +48,15 @@ class RexTokenizer:
 
             if matchlabels["com"]:
                 if matchlabels["cotyp"][0] != matchlabels["cctyp"][0]:
-                    logging.error(
-                        "Comment opening ({0}) and closing ({1}) tag types do not match".format(
-                            matchlabels["cotyp"][0], matchlabels["cctyp"][0]
-                        )
+                    report(
+                        "comment_type",
+                        match.start(),
+                        matchlabels["cotyp"][0],
+                        matchlabels["cctyp"][0],
                     )
 
                 if not isinstance(result[-1], Whitespace):
-                    logging.warning(
-                        "Comment after '{0}' is not preceded by whitespace".format(
-                            result[-1]
-                        )
-                    )
+                    report("comment_space", match.start(), result[-1])
 
                 result.append(
                     Comment(matchlabels["cotyp"][0], matchlabels["ctxt"][0].strip())
@@ -61,20 +67,17 @@ class RexTokenizer:
                 last_shifttags.append(matchlabels["sotyp"][0])
 
             elif matchlabels["stc"]:
-                try:
+                if not last_shifttags:
+                    report("shifttag_unopened", match.start(), matchlabels["sctyp"][0])
+                else:
                     last_shifttag = last_shifttags.pop()
-                except IndexError:
-                    logging.error(
-                        "Shifttag '{0}' closes but wasn't opened".format(
-                            matchlabels["sctyp"][0]
+                    if last_shifttag != matchlabels["sctyp"][0]:
+                        report(
+                            "shifttag_type",
+                            match.start(),
+                            last_shifttag,
+                            matchlabels["sctyp"][0],
                         )
-                    )
-                if last_shifttag != matchlabels["sctyp"][0]:
-                    logging.error(
-                        "Shifttag opening ({0}) and closing ({1}) tag types do not match".format(
-                            last_shifttag, matchlabels["sctyp"][0]
-                        )
-                    )
                 result.append(ShiftTagClose(matchlabels["sctyp"][0]))
 
             elif matchlabels["secedit"]:
@@ -91,35 +94,29 @@ class RexTokenizer:
             elif matchlabels["sp"]:
                 chunk = matchlabels["sp"][0]
                 if "\t" in chunk:
-                    logging.warning(
-                        "Tab used to separate tokens after '{0}'".format(last_token)
-                    )
+                    report("tab_separator", match.start(), last_token)
                 result.append(Whitespace(chunk))
 
             elif matchlabels["end"]:
                 chunk = matchlabels["end"][0]
                 if chunk != "\n":
-                    logging.warning(
-                        "Extra whitespace at line break after '{0}'".format(last_token)
-                    )
+                    report("linebreak_space", match.start(), last_token)
                     # corrects anomalous line breaks
                     chunk = "\n"
                 result.append(Newline(chunk))
 
             else:
-                logging.warning("Unknown entity in " + matchlabels)
+                report("unknown_entity", match.start(), matchlabels)
 
         if last_shifttags:
-            logging.error(
-                "Shifttags {0} still open at end of document".format(last_shifttags)
-            )
+            report("shifttag_open", len(inputtext), last_shifttags)
 
         return result
 
 
 class RediTokenizer(RexTokenizer):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, diagnostics=None):
+        super().__init__(diagnostics)
         # self.secedit_number_re = re.compile(r"^\{ (?!\d\d?\}) (\{ [^{}]* [^ {}\*÷] \})", re.VERBOSE)
 
         # accounts for special abbrevs. in Redi texts, e.g. {2}
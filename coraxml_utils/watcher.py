@@ -0,0 +1,85 @@
+"""
+Polls a directory for changed files, as used by the `watch` command.
+
+Files are compared by modification time and size. A change is reported
+once the file has stayed the same for `debounce` seconds, so that files
+that are still being written (or saved several times in a row by an
+editor) are only reported once.
+"""
+
+import fnmatch
+import os
+import time
+
+
+class DirectoryWatcher:
+    def __init__(
+        self,
+        directory,
+        patterns=("*",),
+        interval=0.5,
+        debounce=1.0,
+        initial=False,
+        clock=time.monotonic,
+    ):
+        self.directory = directory
+        self.patterns = list(patterns)
+        self.interval = interval
+        self.debounce = debounce
+        self.clock = clock
+        ## files written by the caller, e.g. the outputs
+        self.ignored = set()
+        ## path -> (mtime, size) of the last reported version
+        self.known = dict() if initial else self.scan()
+        ## path -> ((mtime, size), time the version was first seen)
+        self.pending = dict()
+
+    def ignore(self, path):
+        self.ignored.add(os.path.abspath(path))
+
+    def scan(self):
+        files = dict()
+        for root, dirnames, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if not any(fnmatch.fnmatch(filename, pattern) for pattern in self.patterns):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def poll(self):
+        """Returns the files that have changed and have been stable since."""
+        now = self.clock()
+        current = self.scan()
+        for path in list(self.known):
+            if path not in current:
+                del self.known[path]
+        for path in list(self.pending):
+            if path not in current:
+                del self.pending[path]
+
+        for path, signature in current.items():
+            if self.known.get(path) == signature or os.path.abspath(path) in self.ignored:
+                continue
+            if self.pending.get(path, (None,))[0] != signature:
+                self.pending[path] = (signature, now)
+
+        changed = sorted(
+            path
+            for path, (_, since) in self.pending.items()
+            if now - since >= self.debounce
+        )
+        for path in changed:
+            self.known[path] = self.pending.pop(path)[0]
+        return changed
+
+    def watch(self, callback):
+        """Calls callback(path) for each changed file, until interrupted."""
+        while True:
+            for path in self.poll():
+                callback(path)
+            time.sleep(self.interval)
@@ -0,0 +1,22 @@
+## A small CorA-XML document in the anselm dialect, shared by the tests:
+## page, column and two lines, a shift tag, a comment, a token with two
+## dipls and annotations with checked flag, lemma and pos tags.
+DOCUMENT = """<?xml version='1.0' encoding='utf-8'?>
+<text id="a1">
+<cora-header sigle="A1" name="Test"/>
+<header>Sigle: A1</header>
+<layoutinfo>
+<page id="p1" no="1" side="r" range="c1"/>
+<column id="c1" name="a" range="l1..l2"/>
+<line id="l1" name="1" range="t1_d1..t2_d1"/>
+<line id="l2" name="2" range="t2_d2..t3_d1"/>
+</layoutinfo>
+<shifttags>
+<lat range="t2..t3"/>
+</shifttags>
+<token id="t1" trans="vnd"><dipl id="t1_d1" trans="vnd" utf="vnd"/><mod id="t1_m1" trans="vnd" utf="vnd" ascii="vnd" checked="y"><pos tag="KON"/><lemma tag="und"/><cora-flag name="lemma verified"/></mod></token>
+<comment type="K">Randnotiz</comment>
+<token id="t2" trans="cz&#xFC;=hin"><dipl id="t2_d1" trans="cz&#xFC;=" utf="cz&#xFC;="/><dipl id="t2_d2" trans="hin" utf="hin"/><mod id="t2_m1" trans="cz&#xFC;=hin" utf="cz&#xFC;hin" ascii="cz&#xFC;hin"><pos tag="ADV"/><lemma tag="hinzu"/></mod></token>
+<token id="t3" trans="gut"><dipl id="t3_d1" trans="gut" utf="gut"/><mod id="t3_m1" trans="gut" utf="gut" ascii="gut"><pos tag="ADJA"/><lemma tag="gut"/></mod></token>
+</text>
+"""
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 from coraxml_utils.coralib import *
@@ -69,3 +70,79 @@ class DocumentTest(unittest.TestCase):
 
         self.assertTrue(all([doc.is_end_of_line(dipl) for dipl in line_endings]))
         self.assertFalse(any([doc.is_end_of_line(dipl) for dipl in non_line_endings]))
+
+
+    def test_layout_boundaries(self):
+
+        dipls = [TokDipl(None) for i in range(6)]
+
+        second_line = Line('2', [dipls[2], dipls[3]])
+        first_column = Column([Line('1', [dipls[0], dipls[1]]), second_line], name='a')
+        second_column = Column([Line('1', [dipls[4], dipls[5]])], name='b')
+        page = Page('1', 'r', [first_column, second_column])
+
+        doc = Document('t', 'Test', {}, [page], [])
+
+        self.assertIs(doc.page_starting_at(dipls[0]), page)
+        self.assertIs(doc.page_ending_at(dipls[5]), page)
+        self.assertIsNone(doc.page_ending_at(dipls[3]))
+        self.assertIs(doc.column_starting_at(dipls[4]), second_column)
+        self.assertIs(doc.column_ending_at(dipls[3]), first_column)
+        self.assertIsNone(doc.column_starting_at(dipls[2]))
+        self.assertIs(doc.line_starting_at(dipls[2]), second_line)
+        self.assertIs(doc.line_ending_at(dipls[3]), second_line)
+        self.assertIs(doc.line_of(dipls[3]), second_line)
+
+    def test_layout_changed(self):
+
+        dipls = [TokDipl(None) for i in range(3)]
+        line = Line('1', dipls[:2])
+        column = Column([line], name='a')
+        doc = Document('t', 'Test', {}, [Page('1', 'r', [column])], [])
+        self.assertIs(doc.line_ending_at(dipls[1]), line)
+
+        new_line = Line('2', [dipls[1], dipls[2]])
+        line.dipls = dipls[:1]
+        column.lines.append(new_line)
+        doc.layout_changed()
+
+        self.assertIs(doc.line_ending_at(dipls[0]), line)
+        self.assertIs(doc.line_of(dipls[1]), new_line)
+        self.assertIs(doc.column_ending_at(dipls[2]), column)
+
+    def test_annotation_index(self):
+
+        annos = [
+            TokAnno(None, tags={'pos': 'PDN'}),
+            TokAnno(None, tags={'pos': 'NA', 'lemma': 'x'}, flags={'boundary'}),
+            TokAnno(None, tags={'pos': 'PDN'}),
+        ]
+        doc = Document('t', 'Test', {}, [], [
+            CoraToken(None, [], annos[:2]), CoraComment('K', 'x'), CoraToken(None, [], annos[2:])
+        ])
+        index = doc.create_annotation_index()
+
+        self.assertEqual(index.annos_with_tag('pos', 'PDN'), [annos[0], annos[2]])
+        self.assertEqual(index.annos_with_tag('lemma'), [annos[1]])
+        self.assertEqual(index.annos_with_flag('boundary'), [annos[1]])
+
+        ## the index follows modifications
+        annos[0].tags['pos'] = 'PDS'
+        annos[2].tags.pop('pos')
+        annos[1].flags.discard('boundary')
+        annos[1].tags = {'pos': 'PDN'}
+
+        self.assertEqual(index.annos_with_tag('pos', 'PDN'), [annos[1]])
+        self.assertEqual(index.annos_with_tag('pos', 'PDS'), [annos[0]])
+        self.assertEqual(index.annos_with_tag('lemma'), [])
+        self.assertEqual(index.annos_with_flag('boundary'), [])
+        self.assertEqual(index.tag_values('pos'), {'PDS': 1, 'PDN': 1})
+
+    def test_pickle_annotations(self):
+
+        anno = pickle.loads(pickle.dumps(TokAnno(None, tags={'pos': 'NA'}, flags={'boundary'})))
+        anno.tags['pos'] = 'ADJA'
+        anno.flags.add('lemma verified')
+
+        self.assertEqual(anno.tags, {'pos': 'ADJA'})
+        self.assertEqual(anno.flags, {'boundary', 'lemma verified'})
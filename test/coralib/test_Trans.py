@@ -0,0 +1,39 @@
+import unittest
+
+from coraxml_utils.coralib import *
+from coraxml_utils.parser import *
+
+class TransTest(unittest.TestCase):
+
+    def test_strings_updated_after_parse_changes(self):
+
+        anno = TokAnno(AnselmParser().parse('$ey', output_type="anno"))
+        other = TokAnno(AnselmParser().parse('(.)', output_type="anno"))
+
+        self.assertEqual(anno.trans.utf(), 'ſey')
+        self.assertEqual(anno.trans.simple(), 'sey')
+
+        anno.merge(other)
+        self.assertEqual(anno.trans.trans(), '$ey(.)')
+        self.assertEqual(anno.trans.simple(), 'sey(.)')
+
+        del anno.trans.parse[-1]
+        self.assertEqual(anno.trans.trans(), '$ey')
+
+        anno.trans.parse = other.trans.parse
+        self.assertEqual(anno.trans.utf(), other.trans.utf())
+
+    def test_segmentation_cached_until_parse_changes(self):
+
+        trans = AnselmParser().parse('hin#czü|hin')
+
+        self.assertIs(trans.dipl_ranges(), trans.dipl_ranges())
+        self.assertEqual([dipl.trans() for dipl in trans.tokenize_dipl()], ['hin#', 'czü|hin'])
+
+        ## sub-transcriptions are new objects on every call
+        first, second = trans.tokenize_anno(), trans.tokenize_anno()
+        self.assertEqual(first, second)
+        self.assertIsNot(first[0], second[0])
+
+        del trans.parse[-4:]
+        self.assertEqual([dipl.trans() for dipl in trans.tokenize_dipl()], ['hin#', 'czü'])
@@ -0,0 +1,85 @@
+import io
+import unittest
+
+from coraxml_utils import binary_format
+from coraxml_utils.character import Majuscule
+from coraxml_utils.importer import create_importer
+from coraxml_utils.exporter import create_exporter
+
+from lxml import etree as ET
+
+from test import DOCUMENT
+
+## a majuscule, whose size has to survive the round trip
+DOCUMENT = DOCUMENT.replace('trans="vnd"', 'trans="*{V*3}nd"')
+
+
+class BinaryFormatTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.doc = create_importer('coraxml', 'anselm').import_from_file(
+            io.BytesIO(DOCUMENT.encode("utf-8"))
+        )
+        self.data = create_exporter('binary').export(self.doc)
+
+    def test_round_trip(self):
+
+        doc = create_importer('binary').import_from_string(self.data)
+
+        self.assertEqual(
+            ET.tostring(create_exporter('coraxml').export(doc)),
+            ET.tostring(create_exporter('coraxml').export(self.doc))
+        )
+        for token, expected_token in zip(doc.tokens, self.doc.tokens):
+            if hasattr(expected_token, "trans"):
+                self.assertEqual(token, expected_token)
+                self.assertEqual(token.trans.parse, expected_token.trans.parse)
+        self.assertIsInstance(doc.tokens[0].trans.parse[0], Majuscule)
+        self.assertEqual(doc.tokens[0].trans.parse[0].size, self.doc.tokens[0].trans.parse[0].size)
+        self.assertEqual(doc.shifttags[0].range(), "t2..t3")
+        self.assertEqual(doc.line_of(doc.tokens[2].tok_dipls[1]).name, "2")
+
+    def test_shared_characters(self):
+
+        doc = create_importer('binary').import_from_string(self.data)
+        token = doc.tokens[2]
+
+        ## characters shared by token and dipls are shared after loading
+        self.assertIs(token.trans.parse[-1], token.tok_dipls[-1].trans.parse[-1])
+
+    def test_same_characters_are_stored_once(self):
+
+        ## "vnd" of t1 and "hin" of t2 have no letter in common with "gut",
+        ## so the document has fewer kinds of characters than characters
+        data = create_exporter('binary').export(
+            create_importer('coraxml', 'anselm').import_from_file(
+                io.BytesIO(DOCUMENT.replace('"gut"', '"vnd"').encode("utf-8"))
+            )
+        )
+        self.assertLess(len(data), len(self.data))
+
+        doc = create_importer('binary').import_from_string(data)
+        self.assertIsNot(doc.tokens[0].trans.parse[-1], doc.tokens[3].trans.parse[-1])
+
+    def test_read_item(self):
+
+        token = binary_format.read_item(io.BytesIO(self.data), 3)
+        self.assertEqual(token.id, "t3")
+        self.assertEqual(token.tok_annos[0].tags["pos"], "ADJA")
+        self.assertEqual(binary_format.read_item(io.BytesIO(self.data), 1).type, "K")
+        with self.assertRaises(IndexError):
+            binary_format.read_item(io.BytesIO(self.data), 4)
+
+    def test_only_character_classes(self):
+
+        with self.assertRaises(ValueError):
+            binary_format._resolve_class("coraxml_utils.coralib:Document")
+        with self.assertRaises(ValueError):
+            binary_format._resolve_class("coraxml_utils.character:Missing")
+        self.assertIs(binary_format._resolve_class("coraxml_utils.character:Majuscule"), Majuscule)
+
+    def test_invalid_data(self):
+
+        with self.assertRaises(ValueError):
+            create_importer('binary').import_from_string(b"<?xml version='1.0'?>")
@@ -0,0 +1,48 @@
+import io
+import unittest
+
+from coraxml_utils.importer import create_importer
+from coraxml_utils.exporter import create_exporter
+
+from test import DOCUMENT
+
+## token t2 without lemma
+DOCUMENT = DOCUMENT.replace('<lemma tag="hinzu"/>', '')
+
+
+class ColumnarExporterTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.doc = create_importer('coraxml', 'anselm').import_from_file(
+            io.BytesIO(DOCUMENT.encode("utf-8"))
+        )
+
+    def test_export_tsv(self):
+
+        rows = [row.split("\t") for row in create_exporter('tsv').export(self.doc).split("\n")]
+
+        self.assertEqual(
+            rows[0],
+            ["sigle", "token", "anno", "page", "column", "line", "trans", "utf",
+             "simple", "checked", "flags", "pos", "lemma"]
+        )
+        self.assertEqual(
+            rows[1],
+            ["A1", "t1", "t1_m1", "1r", "a", "1", "vnd", "vnd", "vnd", "1",
+             "lemma verified", "KON", "und"]
+        )
+        ## token t2 starts in line 1, lemma is missing
+        self.assertEqual(rows[2][3:6] + rows[2][-2:], ["1r", "a", "1", "ADV", ""])
+        self.assertEqual(rows[3][5], "2")
+        self.assertEqual(len(rows), 4)
+
+    def test_export_columns(self):
+
+        exporter = create_exporter('tsv', {"tags": ["pos"]})
+        columns = exporter.export_columns([self.doc, self.doc])
+
+        self.assertNotIn("lemma", columns)
+        self.assertEqual(columns["pos"].decode(), ["KON", "ADV", "ADJA"] * 2)
+        self.assertEqual(list(columns["sigle"].codes), [0] * 6)
+        self.assertEqual(list(columns["checked"].codes), [0, 1, 1, 0, 1, 1])
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from coraxml_utils.importer import read_coraxml_header
+from coraxml_utils.exporter import replace_coraxml_header
+
+from test import DOCUMENT
+
+
+class CoraXMLHeaderTest(unittest.TestCase):
+
+    def setUp(self):
+
+        fd, self.filename = tempfile.mkstemp(suffix=".xml")
+        with os.fdopen(fd, "w", encoding="utf-8") as xmlfile:
+            xmlfile.write(DOCUMENT)
+
+    def tearDown(self):
+
+        os.remove(self.filename)
+
+    def test_read_header(self):
+
+        cora_header = read_coraxml_header(self.filename)
+
+        self.assertEqual(cora_header["sigle"], "A1")
+        self.assertEqual(cora_header["name"], "Test")
+        self.assertEqual(cora_header["header_string"], "Sigle: A1")
+
+    def test_replace_header(self):
+
+        replace_coraxml_header(self.filename, "Titel: Test & Co.\nSigle: A1", chunk_size=8)
+
+        with open(self.filename, encoding="utf-8") as xmlfile:
+            content = xmlfile.read()
+
+        ## everything but the header is copied unchanged
+        self.assertEqual(
+            content,
+            DOCUMENT.replace("Sigle: A1", "Titel: Test &amp; Co.\nSigle: A1")
+        )
+        self.assertEqual(read_coraxml_header(self.filename)["header_string"], "Titel: Test & Co.\nSigle: A1")
+
+    def test_replace_missing_header(self):
+
+        document = DOCUMENT.replace("<header>Sigle: A1</header>\n", "")
+        with open(self.filename, "w", encoding="utf-8") as xmlfile:
+            xmlfile.write(document)
+
+        with self.assertRaises(ValueError):
+            replace_coraxml_header(self.filename, "Sigle: A1", chunk_size=8)
+        with open(self.filename, encoding="utf-8") as xmlfile:
+            self.assertEqual(xmlfile.read(), document)
@@ -0,0 +1,25 @@
+import unittest
+
+from coraxml_utils.coralib import *
+from coraxml_utils.character import *
+from coraxml_utils.parser import ReNParser
+from coraxml_utils.exporter import MarkdownExporter, create_exporter
+
+
+class MarkdownExporterTest(unittest.TestCase):
+
+    def test_render_dipl(self):
+
+        dipls = [TokDipl(dipl) for dipl in ReNParser().parse('{A_vnd} ǂabǂ').tokenize_dipl()]
+
+        self.assertEqual(
+            [create_exporter('md')._render_dipl(dipl) for dipl in dipls],
+            ['*vnd*', '~~ab~~']
+        )
+
+    def test_render_dipl_with_custom_rendering(self):
+
+        exporter = MarkdownExporter({'rendering': [(ExpandedAbbreviation, lambda c: "_")]})
+        dipl = TokDipl(ReNParser().parse('{A_vnd}').tokenize_dipl()[0])
+
+        self.assertEqual(exporter._render_dipl(dipl), '_vnd_')
@@ -0,0 +1,61 @@
+import io
+import sqlite3
+import unittest
+
+from coraxml_utils.importer import create_importer
+from coraxml_utils.exporter import create_exporter
+from coraxml_utils.sqlite_store import connect, find_annos, list_documents
+
+from lxml import etree as ET
+
+from test import DOCUMENT
+
+
+class SQLiteStoreTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.doc = create_importer('coraxml', 'anselm').import_from_file(
+            io.BytesIO(DOCUMENT.encode("utf-8"))
+        )
+        self.connection = sqlite3.connect(":memory:")
+        create_exporter('sqlite', {"batch_size": 5}).export(self.doc, self.connection)
+
+    def tearDown(self):
+
+        self.connection.close()
+
+    def test_rebuild_document(self):
+
+        for lazy in (False, True):
+            doc = create_importer('sqlite', 'anselm', strict=False, lazy=lazy).import_from_connection(
+                self.connection, "A1"
+            )
+            self.assertEqual(
+                ET.tostring(create_exporter('coraxml').export(doc)),
+                ET.tostring(create_exporter('coraxml').export(self.doc))
+            )
+            self.assertEqual(doc.tokens[0], self.doc.tokens[0])
+            self.assertEqual(doc.shifttags[0].range(), "t2..t3")
+
+    def test_replace_document(self):
+
+        self.doc.tokens[0].tok_annos[0].tags["pos"] = "KOUS"
+        create_exporter('sqlite').export(self.doc, self.connection)
+
+        self.assertEqual(list_documents(connect(self.connection)), ["A1"])
+        self.assertEqual(len(find_annos(self.connection, pos="KON")), 0)
+        self.assertEqual(len(find_annos(self.connection, pos="KOUS")), 1)
+
+    def test_find_annos(self):
+
+        connection = connect(self.connection)
+
+        [row] = find_annos(connection, pos="ADJA", lemma="gut")
+        self.assertEqual((row["sigle"], row["token"], row["anno"]), ("A1", "t3", "t3_m1"))
+
+        [row] = find_annos(connection, pos="ADV", forms={"utf": "czühin"})
+        self.assertEqual(row["trans"], "czü=hin")
+
+        [row] = find_annos(connection, flags=["lemma verified"])
+        self.assertEqual(row["anno"], "t1_m1")
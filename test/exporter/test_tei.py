@@ -0,0 +1,56 @@
+import io
+import unittest
+
+from coraxml_utils.character import *
+from coraxml_utils.importer import create_importer
+from coraxml_utils.exporter import create_exporter
+
+from lxml import etree as ET
+
+from test import DOCUMENT
+
+## the ReN parser needs anno elements and does not know umlauts;
+## t1 gets an abbreviation and t3 an unclear passage
+for old, new in [("<mod ", "<anno "), ("</mod>", "</anno>"), ("&#xFC;", ""),
+                 ('trans="vnd"', 'trans="{A_vnd}"'), ('trans="gut"', 'trans="[gu]t"')]:
+    DOCUMENT = DOCUMENT.replace(old, new)
+
+
+class TEIExporterTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.doc = create_importer('coraxml', 'ren').import_from_file(
+            io.BytesIO(DOCUMENT.encode("utf-8"))
+        )
+
+    def test_export_brackets(self):
+
+        body = create_exporter('tei').export(self.doc).find("body/ab")
+        words = body.findall("w")
+
+        self.assertEqual(words[0].find("expan").text, "vnd")
+        self.assertEqual(words[2].find("unclear").text, "gu")
+        self.assertEqual(words[2].find("unclear").tail, "t")
+
+    def test_register_bracket(self):
+
+        exporter = create_exporter('tei', {"brackets": [(Recognizable, "supplied", False)]})
+        words = exporter.export(self.doc).find("body/ab").findall("w")
+
+        self.assertIsNone(words[2].find("unclear"))
+        self.assertEqual(words[2].find("supplied").text, "gu")
+
+    def test_export_after_layout_change(self):
+
+        exporter = create_exporter('tei')
+        exporter.export(self.doc)
+
+        ## the second dipl of t2 moves to the first line
+        first_line, second_line = self.doc.pages[0].columns[0].lines
+        first_line.dipls.append(second_line.dipls.pop(0))
+        words = exporter.export(self.doc).find("body/ab").findall("w")
+
+        self.assertIsNone(words[1].find("lb"))
+        self.assertEqual(words[1].getprevious().tag, "w")
+        self.assertEqual(words[2].getprevious().get("n"), "2")
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from coraxml_utils.coralib import *
@@ -7,6 +8,8 @@ from coraxml_utils.exporter import create_exporter
 
 from lxml import etree as ET
 
+from test import DOCUMENT
+
 class CoraXMLImporterTest(unittest.TestCase):
 
     def test_dipl_from_xml(self):
@@ -109,3 +112,205 @@ class CoraXMLImporterTest(unittest.TestCase):
             create_importer('coraxml')._create_cora_token(token_element, set())
         )
 
+
+    def test_cora_token_from_xml_with_annotations(self):
+
+        expected_token = CoraToken(
+            PlainParser().parse('test|case'),
+            [TokDipl(PlainParser().parse('test|case', output_type="dipl"), extid='t1_d1')],
+            [TokAnno(PlainParser().parse('test|', output_type="anno"), extid='t1_m1', tags={'pos': 'NN'}, flags={'lemma verified'}, checked=True),
+             TokAnno(PlainParser().parse('case', output_type="anno"), extid='t1_m2', tags={'pos': 'NN', 'lemma': 'case'})],
+            extid='t1'
+        )
+        token_element = ET.fromstring('<token id="t1" trans="test|case"><mod id="t1_m1" trans="test|" checked="y"><pos tag="NN"/><cora-flag name="lemma verified"/></mod><dipl id="t1_d1" trans="test|case" /><mod id="t1_m2" trans="case"><pos tag="NN"/><lemma tag="case"/></mod></token>')
+
+        self.assertEquals(
+            expected_token,
+            create_importer('coraxml')._create_cora_token(token_element, set())
+        )
+
+    def test_partial_parses_derived_from_token_parse(self):
+
+        token_element = ET.fromstring(
+            """<token id="t924" trans="hin#cz&#xFC;|hin(.)">
+                 <dipl id="t924_d1" trans="hin#cz&#xFC;|" utf="hincz&#xFC;"/>
+                 <dipl id="t924_d2" trans="hin" utf="hin"/>
+                 <mod id="t924_m1" trans="hin#cz&#xFC;|" utf="hincz&#xFC;" ascii="hincz&#xFC;" checked="y" />
+                 <mod id="t924_m2" trans="hin" utf="hin" ascii="hin" checked="y" />
+                 <mod id="t924_m3" trans="(.)" utf="." ascii="." checked="y" />
+               </token>""")
+
+        importer = create_importer('coraxml', 'anselm', strict=False)
+        token = importer._create_cora_token(token_element, set())
+
+        ## dipls match the token transcription, annos contain an additional (.)
+        self.assertEqual(importer.parse_stats['dipl_derived'], 2)
+        self.assertEqual(importer.parse_stats['dipl_reparsed'], 0)
+        self.assertEqual(importer.parse_stats['anno_derived'], 0)
+        self.assertEqual(importer.parse_stats['anno_reparsed'], 3)
+
+        ## derived and reparsed transcriptions are the same as parsing the
+        ## transcriptions of the XML one by one
+        self.assertEqual([dipl.trans.trans() for dipl in token.tok_dipls], ["hin#cz\xfc|", "hin"])
+        self.assertEqual([anno.trans.trans() for anno in token.tok_annos], ["hin#cz\xfc|", "hin", "(.)"])
+        self.assertPartsAsReparsed(importer, token)
+
+    def test_parts_of_matching_token_as_reparsed(self):
+
+        token_element = ET.fromstring(
+            """<token id="t2" trans="cz&#xFC;=hin">
+                 <dipl id="t2_d1" trans="cz&#xFC;=" utf="cz&#xFC;="/>
+                 <dipl id="t2_d2" trans="hin" utf="hin"/>
+                 <mod id="t2_m1" trans="cz&#xFC;=hin" utf="cz&#xFC;hin" ascii="cz&#xFC;hin"/>
+               </token>""")
+
+        importer = create_importer('coraxml', 'anselm')
+        token = importer._create_cora_token(token_element, set())
+
+        ## the tokenization of the parser is used as it is
+        self.assertEqual(token.errors, [])
+        self.assertEqual(
+            [dipl.trans.trans() for dipl in token.tok_dipls],
+            [dipl.trans() for dipl in token.trans.tokenize_dipl()]
+        )
+        self.assertEqual(
+            [anno.trans.trans() for anno in token.tok_annos],
+            [anno.trans() for anno in token.trans.tokenize_anno()]
+        )
+        ## the characters keep the bounds they have in the whole token
+        self.assertPartsAsReparsed(importer, token, same_parse=False)
+
+    def assertPartsAsReparsed(self, importer, token, same_parse=True):
+
+        for output_type, parts in [("dipl", token.tok_dipls), ("anno", token.tok_annos)]:
+            for part in parts:
+                reparsed = importer.tokenparser.parse(part.trans.trans(), output_type=output_type)
+                self.assertEqual(part.trans.trans(), reparsed.trans())
+                self.assertEqual(part.trans.utf(), reparsed.utf())
+                if output_type == "anno":
+                    self.assertEqual(part.trans.simple(), reparsed.simple())
+                if same_parse:
+                    self.assertEqual(part.trans.parse, reparsed.parse)
+
+    def test_mismatches_are_collected_as_diagnostics(self):
+
+        token_element = ET.fromstring(
+            """<token id="t924" trans="hin#cz&#xFC;|hin(.)">
+                 <dipl id="t924_d1" trans="hin#cz&#xFC;|" utf="hincz&#xFC;"/>
+                 <dipl id="t924_d2" trans="hin" utf="hin"/>
+                 <mod id="t924_m1" trans="hin#cz&#xFC;|" utf="hincz&#xFC;" ascii="hincz&#xFC;" checked="y" />
+                 <mod id="t924_m2" trans="hin" utf="hin" ascii="hin" checked="y" />
+                 <mod id="t924_m3" trans="(.)" utf="." ascii="." checked="y" />
+               </token>""")
+
+        importer = create_importer('coraxml', 'anselm', echo_diagnostics=False)
+        importer._create_cora_token(token_element, set())
+
+        self.assertEqual(
+            importer.diagnostics.counts(),
+            {'cat_dipl': 1, 'cat_anno': 1, 'tok_change': 1, 'tok_number': 1, 'tok_mismatch': 1}
+        )
+        self.assertTrue(importer.diagnostics.has_errors())
+        self.assertIn(
+            ('WARNING', "Change in number of annos ('hin#czü| hin (.)' -> 'hin#czü| hin') for token t924"),
+            list(importer.diagnostics.messages())
+        )
+
+
+    def test_lazy_cora_token_from_xml(self):
+
+        token_element = ET.fromstring('<token id="t1" trans="test|case"><dipl id="t1_d1" trans="test|case" /><mod id="t1_m1" trans="test|" checked="y" /><mod id="t1_m2" trans="case" /></token>')
+
+        lazy_token = create_importer('coraxml', lazy=True)._create_lazy_cora_token(token_element, set())
+
+        self.assertFalse(lazy_token.is_parsed())
+        self.assertEqual(lazy_token.tok_annos[1].raw_trans, 'case')
+
+        ## accessing one transcription parses the whole token
+        self.assertEqual(lazy_token.tok_annos[0].trans.trans(), 'test|')
+        self.assertTrue(lazy_token.is_parsed())
+        self.assertTrue(lazy_token.tok_dipls[0].is_parsed())
+
+        self.assertEquals(
+            create_importer('coraxml')._create_cora_token(token_element, set()),
+            lazy_token
+        )
+
+
+    def test_lazy_and_eager_tokens_match(self):
+
+        ## the parser splits dipls at # and annos at |
+        for dipl_transs, anno_transs in [
+            (['ab#cd|', 'ef'], ['ab#', 'cd|ef']),  # err_tok_dipl, err_tok_anno
+            (['ab#cd|ef'], ['ab#cd|', 'ef']),  # err_nr_dipl
+            (['ab#', 'cd|ef'], ['ab#cd|ef']),  # err_nr_anno
+            (['ab#cd|ef'], ['ab#', 'cd|ef']),  # err_nr_dipl, err_tok_anno
+        ]:
+            token_element = ET.fromstring(
+                '<token id="t1" trans="ab#cd|ef">'
+                + ''.join('<dipl id="t1_d{}" trans="{}"/>'.format(i, trans) for i, trans in enumerate(dipl_transs))
+                + ''.join('<mod id="t1_m{}" trans="{}"/>'.format(i, trans) for i, trans in enumerate(anno_transs))
+                + '</token>'
+            )
+            eager_token = create_importer('coraxml', 'anselm', strict=False, echo_diagnostics=False)._create_cora_token(token_element, set())
+            lazy_token = create_importer('coraxml', 'anselm', strict=False, lazy=True, echo_diagnostics=False)._create_lazy_cora_token(token_element, set())
+
+            with self.subTest(dipls=dipl_transs, annos=anno_transs):
+                self.assertEqual(
+                    [dipl.trans.trans() for dipl in lazy_token.tok_dipls],
+                    [dipl.trans.trans() for dipl in eager_token.tok_dipls]
+                )
+                self.assertEqual(
+                    [anno.trans.trans() for anno in lazy_token.tok_annos],
+                    [anno.trans.trans() for anno in eager_token.tok_annos]
+                )
+                self.assertEqual(lazy_token.errors, eager_token.errors)
+
+
+    def test_lazy_token_with_parse_error(self):
+
+        importer = create_importer('coraxml', 'anselm', strict=False, lazy=True, echo_diagnostics=False)
+        doc = importer.import_from_file(io.BytesIO(DOCUMENT.replace('trans="vnd"', 'trans="v~nd"').encode("utf-8")))
+        diagnostics = importer.diagnostics
+        importer.import_from_file(io.BytesIO(DOCUMENT.encode("utf-8")))
+
+        ## the dipls and annos are kept, as the layout refers to them
+        token = doc.tokens[0]
+        self.assertIsNone(token.trans)
+        self.assertIsNone(token.tok_dipls[0].trans)
+        self.assertIsNone(token.tok_annos[0].trans)
+        self.assertIs(doc.line_of(token.tok_dipls[0]).dipls[0], token.tok_dipls[0])
+
+        ## the error is reported for the document the token comes from
+        self.assertEqual(diagnostics.counts(), {'parse_error': 1})
+        self.assertEqual(importer.diagnostics.counts(), {})
+
+    def test_strict_lazy_import_checks_tokenization(self):
+
+        document = DOCUMENT.replace('<mod id="t3_m1" trans="gut" utf="gut" ascii="gut">', '<mod id="t3_m0" trans="g"/><mod id="t3_m1" trans="ut">')
+
+        for lazy in (False, True):
+            importer = create_importer('coraxml', 'anselm', lazy=lazy, echo_diagnostics=False)
+            self.assertIsNone(importer.import_from_file(io.BytesIO(document.encode("utf-8"))))
+            self.assertEqual(importer.diagnostics.counts()['tok_mismatch'], 1)
+
+    def test_passthrough_keeps_attributes_of_unmodified_tokens(self):
+
+        token_element = ET.fromstring(
+            """<token id="t3" trans="$ey(.)">
+                 <dipl id="t3_d1" trans="$ey(.)" utf="original"/>
+                 <mod id="t3_m1" trans="$ey" utf="&#x17F;ey" ascii="original"><pos tag="VAFIN"/></mod>
+                 <mod id="t3_m2" trans="(.)" utf="original" ascii="original"/>
+               </token>""")
+
+        token = create_importer('coraxml', 'anselm', passthrough=True)._create_cora_token(token_element, set())
+        token.tok_annos[0].tags['pos'] = 'VVFIN'
+        token.tok_annos[1].trans = AnselmParser().parse('(.)', output_type="anno")
+
+        token_xml = create_exporter('coraxml')._create_xml_token(token)
+
+        self.assertEqual(token_xml.find('dipl').attrib['utf'], 'original')
+        self.assertEqual(token_xml.findall('mod')[0].attrib['ascii'], 'original')
+        self.assertEqual(token_xml.findall('mod')[0].find('pos').attrib['tag'], 'VVFIN')
+        ## modified transcriptions are regenerated
+        self.assertEqual(token_xml.findall('mod')[1].attrib['utf'], '(.)')
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from coraxml_utils.cli import main
+
+from test import DOCUMENT
+
+
+class ConvertTest(unittest.TestCase):
+
+    def test_convert_to_several_formats(self):
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            infilename = os.path.join(tmpdir, "a1.xml")
+            with open(infilename, "w", encoding="utf-8") as infile:
+                infile.write(DOCUMENT)
+
+            result = CliRunner().invoke(
+                main,
+                ["convert", "-f", "coraxml", "-P", "anselm",
+                 "-t", "tei", "-t", "gatejson", "-t", "trans",
+                 "-O", os.path.join(tmpdir, "out", "{sigle}.{ext}"), "-j", "2",
+                 infilename]
+            )
+
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(tmpdir, "out"))),
+                ["A1.json", "A1.tei.xml", "A1.txt"]
+            )
+
+    def test_several_formats_require_template(self):
+
+        result = CliRunner().invoke(main, ["convert", "-t", "coraxml", "-t", "tei", "-"], input="")
+
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn("--output-template", result.output)
+
+
+class MergeAnnotationsTest(unittest.TestCase):
+
+    def test_merge_annotations(self):
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            infilename = os.path.join(tmpdir, "a1.xml")
+            with open(infilename, "w", encoding="utf-8") as infile:
+                infile.write(DOCUMENT)
+            annofilename = os.path.join(tmpdir, "tags.jsonl")
+            with open(annofilename, "w", encoding="utf-8") as annofile:
+                annofile.write('{"anno": "t2_m1", "tag": "pos", "value": "NA"}\n')
+                annofile.write('{"anno": "t9_m1", "tag": "pos", "value": "NA"}\n')
+
+            result = CliRunner().invoke(
+                main, ["merge-annotations", "-P", "anselm", infilename, annofilename]
+            )
+
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(result.output.count('<pos tag="NA"/>'), 1)
+            self.assertIn('<mod id="t2_m1" trans="czü=hin" utf="czühin" ascii="czühin">\n      <pos tag="NA"/>', result.output)
+            self.assertIn("1 tags applied, 0 skipped (checked), 1 unknown annos", result.output)
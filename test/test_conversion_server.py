@@ -0,0 +1,89 @@
+import io
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from coraxml_utils.conversion_server import (
+    ConversionError,
+    convert_remote,
+    create_conversion_server,
+)
+
+from test import DOCUMENT
+
+
+TRANS = """+H
+Sigle: B1
+@H
+B1-1r,1\tvnd gut
+"""
+
+
+class ConversionServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.server = create_conversion_server(
+            port=0, workers=1, queue_size=1, preload=[("trans", "anselm")]
+        )
+        cls.url = "http://127.0.0.1:{0}".format(cls.server.server_address[1])
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def metrics(self):
+
+        with urllib.request.urlopen(self.url + "/metrics") as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def test_convert(self):
+
+        output = convert_remote(
+            TRANS.encode("utf-8"), from_="trans", parser="anselm", to="coraxml", url=self.url
+        )
+        self.assertIn(b'<cora-header sigle="B1"', output)
+
+        ## file objects are sent in chunks
+        outfile = io.BytesIO()
+        convert_remote(
+            io.BytesIO(DOCUMENT.encode("utf-8")), parser="anselm", to="tsv",
+            url=self.url, outfile=outfile
+        )
+        self.assertIn("t3_m1", outfile.getvalue().decode("utf-8"))
+
+        metrics = self.metrics()
+        self.assertGreaterEqual(metrics["conversions"]["trans>coraxml"], 1)
+        self.assertGreaterEqual(metrics["latency"]["count"], 2)
+        self.assertEqual(metrics["in_flight"], 0)
+        self.assertIsInstance(metrics["parse_stats"], dict)
+        self.assertIsInstance(metrics["diagnostics"], dict)
+
+    def test_conversion_error(self):
+
+        with self.assertRaises(ConversionError):
+            convert_remote(b"<text", parser="anselm", url=self.url)
+        with self.assertRaises(ConversionError):
+            convert_remote(b"", parser="unknown", url=self.url)
+        for to in ("bogus", "sqlite"):
+            with self.assertRaises(ConversionError):
+                convert_remote(b"", to=to, url=self.url)
+
+    def test_backpressure(self):
+
+        for _ in range(2):
+            self.server.slots.acquire()
+        try:
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                convert_remote(TRANS.encode("utf-8"), from_="trans", parser="anselm", url=self.url)
+            self.assertEqual(cm.exception.code, 503)
+        finally:
+            for _ in range(2):
+                self.server.slots.release()
+        self.assertGreaterEqual(self.metrics()["rejected"], 1)
@@ -0,0 +1,172 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from coraxml_utils.cora_client import CoraClient, SyncManifest
+
+
+class CoraStandIn(BaseHTTPRequestHandler):
+    """Answers the few requests of CorA's HTTP interface that the client uses."""
+
+    def do_GET(self):
+        if "session=ok" not in self.headers.get("Cookie", ""):
+            self._respond(403, b"not logged in")
+            return
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        if query["do"] == ["getProjectsAndFiles"]:
+            self._respond(
+                200,
+                json.dumps({"success": True, "data": self.server.projects}).encode("utf-8"),
+            )
+        elif query["do"] == ["exportFile"]:
+            file_id = query["fileid"][0]
+            with self.server.lock:
+                self.server.exports.append(file_id)
+                fail = self.server.failures.pop(file_id, 0)
+                if fail:
+                    self.server.failures[file_id] = fail - 1
+            if fail:
+                self._respond(503, b"try again")
+            else:
+                self._respond(200, "<text id='{0}'/>".format(file_id).encode("utf-8"))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.path == "/":
+            self.send_response(200)
+            self.send_header("Set-Cookie", "session=ok")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            with self.server.lock:
+                self.server.uploads += 1
+                fail = self.server.upload_failures
+                self.server.upload_failures = max(fail - 1, 0)
+            if fail:
+                self._respond(502, b"bad gateway")
+            else:
+                self._respond(200, json.dumps({"success": b"<text" in body}).encode("utf-8"))
+
+    def _respond(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CoraClientTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), CoraStandIn)
+        self.server.lock = threading.Lock()
+        self.server.exports = []
+        self.server.failures = {}
+        self.server.uploads = 0
+        self.server.upload_failures = 0
+        self.server.projects = [
+            {
+                "id": "1",
+                "files": [
+                    {"id": str(i), "sigle": "T" + str(i), "fullname": "Text " + str(i),
+                     "changed": "2020-01-01 00:00:00", "changer_id": "5"}
+                    for i in range(1, 7)
+                ],
+            }
+        ]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        url = "http://127.0.0.1:{0}/".format(self.server.server_address[1])
+        self.client = CoraClient(url, username="user", password="pw", backoff=0)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.manifest_file = os.path.join(self.tmpdir.name, "manifest.json")
+
+    def tearDown(self):
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def texts(self):
+
+        return self.client.get_projects_and_files()["data"][0]["files"]
+
+    def test_download_files(self):
+
+        self.server.failures = {"2": 2}
+        downloaded = self.client.download_files(
+            self.texts(), self.tmpdir.name, manifest=SyncManifest(self.manifest_file)
+        )
+
+        self.assertEqual(len(downloaded), 6)
+        self.assertEqual(self.server.exports.count("2"), 3)
+        with open(os.path.join(self.tmpdir.name, "2.xml"), encoding="utf-8") as xmlfile:
+            self.assertEqual(xmlfile.read(), "<text id='2'/>")
+
+    def test_skip_unchanged_files(self):
+
+        self.client.download_files(
+            self.texts(), self.tmpdir.name, manifest=SyncManifest(self.manifest_file)
+        )
+        self.server.exports = []
+        self.server.projects[0]["files"][3]["changed"] = "2021-01-01 00:00:00"
+        os.remove(os.path.join(self.tmpdir.name, "5.xml"))
+
+        downloaded = self.client.download_files(
+            self.texts(), self.tmpdir.name, manifest=SyncManifest(self.manifest_file)
+        )
+
+        self.assertEqual([text["id"] for text in downloaded], ["4", "5"])
+        self.assertEqual(sorted(self.server.exports), ["4", "5"])
+
+    def test_give_up_after_retries(self):
+
+        self.server.failures = {"3": 10}
+        with self.assertRaises(OSError):
+            self.client.download_files(self.texts(), self.tmpdir.name)
+        self.assertEqual(self.server.exports.count("3"), 4)
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, "3.xml")))
+
+    def test_upload_files(self):
+
+        paths = []
+        for i in range(3):
+            paths.append(os.path.join(self.tmpdir.name, "{0}.xml".format(i)))
+            with open(paths[-1], "w", encoding="utf-8") as xmlfile:
+                xmlfile.write("<text/>")
+
+        responses = self.client.upload_files("1", paths, ["POS", "norm"])
+        self.assertEqual([json.loads(r) for r in responses], [{"success": True}] * 3)
+
+    def test_uploads_are_not_retried(self):
+
+        path = os.path.join(self.tmpdir.name, "0.xml")
+        with open(path, "w", encoding="utf-8") as xmlfile:
+            xmlfile.write("<text/>")
+        self.server.upload_failures = 1
+
+        with self.assertRaises(OSError):
+            self.client.upload_XML_file("1", path, ["POS"])
+        self.assertEqual(self.server.uploads, 1)
+
+    def test_downloaded_files_get_the_usual_mode(self):
+
+        umask = os.umask(0o022)
+        try:
+            path = os.path.join(self.tmpdir.name, "1.xml")
+            self.client.download_XML_file("1", path)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+
+            os.chmod(path, 0o640)
+            self.client.download_XML_file("1", path)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+        finally:
+            os.umask(umask)
@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import unittest
+
+from coraxml_utils.corpus import Corpus, create_manifest, estimate_size
+
+from test import DOCUMENT
+
+
+TRANS = """+H
+Sigle: B1
+@H
+B1-1r,1\tvnd gut
+B1-1r,2\tdaz
+"""
+
+
+class CorpusTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.directory = self.tmpdir.name
+        os.mkdir(os.path.join(self.directory, "xml"))
+        for sigle in ("A1", "A2"):
+            with open(os.path.join(self.directory, "xml", sigle + ".xml"), "w",
+                      encoding="utf-8") as xmlfile:
+                xmlfile.write(DOCUMENT.replace('sigle="A1"', 'sigle="{0}"'.format(sigle)))
+        with open(os.path.join(self.directory, "B1.txt"), "w", encoding="utf-8") as transfile:
+            transfile.write("\ufeff" + TRANS)
+
+        manifest = create_manifest(self.directory, "coraxml", "anselm")
+        manifest["documents"].append({"path": "B1.txt", "format": "trans"})
+        with open(os.path.join(self.directory, "corpus.json"), "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+
+    def tearDown(self):
+
+        self.tmpdir.cleanup()
+
+    def test_manifest(self):
+
+        corpus = Corpus(self.directory)
+        self.assertEqual(list(corpus), ["xml/A1", "xml/A2", "B1"])
+        self.assertEqual(len(corpus.resident), 0)
+        self.assertEqual(corpus["B1"].sigle, "B1")
+        self.assertEqual(corpus["xml/A2"].sigle, "A2")
+
+    def test_max_documents(self):
+
+        corpus = Corpus(self.directory, max_documents=2)
+        doc = corpus["xml/A1"]
+        corpus["xml/A2"]
+        self.assertIs(corpus["xml/A1"], doc)
+        corpus["B1"]
+        self.assertEqual(list(corpus.resident), ["xml/A1", "B1"])
+        self.assertIsNot(corpus["xml/A2"], None)
+        self.assertEqual(list(corpus.resident), ["B1", "xml/A2"])
+
+    def test_max_bytes(self):
+
+        corpus = Corpus(self.directory)
+        size = estimate_size(corpus["xml/A1"])
+        self.assertGreater(size, 0)
+
+        corpus = Corpus(self.directory, max_bytes=size)
+        corpus["xml/A1"]
+        corpus["xml/A2"]
+        self.assertEqual(list(corpus.resident), ["xml/A2"])
+        self.assertEqual(corpus.resident_bytes, size)
+
+        ## a document larger than max_bytes on its own does not evict the others
+        corpus = Corpus(self.directory, max_bytes=size - 1)
+        corpus["B1"]
+        self.assertIsNotNone(corpus["xml/A1"])
+        self.assertEqual(list(corpus.resident), ["B1"])
+
+    def test_max_bytes_with_unparseable_token(self):
+
+        with open(os.path.join(self.directory, "xml", "A3.xml"), "w", encoding="utf-8") as xmlfile:
+            ## the last token has no dipls, so the line ends before it
+            xmlfile.write(
+                DOCUMENT.replace('sigle="A1"', 'sigle="A3"')
+                .replace('trans="gut"', 'trans="g~ut"')
+                .replace('range="t2_d2..t3_d1"', 'range="t2_d2"')
+            )
+        with open(os.path.join(self.directory, "corpus.json")) as manifest_file:
+            manifest = json.load(manifest_file)
+        manifest["documents"].append({"path": "xml/A3.xml"})
+        with open(os.path.join(self.directory, "corpus.json"), "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+
+        doc = Corpus(self.directory, max_bytes=10 ** 6)["xml/A3"]
+        self.assertIsNone(doc.tokens[-1].trans)
+        self.assertGreater(estimate_size(doc), 0)
+
+    def test_iterate(self):
+
+        corpus = Corpus(self.directory, max_documents=1)
+        tokens = list(corpus.iter_tokens())
+        self.assertEqual(len(tokens), 9)
+        self.assertEqual(tokens[-1][0], "B1")
+
+        annos = [
+            (name, anno.id) for name, token, anno in corpus.iter_annos(["xml/A2"])
+            if anno.tags.get("pos") == "ADJA"
+        ]
+        self.assertEqual(annos, [("xml/A2", "t3_m1")])
+        self.assertEqual(list(corpus.resident), ["xml/A2"])
@@ -0,0 +1,92 @@
+import io
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from coraxml_utils.corpus_store import CorpusStore
+from coraxml_utils.importer import create_importer
+from coraxml_utils.exporter import create_exporter
+
+from lxml import etree as ET
+
+from test import DOCUMENT
+
+
+def read_anno_tags(path, sigle, anno_id):
+    with CorpusStore(path) as store:
+        return dict(store[sigle].get_anno(anno_id).tags)
+
+
+class CorpusStoreTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.doc = create_importer('coraxml', 'anselm').import_from_file(
+            io.BytesIO(DOCUMENT.encode("utf-8"))
+        )
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = CorpusStore(self.tmpdir.name, create=True)
+        self.store.append(self.doc)
+
+    def tearDown(self):
+
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_token(self):
+
+        stored = self.store["A1"]
+        self.assertEqual(len(stored), 4)
+        self.assertEqual(stored.token(2), self.doc.tokens[2])
+        self.assertEqual(stored.token(2).tok_dipls[0].trans.utf(), "czü=")
+        self.assertEqual(stored.token(1).content, "Randnotiz")
+        with self.assertRaises(IndexError):
+            stored.token(4)
+
+    def test_get_anno(self):
+
+        anno = self.store.get_anno("t2_m1")
+        self.assertEqual(anno.trans.utf(), "czühin")
+        self.assertEqual(dict(anno.tags), {"pos": "ADV", "lemma": "hinzu"})
+        self.assertEqual(self.store["A1"].position_of_anno("t2_m1"), 2)
+
+        self.doc.sigle = "A2"
+        self.store.append(self.doc)
+        with self.assertRaises(ValueError):
+            self.store.get_anno("t2_m1")
+        self.assertEqual(self.store.get_anno("t2_m1", sigle="A2").id, "t2_m1")
+
+    def test_load(self):
+
+        self.assertEqual(
+            ET.tostring(create_exporter('coraxml').export(self.store["A1"].load())),
+            ET.tostring(create_exporter('coraxml').export(self.doc))
+        )
+
+    def test_replace_and_refresh(self):
+
+        reader = CorpusStore(self.tmpdir.name)
+        self.doc.tokens[0].tok_annos[0].tags["pos"] = "KOUS"
+        self.store.append(self.doc)
+        self.doc.sigle = "A2"
+        self.store.append(self.doc)
+
+        self.assertEqual(list(reader), ["A1"])
+        self.assertEqual(reader["A1"].get_anno("t1_m1").tags["pos"], "KON")
+        self.assertIn("A2", reader)
+        self.assertEqual(list(reader), ["A1", "A2"])
+        self.assertEqual(reader["A1"].get_anno("t1_m1").tags["pos"], "KOUS")
+        reader.close()
+
+    def test_several_processes(self):
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            results = list(
+                executor.map(
+                    read_anno_tags,
+                    [self.tmpdir.name] * 3,
+                    ["A1"] * 3,
+                    ["t1_m1", "t2_m1", "t3_m1"],
+                )
+            )
+        self.assertEqual([tags["pos"] for tags in results], ["KON", "ADV", "ADJA"])
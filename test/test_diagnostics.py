@@ -0,0 +1,83 @@
+import io
+import json
+import logging
+import unittest
+
+from coraxml_utils.diagnostics import Diagnostics
+from coraxml_utils.importer import create_importer
+
+
+class Location:
+
+    def __str__(self):
+        return "X1-1r,1"
+
+
+class Unformattable:
+
+    def __str__(self):
+        raise AssertionError("formatted too early")
+
+
+class DiagnosticsTest(unittest.TestCase):
+
+    def test_records_and_counts(self):
+
+        diagnostics = Diagnostics(echo=False)
+        diagnostics.report("cat_dipl", "t1", "ab", "a")
+        diagnostics.report("cat_dipl", "t2", "cd", "c")
+        diagnostics.report("parse_error", "t3", "x$", "Unknown character")
+
+        self.assertEqual(len(diagnostics), 3)
+        self.assertEqual(diagnostics.counts(), {"cat_dipl": 2, "parse_error": 1})
+        self.assertEqual(list(diagnostics)[0], ("cat_dipl", "t1", ("ab", "a")))
+        self.assertEqual(
+            list(diagnostics.messages())[2],
+            ("ERROR", "Token could not be parsed: x$ Message: Unknown character"),
+        )
+
+        diagnostics.clear()
+        self.assertEqual(diagnostics.counts(), {})
+        self.assertFalse(diagnostics.has_errors())
+
+    def test_formatting_on_demand(self):
+
+        ## nothing is formatted unless the logger emits the message
+        logging.getLogger("quiet").setLevel(logging.CRITICAL)
+        diagnostics = Diagnostics(logger=logging.getLogger("quiet"))
+        diagnostics.report("comment_space", 0, Unformattable())
+
+        diagnostics = Diagnostics(keep=False)
+        with self.assertLogs(None, "WARNING") as logs:
+            diagnostics.report("tab_separator", 3, "foo")
+        self.assertEqual(logs.output, ["WARNING:root:Tab used to separate tokens after 'foo'"])
+        self.assertEqual(list(diagnostics), [])
+        self.assertEqual(diagnostics.counts(), {"tab_separator": 1})
+
+    def test_json_report(self):
+
+        diagnostics = Diagnostics(echo=False)
+        diagnostics.report("layout_dropped_start", None, "line", "dipl token", ["l3", "l4"])
+        diagnostics.report("faulty_line", Location(), "a\tb")
+
+        report = json.loads(diagnostics.to_json())
+        self.assertEqual(report["counts"], {"layout_dropped_start": 1, "faulty_line": 1})
+        self.assertEqual(report["diagnostics"][1]["location"], "X1-1r,1")
+        self.assertEqual(
+            report["diagnostics"][:1],
+            [{
+                "code": "layout_dropped_start",
+                "level": "warning",
+                "location": None,
+                "args": ["line", "dipl token", ["l3", "l4"]],
+                "message": "Dropped line(s) starting with nonexistent dipl token: ['l3', 'l4']",
+            }],
+        )
+
+    def test_bonnxml_errors_are_collected(self):
+
+        importer = create_importer("bonnxml", "anselm", echo_diagnostics=False)
+
+        self.assertIsNone(importer.import_from_file(io.BytesIO(b"<text")))
+        self.assertEqual(importer.diagnostics.counts(), {"xml_error": 1})
+        self.assertTrue(importer.diagnostics.has_errors())
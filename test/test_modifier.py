@@ -1,12 +1,18 @@
 import unittest
 
+import io
 import json
+import os
+import tempfile
 
 import coraxml_utils.modifier
-from coraxml_utils.coralib import CoraToken
+from coraxml_utils.coralib import CoraToken, Document, TokAnno
 from coraxml_utils.character import *
 from coraxml_utils.coralib import Trans
 from coraxml_utils.parser import RefParser
+from coraxml_utils.importer import read_coraxml_header
+
+from test import DOCUMENT
 
 class Test_add_punc_tests(unittest.TestCase):
 
@@ -78,3 +84,81 @@ class TestUtils(unittest.TestCase):
             }
         )
 
+
+    def test_rename_tags(self):
+
+        annos = [TokAnno(None, tags={'pos': pos}) for pos in ['PDN', 'PIN', 'PDS', 'NA']]
+        doc = Document('t', 'Test', {}, [], [CoraToken(None, [], annos)])
+
+        coraxml_utils.modifier.rename_tags(doc, 'pos', {'PDN': 'PDS', 'PDS': 'PDN', 'PIN': 'PIS'})
+
+        self.assertEqual([anno.tags['pos'] for anno in annos], ['PDS', 'PIS', 'PDN', 'NA'])
+        self.assertEqual(doc.annotation_index.annos_with_tag('pos', 'PDS'), [annos[0]])
+
+    def test_apply_annotations(self):
+
+        annos = [
+            TokAnno(None, extid='a1', tags={'pos': 'NA'}, checked=True),
+            TokAnno(None, extid='a2', tags={'pos': '--'}, checked=True),
+            TokAnno(None, extid='a3', tags={'pos': 'NA'}),
+        ]
+        doc = Document('t', 'Test', {}, [], [CoraToken(None, [], annos)])
+        rows = io.StringIO("anno\ttag\tvalue\na1\tpos\tADJA\na2\tpos\tADJA\na3\tpos\tADJA\na4\tpos\tNA\n")
+
+        counts = coraxml_utils.modifier.apply_annotations(
+            doc, coraxml_utils.modifier.read_annotation_rows(rows), on_checked="fill"
+        )
+
+        self.assertEqual([anno.tags['pos'] for anno in annos], ['NA', 'ADJA', 'ADJA'])
+        self.assertEqual(counts, {'applied': 2, 'conflicts': 1, 'unknown': 1})
+
+        with self.assertRaises(ValueError):
+            coraxml_utils.modifier.apply_annotations(
+                doc, [('a3', 'pos', 'NA'), ('a1', 'pos', 'VVFIN')], on_checked="error"
+            )
+        ## the row before the conflict is not applied either
+        self.assertEqual([anno.tags['pos'] for anno in annos], ['NA', 'ADJA', 'ADJA'])
+
+        counts = coraxml_utils.modifier.apply_annotations(
+            doc, [('a3', 'pos', 'NA'), ('a1', 'pos', 'NA')], on_checked="error"
+        )
+        self.assertEqual([anno.tags['pos'] for anno in annos], ['NA', 'ADJA', 'NA'])
+        self.assertEqual(counts, {'applied': 2, 'conflicts': 0, 'unknown': 0})
+
+
+class TestRepairHeader(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.repair_infos = os.path.join(self.tmpdir.name, "metadata.csv")
+        with open(self.repair_infos, "w", encoding="utf-8") as metadata_file:
+            metadata_file.write("Sigle\tTitel\nA1\tAlt\nB1\tAnders\nA1\tNeu\n")
+        self.filename = os.path.join(self.tmpdir.name, "in.xml")
+        with open(self.filename, "w", encoding="utf-8") as xmlfile:
+            xmlfile.write(DOCUMENT.replace("Sigle: A1", "Sigle: A1\nDatum: heute"))
+
+    def tearDown(self):
+
+        self.tmpdir.cleanup()
+
+    def test_last_matching_row_wins(self):
+
+        doc = Document('A1', 'Test', {}, [], [], header_string="Sigle: A1\nDatum: heute")
+        coraxml_utils.modifier.repair_header(doc, self.repair_infos)
+        self.assertTrue(doc.header_string.startswith("Sigle: A1\nTitel: Neu\n"))
+        self.assertNotIn("Datum", doc.header_string)
+
+        outfilename = os.path.join(self.tmpdir.name, "out.xml")
+        coraxml_utils.modifier.repair_header_file(self.filename, self.repair_infos, outfilename)
+        self.assertEqual(read_coraxml_header(outfilename)["header_string"], doc.header_string)
+
+    def test_unmatched_file_is_copied(self):
+
+        with open(self.filename, "w", encoding="utf-8") as xmlfile:
+            xmlfile.write(DOCUMENT.replace('sigle="A1"', 'sigle="C1"'))
+
+        outfilename = os.path.join(self.tmpdir.name, "out.xml")
+        coraxml_utils.modifier.repair_header_file(self.filename, self.repair_infos, outfilename)
+        with open(outfilename, encoding="utf-8") as xmlfile:
+            self.assertEqual(xmlfile.read(), DOCUMENT.replace('sigle="A1"', 'sigle="C1"'))
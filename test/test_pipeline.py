@@ -0,0 +1,161 @@
+import os
+import tempfile
+import unittest
+from functools import partial
+
+from coraxml_utils.importer import create_importer
+from coraxml_utils.exporter import create_exporter
+from coraxml_utils.pipeline import (
+    JobManifest, Pipeline, document_step, run_from_command_line, token_step
+)
+
+from test import DOCUMENT
+
+
+CALLS = []
+
+
+def mark_first(token):
+    CALLS.append(("first", token.id))
+    token.tok_annos[0].tags["step"] = "1"
+
+
+def mark_second(token):
+    CALLS.append(("second", token.id))
+    token.tok_annos[0].tags["step"] += "2"
+
+
+def given(value):
+    return value
+
+
+def mark_document(doc):
+    CALLS.append(("document", doc.sigle))
+    doc.tokens[0].tok_annos[0].tags["step"] += "D"
+
+
+class PipelineTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.outpath = os.path.join(self.tmpdir.name, "out")
+        self.infiles = []
+        for sigle in ("A1", "A2", "A3"):
+            self.infiles.append(os.path.join(self.tmpdir.name, sigle + ".xml"))
+            with open(self.infiles[-1], "w", encoding="utf-8") as xmlfile:
+                xmlfile.write(DOCUMENT.replace('sigle="A1"', 'sigle="{0}"'.format(sigle)))
+        self.pipeline = Pipeline(
+            partial(create_importer, "coraxml", "anselm"),
+            partial(create_exporter, "coraxml"),
+            [token_step(mark_first), token_step(mark_second), document_step(mark_document)],
+        )
+        del CALLS[:]
+
+    def tearDown(self):
+
+        self.tmpdir.cleanup()
+
+    def read_output(self, sigle):
+
+        with open(os.path.join(self.outpath, sigle + ".xml"), encoding="utf-8") as xmlfile:
+            return xmlfile.read()
+
+    def test_fused_token_steps(self):
+
+        self.assertEqual([level for level, _ in self.pipeline.stages], ["token", "document"])
+
+        [result] = self.pipeline.run(self.infiles[:1], self.outpath)
+        self.assertEqual(
+            CALLS,
+            [("first", "t1"), ("second", "t1"), ("first", "t2"), ("second", "t2"),
+             ("first", "t3"), ("second", "t3"), ("document", "A1")]
+        )
+        self.assertIsNone(result["error"])
+        self.assertEqual(
+            list(result["timings"]),
+            ["import", "mark_first", "mark_second", "mark_document", "export"]
+        )
+        self.assertIn('<step tag="12D"/>', self.read_output("A1"))
+
+    def test_output_mode(self):
+
+        umask = os.umask(0o022)
+        try:
+            self.pipeline.run(self.infiles[:1], self.outpath)
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(os.path.join(self.outpath, "A1.xml")).st_mode & 0o777, 0o644)
+
+    def test_worker_processes(self):
+
+        results = self.pipeline.run(self.infiles, self.outpath, workers=2)
+
+        self.assertEqual([result["sigle"] for result in results], ["A1", "A2", "A3"])
+        for sigle in ("A1", "A2", "A3"):
+            self.assertIn('<step tag="12"/>', self.read_output(sigle))
+        self.assertEqual(sorted(os.listdir(self.outpath)), ["A1.xml", "A2.xml", "A3.xml"])
+
+    def test_failed_document(self):
+
+        with open(self.infiles[1], "w", encoding="utf-8") as xmlfile:
+            xmlfile.write("<text")
+
+        results = self.pipeline.run(self.infiles, self.outpath)
+
+        self.assertEqual([result["error"] is None for result in results], [True, False, True])
+        self.assertEqual(sorted(os.listdir(self.outpath)), ["A1.xml", "A3.xml"])
+
+    def test_manifest(self):
+
+        manifest_file = os.path.join(self.tmpdir.name, "jobs.json")
+        with open(self.infiles[1], "w", encoding="utf-8") as xmlfile:
+            xmlfile.write("<text")
+        results = self.pipeline.run(self.infiles, self.outpath, manifest=JobManifest(manifest_file))
+        self.assertEqual([result["skipped"] for result in results], [False] * 3)
+
+        ## the failed input is retried, changed inputs and outputs are redone
+        with open(self.infiles[1], "w", encoding="utf-8") as xmlfile:
+            xmlfile.write(DOCUMENT.replace('sigle="A1"', 'sigle="A2"'))
+        os.remove(os.path.join(self.outpath, "A3.xml"))
+        results = self.pipeline.run(
+            self.infiles, self.outpath, workers=2, manifest=JobManifest(manifest_file)
+        )
+        self.assertEqual([result["skipped"] for result in results], [True, False, False])
+        self.assertEqual(results[0]["sigle"], "A1")
+        self.assertEqual(
+            [job["status"] for job in JobManifest(manifest_file).jobs.values()], ["done"] * 3
+        )
+
+        with open(os.path.join(self.outpath, "A1.xml"), "a", encoding="utf-8") as xmlfile:
+            xmlfile.write("\n")
+        results = self.pipeline.run(self.infiles, self.outpath, manifest=JobManifest(manifest_file))
+        self.assertEqual([result["skipped"] for result in results], [False, True, True])
+
+        ## another output directory
+        other_outpath = os.path.join(self.tmpdir.name, "other")
+        results = self.pipeline.run(self.infiles, other_outpath, manifest=JobManifest(manifest_file))
+        self.assertEqual([result["skipped"] for result in results], [False] * 3)
+        self.assertEqual(sorted(os.listdir(other_outpath)), ["A1.xml", "A2.xml", "A3.xml"])
+
+        self.pipeline.settings = {"version": 2}
+        results = self.pipeline.run(self.infiles, self.outpath, manifest=JobManifest(manifest_file))
+        self.assertEqual([result["skipped"] for result in results], [False] * 3)
+
+    def test_settings_hash_of_given_importer(self):
+
+        def settings_hash(strict, anno_tag_name):
+            return Pipeline(
+                partial(given, create_importer("coraxml", "anselm", strict=strict)),
+                partial(given, create_exporter("coraxml", {"anno_tag_name": anno_tag_name})),
+                [token_step(mark_first)],
+            ).settings_hash()
+
+        self.assertEqual(settings_hash(True, "mod"), settings_hash(True, "mod"))
+        self.assertNotEqual(settings_hash(True, "mod"), settings_hash(False, "mod"))
+        self.assertNotEqual(settings_hash(True, "mod"), settings_hash(True, "anno"))
+
+    def test_single_process_pipeline(self):
+
+        with self.assertRaises(SystemExit):
+            run_from_command_line(self.pipeline, "", ["-j", "2", self.infiles[0]], parallel=False)
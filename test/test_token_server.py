@@ -0,0 +1,46 @@
+import json
+import threading
+import unittest
+
+from coraxml_utils.modifier import trans_to_cora_json
+from coraxml_utils.parser import AnselmParser
+from coraxml_utils.token_server import (
+    create_token_server,
+    parse_token_remote,
+    TokenParseError,
+)
+
+
+class TokenServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.server = create_token_server(["anselm"], port=0)
+        cls.url = "http://127.0.0.1:{0}".format(cls.server.server_address[1])
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_parse_token(self):
+
+        self.assertEqual(
+            json.loads(parse_token_remote("hin#czü|hin", "anselm", url=self.url)),
+            json.loads(trans_to_cora_json(AnselmParser().parse("hin#czü|hin")))
+        )
+
+    def test_parse_error(self):
+
+        with self.assertRaises(TokenParseError):
+            parse_token_remote("ab[c", "anselm", url=self.url)
+
+    def test_unknown_dialect(self):
+
+        ## not a parse error: the caller parses the token locally instead
+        with self.assertRaises(OSError) as cm:
+            parse_token_remote("abc", "ref", url=self.url)
+        self.assertNotIsInstance(cm.exception, TokenParseError)
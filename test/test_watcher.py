@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from coraxml_utils.watcher import DirectoryWatcher
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class DirectoryWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.write("a.txt", "a")
+
+    def tearDown(self):
+
+        self.tmpdir.cleanup()
+
+    def write(self, filename, content):
+
+        path = os.path.join(self.tmpdir.name, filename)
+        with open(path, "w", encoding="utf-8") as outfile:
+            outfile.write(content)
+        return path
+
+    def test_debounce(self):
+
+        watcher = DirectoryWatcher(self.tmpdir.name, ["*.txt"], debounce=1.0, clock=self.clock)
+        self.assertEqual(watcher.poll(), [])
+
+        path = self.write("a.txt", "ab")
+        self.write("b.xml", "b")
+        self.assertEqual(watcher.poll(), [])
+        self.clock.now = 0.5
+        self.write("a.txt", "abc")
+        self.assertEqual(watcher.poll(), [])
+        self.clock.now = 1.2
+        self.assertEqual(watcher.poll(), [])
+        self.clock.now = 1.5
+        self.assertEqual(watcher.poll(), [path])
+        self.clock.now = 3.0
+        self.assertEqual(watcher.poll(), [])
+
+    def test_initial_and_ignored(self):
+
+        watcher = DirectoryWatcher(
+            self.tmpdir.name, ["*.txt"], debounce=0, initial=True, clock=self.clock
+        )
+        watcher.ignore(self.write("a.out.txt", "output"))
+        self.assertEqual(watcher.poll(), [os.path.join(self.tmpdir.name, "a.txt")])
+
+        os.remove(os.path.join(self.tmpdir.name, "a.txt"))
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.known, {})
@@ -21,6 +21,20 @@ class RexTokenizerTests(unittest.TestCase):
         with self.assertLogs(level=logging.WARNING):
             self.tokenizer.tokenize('noch ein+K test @K')
 
+    def test_diagnostics(self):
+        tokenizer = RexTokenizer(diagnostics=Diagnostics(echo=False))
+        tokenizer.tokenize('noch\tein+K test @K @L')
+
+        self.assertEqual(
+            [(code, location) for code, location, args in tokenizer.diagnostics],
+            [('tab_separator', 4), ('comment_space', 8), ('shifttag_unopened', 19)]
+        )
+
+        ## a collector of its own is cleared for each text
+        self.tokenizer.tokenize('noch\tein')
+        self.tokenizer.tokenize('noch ein')
+        self.assertEqual(len(self.tokenizer.diagnostics), 0)
+
     def test_two_adjacent_comments(self):
         self.tokenizer.tokenize("zu Jn dann zu den mannen(.) +K mannen(.): folgt Schnörkel @K +K 20v,01: 'hagel machen' üdZ @K")
 